@@ -1,8 +1,30 @@
 import streamlit as st
 import pandas as pd
 import base64
+import hmac
+import os
 from pathlib import Path
 import json
+import time
+import uuid
+from urllib.parse import quote
+
+from mindmap.catalog import REQUIRED_COLUMNS, CatalogRegistry
+from mindmap.client_metrics import browser_config as client_metrics_config
+from mindmap.collab import start_collab_hub
+from mindmap.component import (declare_mindmap_component, list_saved_maps, save_map_event, server_maps_enabled,
+                               write_component_build)
+from mindmap.export_jobs import CANCELLED, DONE, FORMATS as EXPORT_FORMATS, ExportJobManager
+from mindmap.palette import CATEGORY_COLORS
+from mindmap.relations import load_relation_graph, relations_path_for
+from mindmap.rerun_metrics import METRICS as RERUN_METRICS
+from mindmap.search_index import build_search_index
+from mindmap.sidecar import ADMIN_TOKEN_ENV, start_sidecar
+from mindmap.state_format import DEFAULT_CENTER, catalog_hash, read_state_file, state_file_stem
+from mindmap.text_metrics import layout_node_label, metrics_table_for_js
+from mindmap.thumbnails import ThumbnailCache
+from mindmap.viewer import render_viewer_html
+from mindmap.warmup import warm_up
 
 # Configuração da página
 st.set_page_config(
@@ -11,46 +33,40 @@ st.set_page_config(
     layout="wide"
 )
 
+def session_key():
+    """Identificador aleatório desta sessão do navegador (não muda entre reruns)"""
+    if 'session_key' not in st.session_state:
+        st.session_state['session_key'] = uuid.uuid4().hex
+    return st.session_state['session_key']
+
+@RERUN_METRICS.cached(st.cache_resource, show_spinner=False)
+def get_catalog_registry():
+    """Catálogos configurados (MINDMAP_CATALOGS ou o services.csv), com cache por arquivo"""
+    return CatalogRegistry()
+
+@RERUN_METRICS.cached(st.cache_data, show_spinner=False, max_entries=4)
+def get_catalog_frame(signature, _records):
+    """Catálogo mesclado como DataFrame, refeito só quando algum arquivo muda"""
+    return pd.DataFrame(_records, columns=[*REQUIRED_COLUMNS, 'Source'])
+
 def load_csv_data():
-    """Carrega automaticamente o CSV da pasta raiz"""
+    """Carrega os catálogos configurados num catálogo só (relê apenas os arquivos alterados)"""
     try:
-        csv_files = list(Path(".").glob("*.csv"))
-        if csv_files:
-            csv_file = csv_files[0]
-            df = pd.read_csv(csv_file)
-
-            column_mapping = {}
-            for col in df.columns:
-                col_lower_stripped = col.lower().strip().replace("ç", "c").replace("ã", "a")
-                if 'nome do servico' == col_lower_stripped or 'service' == col_lower_stripped or 'servico' == col_lower_stripped:
-                    column_mapping[col] = 'Service'
-                elif 'categoria' == col_lower_stripped or 'category' == col_lower_stripped:
-                    column_mapping[col] = 'Category'
-                elif 'descricao' == col_lower_stripped or 'description' == col_lower_stripped or 'descric' in col_lower_stripped :
-                    column_mapping[col] = 'Description'
-
-            df = df.rename(columns=column_mapping)
-
-            required_cols = ['Service', 'Category', 'Description']
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                st.error(f"CSV deve conter as colunas: {missing_cols}. Encontradas: {list(df.columns)}")
-                return pd.DataFrame(), ""
-
-            df = df.dropna(subset=['Service']).drop_duplicates(subset=['Service'])
-            df['Service'] = df['Service'].astype(str).str.strip()
-            df = df[df['Service'] != '']
-
-            df = df.fillna('')
-
-            return df, csv_file.name
-        else:
+        registry = get_catalog_registry()
+        registry.refresh()
+        for path, message in registry.errors.items():
+            st.error(f"Erro ao carregar o catálogo {path}: {message}")
+        signature, records = registry.snapshot()
+        if signature:
+            return get_catalog_frame(signature, records), "+".join(Path(path).name for path, _ in signature)
+        if not registry.errors:
             st.error("Nenhum arquivo CSV encontrado na pasta raiz do projeto.")
-            return pd.DataFrame(), ""
+        return pd.DataFrame(), ""
     except Exception as e:
         st.error(f"Erro ao carregar ou processar o CSV: {e}")
         return pd.DataFrame(), ""
 
+@RERUN_METRICS.cached(st.cache_data, show_spinner=False)
 def get_aws_logo_base64():
     """Converte a logo AWS para base64 e retorna base64 e extensão."""
     try:
@@ -69,15 +85,38 @@ def get_aws_logo_base64():
         st.error(f"Erro ao carregar logo: {e}")
         return None, None
 
-def create_mindmap_html(df, csv_filename, logo_info_tuple):
-    """Cria o HTML do mapa mental com dados do CSV"""
-
-    services_data = df.to_dict('records')
-    services_json = json.dumps(services_data)
-
+@RERUN_METRICS.cached(st.cache_data, show_spinner=False)
+def get_search_index_json(df):
+    """Monta o índice de busca uma vez por catálogo e devolve o JSON compacto"""
+    return json.dumps(build_search_index(df.to_dict('records')), separators=(',', ':'))
+
+@RERUN_METRICS.cached(st.cache_data, show_spinner=False)
+def get_relations_json(df, catalog_paths, relations_mtimes):
+    """Monta a adjacência compacta das relações entre serviços ('null' se não houver arquivo)"""
+    graph = load_relation_graph(list(catalog_paths), df['Service'].tolist())
+    if graph is None:
+        return 'null'
+    return json.dumps(graph.to_client_payload(), ensure_ascii=False, separators=(',', ':'))
+
+@RERUN_METRICS.cached(st.cache_data, show_spinner=False)
+def get_catalog_hash(df):
+    """Hash do catálogo gravado nos mapas salvos no formato compacto"""
+    return catalog_hash(df.to_dict('records'))
+
+@RERUN_METRICS.cached(st.cache_resource, show_spinner=False)
+def get_sidecar():
+    """Servidor auxiliar (salvamento automático), iniciado uma vez por processo"""
+    return start_sidecar()
+
+@RERUN_METRICS.cached(st.cache_resource, show_spinner=False)
+def get_collab_hub():
+    """Hub WebSocket de coedição, iniciado uma vez por processo"""
+    return start_collab_hub()
+
+def build_center_node_svg(logo_info_tuple):
+    """SVG do nó central: a logo encontrada na raiz ou o texto 'AWS'"""
     logo_base64_str, file_extension_str = logo_info_tuple if logo_info_tuple else (None, None)
 
-    center_node_svg_string = ''
     if logo_base64_str:
         mime_type = {
             '.png': 'image/png',
@@ -86,11 +125,43 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
             '.svg': 'image/svg+xml'
         }.get(file_extension_str, 'image/png')
 
-        center_node_svg_string = f'''<image id="awsCenterLogoImage" data-type="image" x="-40" y="-30" width="80" height="60" href="data:{mime_type};base64,{logo_base64_str}" preserveAspectRatio="xMidYMid meet" style="cursor: pointer;"/>'''
-    else:
-        center_node_svg_string = '''<text id="awsCenterLogoText" data-type="text" x="0" y="8" text-anchor="middle" fill="#232F3E" font-size="24" font-weight="bold" style="cursor: pointer;">AWS</text>'''
+        return f'''<image id="awsCenterLogoImage" data-type="image" x="-40" y="-30" width="80" height="60" href="data:{mime_type};base64,{logo_base64_str}" preserveAspectRatio="xMidYMid meet" style="cursor: pointer;"/>'''
+    return '''<text id="awsCenterLogoText" data-type="text" x="0" y="8" text-anchor="middle" fill="#232F3E" font-size="24" font-weight="bold" style="cursor: pointer;">AWS</text>'''
+
+def catalog_paths_for(df, csv_filename):
+    """Arquivos de catálogo que formaram o DataFrame"""
+    return tuple(df['Source'].unique()) if 'Source' in df else (csv_filename,)
+
+def get_relations_mtimes(df, csv_filename):
+    """Data de modificação do arquivo de relações de cada catálogo (None se não existir)"""
+    relations_paths = [relations_path_for(path) for path in catalog_paths_for(df, csv_filename)]
+    return tuple(path.stat().st_mtime if path.exists() else None for path in relations_paths)
 
-    center_node_svg_for_js = json.dumps(center_node_svg_string)
+def create_mindmap_html(df, csv_filename, logo_info_tuple, sidecar=None, collab_hub=None, relations_mtimes=None):
+    """Cria o HTML do mapa mental com dados do CSV"""
+
+    services_data = df.drop(columns='Source', errors='ignore').to_dict('records')
+    for service in services_data:
+        # Largura e texto truncado do rótulo calculados de antemão (sem medir o DOM)
+        label_width, label_text = layout_node_label(service['Service'])
+        service['LabelWidth'] = label_width
+        if label_text != service['Service']:
+            service['LabelText'] = label_text
+    services_json = json.dumps(services_data)
+    search_index_json = get_search_index_json(df)
+    text_metrics_json = json.dumps(metrics_table_for_js(), ensure_ascii=False)
+    catalog_paths = catalog_paths_for(df, csv_filename)
+    if relations_mtimes is None:
+        relations_mtimes = get_relations_mtimes(df, csv_filename)
+    relations_json = get_relations_json(df, catalog_paths, relations_mtimes)
+    catalog_info_json = json.dumps({'name': csv_filename, 'hash': get_catalog_hash(df)}, ensure_ascii=False)
+    sidecar_json = json.dumps({'port': sidecar.port, 'url': sidecar.public_url} if sidecar else None)
+    category_colors_json = json.dumps(CATEGORY_COLORS, ensure_ascii=False)
+    collab_json = json.dumps({'port': collab_hub.port, 'url': collab_hub.public_url} if collab_hub else None)
+    perf_json = json.dumps(client_metrics_config() if sidecar else None)
+    server_maps_json = json.dumps(server_maps_enabled())
+
+    center_node_svg_for_js = json.dumps(build_center_node_svg(logo_info_tuple))
 
     html_content = f'''
     <!DOCTYPE html>
@@ -99,7 +170,6 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>AWS MindMap pro</title>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
         <script src="https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js"></script>
         <style>
             body {{
@@ -209,7 +279,6 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
             .canvas-container {{
                 flex-grow: 1;
                 position: relative;
-                /* overflow: hidden; // Managed by JS during PDF export */
                 background: #f8f9fa;
             }}
 
@@ -254,6 +323,37 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                 stroke-width: 3px !important;
             }}
 
+            .search-box {{ position: relative; }}
+            .search-box input {{
+                padding: 8px 12px;
+                border: 1px solid #ced4da;
+                border-radius: 4px;
+                font-size: 14px;
+                width: 240px;
+            }}
+            .search-box input:focus {{
+                border-color: #FF9900;
+                box-shadow: 0 0 0 0.2rem rgba(255, 153, 0, 0.25);
+                outline: none;
+            }}
+            .search-results {{
+                position: absolute; top: 100%; left: 0; z-index: 1500;
+                width: 380px; max-height: 320px; overflow-y: auto;
+                background: white; border: 1px solid #ced4da; border-radius: 4px;
+                box-shadow: 0 4px 12px rgba(0,0,0,0.15);
+            }}
+            .search-results-spacer {{ position: relative; }}
+            .search-result {{
+                position: absolute; left: 0; right: 0; height: 34px;
+                display: flex; align-items: center; gap: 8px;
+                padding: 0 10px; box-sizing: border-box;
+                font-size: 13px; cursor: pointer; white-space: nowrap; overflow: hidden;
+            }}
+            .search-result.active, .search-result:hover {{ background: #fff3e0; }}
+            .search-result-badge {{ width: 10px; height: 10px; border-radius: 2px; flex-shrink: 0; }}
+            .search-result-category {{ color: #6c757d; font-size: 11px; margin-left: auto; }}
+            .search-results-status {{ padding: 6px 10px; font-size: 11px; color: #6c757d; border-bottom: 1px solid #f0f2f5; }}
+
         </style>
     </head>
     <body>
@@ -264,24 +364,42 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
 
             <div class="info-bar">
                 <div class="controls">
+                    <div class="search-box">
+                        <input type="text" id="serviceSearch" placeholder="🔎 Buscar serviço..." autocomplete="off">
+                        <div id="searchResults" class="search-results" style="display: none;"></div>
+                    </div>
                     <select id="serviceSelect">
                         <option value="">Selecione um serviço AWS...</option>
                     </select>
                     <button id="addService" class="btn" disabled>➕Adicionar</button>
                     <button id="addCustomNode" class="btn custom-node">✏️Nó Customizado</button>
                     <button id="addByCategory" class="btn" style="background-color: #6f42c1;">📦Adicionar por Categoria</button>
+                    <button id="expandRelated" class="btn" style="background-color: #20c997;">🔗Relacionados</button>
+                    <button id="showPath" class="btn" style="background-color: #20c997;">🧭Caminho</button>
                     <button id="saveWorkBtn" class="btn save-map">💾Salvar</button>
+                    <select id="saveFormat" title="Formato do arquivo salvo" style="min-width: 0;">
+                        <option value="json">JSON compacto</option>
+                        <option value="gzip">JSON compacto + gzip</option>
+                        <option value="legacy">JSON legado</option>
+                    </select>
                     <button id="loadWorkBtn" class="btn load-map">📂Carregar</button>
-                    <input type="file" id="loadMapInput" accept=".json" style="display: none;">
+                    <input type="file" id="loadMapInput" accept=".json,.gz,.deflate" style="display: none;">
                     
+                    <button id="undoBtn" class="btn" style="background-color: #6c757d;" title="Desfazer (Ctrl+Z)" disabled>↩️</button>
+                    <button id="redoBtn" class="btn" style="background-color: #6c757d;" title="Refazer (Ctrl+Y)" disabled>↪️</button>
                     <button id="deleteSelectedNode" class="btn delete-node">🗑️Apagar Selecionado</button>
                     <button id="downloadPDF" class="btn download-pdf">📄PDF</button>
+                    <button id="downloadPNG" class="btn download-pdf">🖼️PNG</button>
                     <button id="clearAll" class="btn danger">🧹Limpar Tela</button>
                     <button id="resetView" class="btn" style="background-color: #6c757d;">🔄Centralizar</button>
+                    <button id="autoLayoutBtn" class="btn" style="background-color: #17a2b8;">🌳Auto-organizar</button>
+                    <button id="collabBtn" class="btn" style="background-color: #6f42c1;">👥Coeditar</button>
                 </div>
                 <div class="stats">
                     <div class="stat-item"><span>Nós:</span><strong id="totalServices">0</strong></div>
                     <div class="stat-item"><span>Categorias no Mapa:</span><strong id="totalCategories">0</strong></div>
+                    <div class="stat-item" id="collabStat" style="display: none;"><span>Editores:</span><strong id="collabEditors">0</strong></div>
+                    <div class="stat-item" id="serverNotice" style="display: none;"></div>
                 </div>
             </div>
 
@@ -307,7 +425,40 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
 
         <script>
             const rawCsvData = {services_json};
+            const searchIndex = {search_index_json};
+            const textMetrics = {text_metrics_json};
+            const relationsGraph = {relations_json};
+            const catalogInfo = {catalog_info_json};
+            const sidecarConfig = {sidecar_json};
+            const collabConfig = {collab_json};
+            const perfConfig = {perf_json};
+            const serverMapsEnabled = {server_maps_json};
+            const categoryColors = {category_colors_json};
+            const COMPONENT_FRAME_HEIGHT = 900;
+            const STATE_FORMAT_NAME = 'aws-mindmap';
+            const STATE_FORMAT_VERSION = 2;
             const AWS_CENTER_ID = 'aws_central_logo_node';
+            const EXPORT_BACKGROUND = '#f8f9fa';
+            const PERF_OVERLAY_OPERATIONS = ['loadMindMapState', 'addServicesByCategory', 'downloadPDF', 'downloadPNG'];
+            const PERF_OVERLAY_HISTORY = 6;
+            const PERF_OVERLAY_REFRESH_MS = 500;
+            // Worker da exportação: pinta o bitmap do mapa num OffscreenCanvas e codifica o PNG fora da thread da página
+            const RASTER_WORKER_SOURCE = `
+                self.onmessage = async (e) => {{
+                    const {{ id, bitmap, type, background }} = e.data;
+                    try {{
+                        const canvas = new OffscreenCanvas(bitmap.width, bitmap.height);
+                        const ctx = canvas.getContext('2d');
+                        ctx.fillStyle = background;
+                        ctx.fillRect(0, 0, canvas.width, canvas.height);
+                        ctx.drawImage(bitmap, 0, 0);
+                        bitmap.close();
+                        self.postMessage({{ id, blob: await canvas.convertToBlob({{ type }}) }});
+                    }} catch (error) {{
+                        self.postMessage({{ id, error: String((error && error.message) || error) }});
+                    }}
+                }};
+            `;
 
             let _resolvedCenterNodeSvgContent;
             const actualSvgStringFromPython = {center_node_svg_for_js};
@@ -329,56 +480,66 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     this.edgesG = document.getElementById('edgesGroup');
 
                     this.serviceSelect = document.getElementById('serviceSelect');
+                    this.serviceSearch = document.getElementById('serviceSearch');
+                    this.searchResultsEl = document.getElementById('searchResults');
                     this.addBtn = document.getElementById('addService');
                     this.addCustomNodeBtn = document.getElementById('addCustomNode');
                     this.addCategoryBtn = document.getElementById('addByCategory');
+                    this.expandRelatedBtn = document.getElementById('expandRelated');
+                    this.showPathBtn = document.getElementById('showPath');
                     this.saveWorkBtn = document.getElementById('saveWorkBtn');
                     this.loadWorkBtn = document.getElementById('loadWorkBtn');
                     this.loadMapInput = document.getElementById('loadMapInput');
+                    this.saveFormatSelect = document.getElementById('saveFormat');
 
                     this.deleteSelectedNodeBtn = document.getElementById('deleteSelectedNode');
+                    this.undoBtn = document.getElementById('undoBtn');
+                    this.redoBtn = document.getElementById('redoBtn');
                     this.clearBtn = document.getElementById('clearAll');
                     this.resetBtn = document.getElementById('resetView');
+                    this.autoLayoutBtn = document.getElementById('autoLayoutBtn');
+                    this.collabBtn = document.getElementById('collabBtn');
+                    this.collabStat = document.getElementById('collabStat');
+                    this.collabEditorsEl = document.getElementById('collabEditors');
+                    this.serverNoticeEl = document.getElementById('serverNotice');
                     this.downloadPDFBtn = document.getElementById('downloadPDF');
+                    this.downloadPNGBtn = document.getElementById('downloadPNG');
 
                     this.notification = document.getElementById('notification');
                     this.tooltip = document.getElementById('tooltip');
 
                     this.nodes = new Map();
                     this.edges = new Map();
-
-                    this.centerX = 800;
-                    this.centerY = 400;
+                    this.childrenIndex = new Map(); // parentId -> Set de ids filhos
+
+                    // Layout automático incremental: extensões de subárvore em cache
+                    this.autoLayoutEnabled = false;
+                    this.layoutExtents = new Map();
+                    this.layoutSides = new Map();
+                    this.nodeWidths = new Map();
+                    this.layoutPathIds = new Set();
+                    this.layoutSubtreeIds = new Set();
+                    this.layoutFrameRequested = false;
+
+                    // Exportação PDF em blocos: pontos do PDF por unidade do mapa (rótulo de 13px ~ 8pt),
+                    // sobreposição entre blocos vizinhos e resolução da captura
+                    this.pdfTileScale = 0.6;
+                    this.pdfTileOverlap = 40;
+                    this.pdfTileMargin = 40;
+                    this.pdfPixelsPerPoint = 2;
+                    this.pdfMaxCapturePixels = 2400;
+                    // PNG do mapa inteiro: pixels por unidade do mapa, com o lado maior limitado
+                    this.pngPixelsPerUnit = 2;
+                    this.pngMaxPixels = 8192;
+
+                    this.centerX = {DEFAULT_CENTER[0]};
+                    this.centerY = {DEFAULT_CENTER[1]};
 
                     this.initialViewBox = {{ x: 0, y: 0, width: 1600, height: 800 }};
                     this.currentViewBox = {{ ...this.initialViewBox }};
                     this.canvas.setAttribute('viewBox', `0 0 1600 800`);
 
-                    this.categoryColors = {{
-                        'Machine Learning': '#8E44AD',
-                        'Suporte ao Desenvolvedor': '#3498DB',
-                        'Ferramentas de Desenvolvedor': '#2ECC71',
-                        'Computação': '#E74C3C',
-                        'Rede e Entrega de Conteúdo': '#F39C12',
-                        'Migração e Transferência': '#9B59B6',
-                        'Gerenciamento e Governança': '#34495E',
-                        'Segurança e Identidade': '#E67E22',
-                        'Conformidade': '#1ABC9C',
-                        'Armazenamento': '#D35400',
-                        'Integração de Aplicações': '#16A085',
-                        'Banco de Dados': '#27AE60',
-                        'Analytics': '#7D3C98',
-                        'IoT': '#FF6B35',
-                        'Blockchain': '#6C5CE7',
-                        'Quantum': '#A29BFE',
-                        'Containers': '#00B894',
-                        'Serverless': '#FDCB6E',
-                        'Mobile': '#E17055',
-                        'Custom Notes': '#A6B1E1',
-                        'Anotações': '#A6B1E1',
-                        'Observações': '#A6B1E1',
-                        'Outros': '#7F8C8D'
-                    }};
+                    this.categoryColors = categoryColors;
 
                     this.selectedNodeId = AWS_CENTER_ID;
                     this.draggedNode = null;
@@ -387,11 +548,91 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     this.isPanning = false;
                     this.panStartX = 0;
                     this.panStartY = 0;
+                    this.dragStartPosition = null;
+
+                    // Histórico de desfazer/refazer: comandos pequenos que referenciam os próprios
+                    // objetos de nó afetados (compartilhamento estrutural, sem snapshots do mapa)
+                    this.undoStack = [];
+                    this.redoStack = [];
+                    this.historyBatch = null;
+                    this.historyBatchDepth = 0;
+                    this.isReplayingHistory = false;
+                    this.historyMaxOps = 5000;
+                    this.historyOpCount = 0;
+                    this.moveCoalesceMs = 1000;
+
+                    // Salvamento automático: deltas pendentes (ver initAutosave)
+                    this.autosaveEndpoint = null;
+                    this.autosaveReady = false;
+                    this.autosaveTouched = false;
+                    this.autosaveOps = [];
+                    this.autosaveMoveIds = new Set();
+                    this.autosaveViewDirty = false;
+                    this.autosaveUnsent = [];
+                    this.autosaveTimer = null;
+                    this.autosaveFirstPendingAt = 0;
+                    this.autosaveInFlight = null;
+                    this.autosaveFlushAgain = false;
+                    this.autosaveClientId = null;
+                    this.autosaveBatch = 0;
+                    this.sidecarToken = null;
+                    this.autosaveCatalogSent = false;
+                    this.autosaveDebounceMs = 1500;
+                    this.autosaveMaxWaitMs = 10000;
+                    this.autosaveRetryMs = 1500;
+                    this.autosaveMaxOps = 4000;
+
+                    // Componente bidirecional do Streamlit (ver initComponentBridge)
+                    this.isComponent = false;
+                    this.componentSessionId = null;
+                    this.componentEventSeq = 0;
+                    this.componentOutbox = [];
+                    this.lastLoadNonce = null;
+                    this.selectEventTimer = null;
+                    this.lastSentSelection = AWS_CENTER_ID;
+
+                    // Coedição em tempo real (ver initCollab)
+                    this.collabSocket = null;
+                    this.collabToken = null;
+                    this.collabRoom = null;
+                    this.collabJoined = false;
+                    this.collabClientId = Math.random().toString(36).slice(2, 10);
+                    this.collabClock = 0;
+                    this.collabRegisters = new Map(); // id -> carimbos {{ alive, pos, parent }}
+                    this.collabOutbox = [];
+                    this.collabMoves = new Map();
+                    this.collabTimer = null;
+                    this.collabFlushMs = 50;
+                    this.collabRetryMs = 1000;
+                    this.isApplyingRemote = false;
+
+                    this.searchIndex = searchIndex;
+                    this.normalizedServiceNames = null;
+                    this.searchResults = [];
+                    this.searchActiveIndex = 0;
+                    this.searchRowHeight = 34;
+
+                    this.glyphAdvances = new Map();
+                    Object.entries(textMetrics.groups).forEach(([advance, chars]) => {{
+                        for (const ch of chars) this.glyphAdvances.set(ch, Number(advance));
+                    }});
+                    this.serviceIndexByName = new Map(this.csvData.map((service, i) => [service.Service, i]));
+                    this.relationsGraph = relationsGraph;
+
+                    this.labelLayouts = new Map();
+                    this.csvData.forEach(service => {{
+                        if (service.LabelWidth) {{
+                            this.labelLayouts.set(service.Service, {{ width: service.LabelWidth, text: service.LabelText || service.Service }});
+                        }}
+                    }});
 
                     this.init();
                 }}
 
                 init() {{
+                    this.sidecarBaseUrl = this.resolveSidecarUrl();
+                    this.initPerfMetrics();
+                    this.initPerfOverlay();
                     this.populateServiceSelect();
                     this.initEventListeners();
                     this.initPanAndZoom();
@@ -400,6 +641,8 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                         this.selectNode(AWS_CENTER_ID);
                     }}
                     this.updateStats();
+                    this.initComponentBridge();
+                    this.initCollab();
                 }}
 
                 addCentralAWSNode() {{
@@ -449,20 +692,44 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     this.addBtn.addEventListener('click', () => this.addSelectedService());
                     this.addCustomNodeBtn.addEventListener('click', () => this.promptForCustomNode());
                     this.addCategoryBtn.addEventListener('click', () => this.promptAddByCategory());
+                    if (this.relationsGraph) {{
+                        this.expandRelatedBtn.addEventListener('click', () => this.expandRelatedServices());
+                        this.showPathBtn.addEventListener('click', () => this.promptPathBetweenServices());
+                    }} else {{
+                        this.expandRelatedBtn.style.display = 'none';
+                        this.showPathBtn.style.display = 'none';
+                    }}
                     
                     this.saveWorkBtn.addEventListener('click', () => this.saveMindMapState());
                     this.loadWorkBtn.addEventListener('click', () => this.loadMapInput.click());
                     this.loadMapInput.addEventListener('change', (event) => this.handleFileLoad(event));
 
                     this.deleteSelectedNodeBtn.addEventListener('click', () => this.deleteSelectedNode());
+                    this.undoBtn.addEventListener('click', () => this.undo());
+                    this.redoBtn.addEventListener('click', () => this.redo());
+                    document.addEventListener('keydown', (e) => {{
+                        if (!(e.ctrlKey || e.metaKey) || (e.target && e.target.tagName === 'INPUT')) return;
+                        const key = e.key.toLowerCase();
+                        if (key === 'z' && !e.shiftKey) {{
+                            e.preventDefault();
+                            this.undo();
+                        }} else if (key === 'y' || (key === 'z' && e.shiftKey)) {{
+                            e.preventDefault();
+                            this.redo();
+                        }}
+                    }});
                     this.clearBtn.addEventListener('click', () => this.clearAllNodes());
                     this.resetBtn.addEventListener('click', () => this.resetView());
+                    this.autoLayoutBtn.addEventListener('click', () => this.toggleAutoLayout());
                     this.downloadPDFBtn.addEventListener('click', () => this.downloadPDF());
+                    this.downloadPNGBtn.addEventListener('click', () => this.downloadPNG());
 
                     this.serviceSelect.addEventListener('change', () => {{
                         this.addBtn.disabled = !this.serviceSelect.value;
                     }});
 
+                    this.initSearch();
+
                     this.nodesG.addEventListener('mousedown', (e) => {{
                         const targetNodeElement = e.target.closest('.node');
                         if (targetNodeElement) {{
@@ -477,6 +744,7 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
 
                             this.draggedNodeOffsetX = this.draggedNode.x - mousePos.x;
                             this.draggedNodeOffsetY = this.draggedNode.y - mousePos.y;
+                            this.dragStartPosition = {{ x: this.draggedNode.x, y: this.draggedNode.y }};
                             this.canvas.style.cursor = 'grabbing';
                         }}
                     }});
@@ -501,6 +769,7 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
 
                             this.updateNodePosition(this.draggedNode);
                             this.updateConnectedEdges(this.draggedNode.id);
+                            this.queueCollabOp({{ type: 'move', id: this.draggedNode.id }});
                         }} else if (this.isPanning) {{
                             e.preventDefault();
                             const dx = (this.panStartX - e.clientX) * (this.currentViewBox.width / this.canvas.clientWidth);
@@ -515,8 +784,7 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
 
                     this.canvas.addEventListener('mouseup', () => {{
                         if (this.draggedNode) {{
-                            this.draggedNode = null;
-                            this.canvas.style.cursor = 'grab';
+                            this.endNodeDrag();
                         }}
                         if (this.isPanning) {{
                             this.isPanning = false;
@@ -525,8 +793,7 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     }});
                      this.canvas.addEventListener('mouseleave', () => {{
                         if (this.draggedNode) {{
-                            this.draggedNode = null;
-                             this.canvas.style.cursor = 'grab';
+                            this.endNodeDrag();
                         }}
                         if (this.isPanning) {{
                             this.isPanning = false;
@@ -535,6 +802,18 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     }});
                 }}
 
+                endNodeDrag() {{
+                    const node = this.draggedNode;
+                    const start = this.dragStartPosition;
+                    this.draggedNode = null;
+                    this.dragStartPosition = null;
+                    this.canvas.style.cursor = 'grab';
+                    if (!start || (start.x === node.x && start.y === node.y)) return;
+                    // Um arraste inteiro vira um único comando de movimento
+                    this.recordHistory({{ type: 'move', id: node.id, from: start, to: {{ x: node.x, y: node.y }} }});
+                    if (this.autoLayoutEnabled) this.layoutSubtreeAt(node.id);
+                }}
+
                 getMousePosition(evt, CTM) {{
                     const pt = this.canvas.createSVGPoint();
                     pt.x = evt.clientX;
@@ -568,6 +847,295 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     if (newSelectedElem) {{
                         newSelectedElem.classList.add('selected');
                     }}
+                    this.notifySelection();
+                }}
+
+                // ---------- Busca (índice invertido pré-compilado em Python) ----------
+
+                normalizeSearchText(text) {{
+                    return String(text).normalize('NFD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase();
+                }}
+
+                tokenizeSearchText(text) {{
+                    return this.normalizeSearchText(text).split(/[^a-z0-9]+/).filter(Boolean);
+                }}
+
+                _lookupSearchPrefix(token) {{
+                    const index = this.searchIndex;
+                    const matches = new Map();
+                    if (token.length <= index.shortPrefixMaxLen && !index.truncatedPrefixes.includes(token)) {{
+                        const flat = index.prefixes[token] || [];
+                        for (let i = 0; i < flat.length; i += 2) matches.set(flat[i], flat[i + 1]);
+                        return matches;
+                    }}
+                    const vocab = index.vocab;
+                    let low = 0, high = vocab.length;
+                    while (low < high) {{
+                        const mid = (low + high) >> 1;
+                        if (vocab[mid] < token) low = mid + 1; else high = mid;
+                    }}
+                    for (let position = low; position < vocab.length && vocab[position].startsWith(token); position++) {{
+                        const exactBonus = vocab[position] === token ? 1 : 0;
+                        const flat = index.postings[position];
+                        for (let i = 0; i < flat.length; i += 2) {{
+                            const weight = flat[i + 1] + exactBonus;
+                            if ((matches.get(flat[i]) || 0) < weight) matches.set(flat[i], weight);
+                        }}
+                    }}
+                    return matches;
+                }}
+
+                searchServices(query, limit = 200) {{
+                    const queryTokens = this.tokenizeSearchText(query);
+                    if (queryTokens.length === 0) return [];
+
+                    let scores = null;
+                    for (const token of queryTokens) {{
+                        const matches = this._lookupSearchPrefix(token);
+                        if (scores === null) {{
+                            scores = matches;
+                        }} else {{
+                            const next = new Map();
+                            scores.forEach((score, docId) => {{
+                                const weight = matches.get(docId);
+                                if (weight !== undefined) next.set(docId, score + weight);
+                            }});
+                            scores = next;
+                        }}
+                        if (scores.size === 0) return [];
+                    }}
+
+                    if (!this.normalizedServiceNames) {{
+                        this.normalizedServiceNames = this.csvData.map(s => this.normalizeSearchText(s.Service));
+                    }}
+                    const normalizedQuery = queryTokens.join(' ');
+                    const ranked = [];
+                    scores.forEach((score, docId) => {{
+                        const name = this.normalizedServiceNames[docId];
+                        ranked.push({{ docId, name, score: score + (name.startsWith(normalizedQuery) ? 5 : 0) }});
+                    }});
+                    ranked.sort((a, b) => (b.score - a.score) || (a.name < b.name ? -1 : a.name > b.name ? 1 : 0));
+                    return ranked.slice(0, limit).map(r => r.docId);
+                }}
+
+                initSearch() {{
+                    this.searchStatusEl = document.createElement('div');
+                    this.searchStatusEl.className = 'search-results-status';
+                    this.searchSpacerEl = document.createElement('div');
+                    this.searchSpacerEl.className = 'search-results-spacer';
+                    this.searchResultsEl.appendChild(this.searchStatusEl);
+                    this.searchResultsEl.appendChild(this.searchSpacerEl);
+
+                    this.serviceSearch.addEventListener('input', () => {{
+                        const started = performance.now();
+                        this.searchResults = this.searchServices(this.serviceSearch.value);
+                        const elapsed = performance.now() - started;
+                        this.searchActiveIndex = 0;
+                        this.searchResultsEl.scrollTop = 0;
+                        this.searchStatusEl.textContent = `${{this.searchResults.length}} resultado(s) · ${{elapsed.toFixed(2)}} ms`;
+                        this.searchResultsEl.style.display = this.serviceSearch.value.trim() ? 'block' : 'none';
+                        this.renderSearchResults();
+                    }});
+                    this.serviceSearch.addEventListener('keydown', (e) => {{
+                        if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {{
+                            e.preventDefault();
+                            if (this.searchResults.length === 0) return;
+                            const step = e.key === 'ArrowDown' ? 1 : -1;
+                            this.searchActiveIndex = Math.max(0, Math.min(this.searchResults.length - 1, this.searchActiveIndex + step));
+                            this.scrollSearchResultIntoView(this.searchActiveIndex);
+                            this.renderSearchResults();
+                        }} else if (e.key === 'Enter') {{
+                            e.preventDefault();
+                            if (this.searchResults.length > 0) this.addServiceFromSearch(this.searchResults[this.searchActiveIndex]);
+                        }} else if (e.key === 'Escape') {{
+                            this.closeSearchResults();
+                        }}
+                    }});
+                    this.serviceSearch.addEventListener('blur', () => {{
+                        setTimeout(() => this.closeSearchResults(), 150);
+                    }});
+                    this.searchResultsEl.addEventListener('scroll', () => this.renderSearchResults());
+                    this.searchResultsEl.addEventListener('mousedown', (e) => {{
+                        const row = e.target.closest('.search-result');
+                        if (!row) return;
+                        e.preventDefault();
+                        this.addServiceFromSearch(parseInt(row.dataset.docId, 10));
+                    }});
+                }}
+
+                renderSearchResults() {{
+                    // Lista virtualizada: só as linhas visíveis (mais uma folga) existem no DOM
+                    const rowHeight = this.searchRowHeight;
+                    const total = this.searchResults.length;
+                    this.searchSpacerEl.style.height = `${{total * rowHeight}}px`;
+                    const statusHeight = this.searchStatusEl.offsetHeight || 0;
+                    const scrollTop = Math.max(0, this.searchResultsEl.scrollTop - statusHeight);
+                    const viewportHeight = this.searchResultsEl.clientHeight || 320;
+                    const first = Math.max(0, Math.floor(scrollTop / rowHeight) - 3);
+                    const last = Math.min(total, Math.ceil((scrollTop + viewportHeight) / rowHeight) + 3);
+
+                    const fragment = document.createDocumentFragment();
+                    for (let i = first; i < last; i++) {{
+                        const service = this.csvData[this.searchResults[i]];
+                        const row = document.createElement('div');
+                        row.className = 'search-result' + (i === this.searchActiveIndex ? ' active' : '');
+                        row.style.top = `${{i * rowHeight}}px`;
+                        row.dataset.docId = this.searchResults[i];
+
+                        const badge = document.createElement('span');
+                        badge.className = 'search-result-badge';
+                        badge.style.background = this.categoryColors[service.Category] || this.categoryColors['Outros'];
+                        const name = document.createElement('span');
+                        name.textContent = service.Service + (this.nodes.has(service.Service) ? ' ✓' : '');
+                        const category = document.createElement('span');
+                        category.className = 'search-result-category';
+                        category.textContent = service.Category || 'Outros';
+
+                        row.appendChild(badge);
+                        row.appendChild(name);
+                        row.appendChild(category);
+                        fragment.appendChild(row);
+                    }}
+                    this.searchSpacerEl.replaceChildren(fragment);
+                }}
+
+                scrollSearchResultIntoView(index) {{
+                    const rowTop = index * this.searchRowHeight;
+                    const viewportHeight = this.searchResultsEl.clientHeight || 320;
+                    const statusHeight = this.searchStatusEl.offsetHeight || 0;
+                    const scrollTop = this.searchResultsEl.scrollTop - statusHeight;
+                    if (rowTop < scrollTop) {{
+                        this.searchResultsEl.scrollTop = rowTop + statusHeight;
+                    }} else if (rowTop + this.searchRowHeight > scrollTop + viewportHeight) {{
+                        this.searchResultsEl.scrollTop = rowTop + this.searchRowHeight - viewportHeight + statusHeight;
+                    }}
+                }}
+
+                closeSearchResults() {{
+                    this.searchResultsEl.style.display = 'none';
+                }}
+
+                addServiceFromSearch(docId) {{
+                    const serviceData = this.csvData[docId];
+                    if (!serviceData) return;
+                    if (this.nodes.has(serviceData.Service)) {{
+                        this.showNotification(`Serviço "${{serviceData.Service}}" já está no mapa.`, 'warning');
+                        return;
+                    }}
+                    const parentId = this.selectedNodeId || AWS_CENTER_ID;
+                    this.addNode(serviceData, parentId);
+                    this.showNotification(`"${{serviceData.Service}}" adicionado.`, 'success');
+                    this.serviceSearch.value = '';
+                    this.searchResults = [];
+                    this.closeSearchResults();
+                }}
+
+                // ---------- Relações entre serviços (adjacência pré-computada em Python) ----------
+
+                getRelatedServices(position) {{
+                    const graph = this.relationsGraph;
+                    const related = [];
+                    for (let i = graph.offsets[position]; i < graph.offsets[position + 1]; i++) {{
+                        const code = graph.edgeRelations[i];
+                        related.push({{
+                            position: graph.neighbors[i],
+                            relation: graph.relations[Math.abs(code) - 1],
+                            outgoing: code > 0
+                        }});
+                    }}
+                    return related;
+                }}
+
+                findRelationPath(startPosition, goalPosition) {{
+                    const graph = this.relationsGraph;
+                    const previous = new Map([[startPosition, -1]]);
+                    const queue = [startPosition];
+                    for (let head = 0; head < queue.length; head++) {{
+                        const position = queue[head];
+                        if (position === goalPosition) {{
+                            const path = [];
+                            for (let p = position; p !== -1; p = previous.get(p)) path.push(p);
+                            return path.reverse();
+                        }}
+                        for (let i = graph.offsets[position]; i < graph.offsets[position + 1]; i++) {{
+                            const neighbor = graph.neighbors[i];
+                            if (!previous.has(neighbor)) {{
+                                previous.set(neighbor, position);
+                                queue.push(neighbor);
+                            }}
+                        }}
+                    }}
+                    return null;
+                }}
+
+                getSelectedServicePosition() {{
+                    const position = this.serviceIndexByName.get(this.selectedNodeId);
+                    if (position === undefined) {{
+                        this.showNotification('Selecione um nó de serviço do catálogo.', 'warning');
+                    }}
+                    return position;
+                }}
+
+                expandRelatedServices() {{
+                    const position = this.getSelectedServicePosition();
+                    if (position === undefined) return;
+                    const related = this.getRelatedServices(position);
+                    if (related.length === 0) {{
+                        this.showNotification(`Nenhuma relação cadastrada para "${{this.selectedNodeId}}".`, 'info');
+                        return;
+                    }}
+                    const parentId = this.selectedNodeId;
+                    let count = 0;
+                    this.beginHistoryBatch();
+                    related.forEach(({{ position: relatedPosition }}) => {{
+                        const serviceData = this.csvData[relatedPosition];
+                        if (!this.nodes.has(serviceData.Service)) {{
+                            this.addNode(serviceData, parentId);
+                            count++;
+                        }}
+                    }});
+                    this.endHistoryBatch();
+                    if (count > 0) {{
+                        this.showNotification(`${{count}} serviço(s) relacionado(s) adicionado(s).`, 'success');
+                    }} else {{
+                        this.showNotification('Todos os serviços relacionados já estão no mapa.', 'info');
+                    }}
+                }}
+
+                promptPathBetweenServices() {{
+                    const startPosition = this.getSelectedServicePosition();
+                    if (startPosition === undefined) return;
+                    const input = prompt(`Caminho a partir de "${{this.selectedNodeId}}" até qual serviço?`);
+                    if (!input || input.trim() === '') return;
+
+                    const goalPosition = this.serviceIndexByName.has(input.trim())
+                        ? this.serviceIndexByName.get(input.trim())
+                        : this.searchServices(input, 1)[0];
+                    if (goalPosition === undefined) {{
+                        this.showNotification(`Serviço "${{input}}" não encontrado.`, 'error');
+                        return;
+                    }}
+                    const path = this.findRelationPath(startPosition, goalPosition);
+                    const goalName = this.csvData[goalPosition].Service;
+                    if (!path) {{
+                        this.showNotification(`Não há caminho de relações até "${{goalName}}".`, 'warning');
+                        return;
+                    }}
+
+                    const steps = [this.csvData[path[0]].Service];
+                    this.beginHistoryBatch();
+                    for (let i = 1; i < path.length; i++) {{
+                        const previousName = this.csvData[path[i - 1]].Service;
+                        const serviceData = this.csvData[path[i]];
+                        const link = this.getRelatedServices(path[i - 1]).find(r => r.position === path[i]);
+                        steps.push(link.outgoing ? `—${{link.relation}}→ ${{serviceData.Service}}` : `←${{link.relation}}— ${{serviceData.Service}}`);
+                        if (!this.nodes.has(serviceData.Service)) {{
+                            this.addNode(serviceData, previousName);
+                        }}
+                    }}
+                    this.endHistoryBatch();
+                    this.selectNode(goalName);
+                    this.showNotification(`Caminho: ${{steps.join(' ')}}`, 'success');
                 }}
 
                 promptAddByCategory() {{
@@ -629,12 +1197,14 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     const parentId = this.selectedNodeId || AWS_CENTER_ID;
                     const servicesToAdd = this.csvData.filter(s => (s.Category || 'Outros') === category);
                     let count = 0;
+                    this.beginHistoryBatch();
                     servicesToAdd.forEach(serviceData => {{
                         if (!this.nodes.has(serviceData.Service)) {{
                            this.addNode(serviceData, parentId);
                            count++;
                         }}
                     }});
+                    this.endHistoryBatch();
                     if (count > 0) {{
                         this.showNotification(`${{count}} serviços da categoria "${{category}}" adicionados.`, 'success');
                     }} else {{
@@ -649,7 +1219,7 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                         this.showNotification(`Serviço "${{serviceName}}" já está no mapa.`, 'warning');
                         return;
                     }}
-                    const serviceData = this.csvData.find(s => s.Service === serviceName);
+                    const serviceData = this.csvData[this.serviceIndexByName.get(serviceName)];
                     if (serviceData) {{
                         const parentId = this.selectedNodeId || AWS_CENTER_ID;
                         this.addNode(serviceData, parentId);
@@ -671,10 +1241,10 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                         }}
                     }}
 
-                    const childrenOfParent = Array.from(this.nodes.values()).filter(n => n.parentId === parentId);
+                    const siblingCount = this.getChildIds(parentId).length;
                     const angleIncrement = Math.PI / 6; 
                     const baseRadius = currentParentNode.isCentral ? 180 : 120;
-                    const angle = childrenOfParent.length * angleIncrement + (currentParentNode.isCentral ? 0 : Math.random() * 0.1);
+                    const angle = siblingCount * angleIncrement + (currentParentNode.isCentral ? 0 : Math.random() * 0.1);
 
                     const x = currentParentNode.x + Math.cos(angle) * (baseRadius + Math.random() * 30);
                     const y = currentParentNode.y + Math.sin(angle) * (baseRadius + Math.random() * 30);
@@ -692,10 +1262,13 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     }};
 
                     this.nodes.set(newNodeData.id, newNodeData);
+                    this._indexChild(parentId, newNodeData.id);
                     this.renderNode(newNodeData);
                     if (parentId && parentId !== newNodeData.id) {{
                         this.addEdge(parentId, newNodeData.id);
                     }}
+                    this.invalidateLayout(newNodeData.id, true);
+                    this.recordHistory({{ type: 'add', node: newNodeData }});
                     this.updateStats();
                 }}
 
@@ -721,6 +1294,49 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     return attrs;
                 }}
 
+                // ---------- Métricas de texto (tabela de avanços gerada em Python) ----------
+
+                getGlyphAdvance(ch) {{
+                    let advance = this.glyphAdvances.get(ch);
+                    if (advance !== undefined) return advance;
+                    advance = this.glyphAdvances.get(ch.normalize('NFD')[0]);
+                    if (advance !== undefined) return advance;
+                    const code = ch.codePointAt(0);
+                    if (textMetrics.wideRanges.some(([start, end]) => code >= start && code <= end)) return textMetrics.wideAdvance;
+                    return textMetrics.defaultAdvance;
+                }}
+
+                measureLabelText(text) {{
+                    let width = 0;
+                    for (const ch of text) width += this.getGlyphAdvance(ch) * textMetrics.size / textMetrics.unitsPerEm;
+                    return width;
+                }}
+
+                getNodeLabelLayout(name) {{
+                    // Mesmo algoritmo de mindmap/text_metrics.py: layout_node_label
+                    const cached = this.labelLayouts.get(name);
+                    if (cached) return cached;
+                    const idealWidth = Math.ceil(this.measureLabelText(name) + textMetrics.padding);
+                    const width = Math.min(Math.max(textMetrics.minWidth, idealWidth), textMetrics.maxWidth);
+                    const maxTextWidth = width - textMetrics.padding;
+                    let text = name;
+                    if (this.measureLabelText(name) > maxTextWidth) {{
+                        const available = maxTextWidth - this.measureLabelText('...');
+                        const chars = Array.from(name);
+                        let accumulated = 0;
+                        let cut = 0;
+                        for (let i = 0; i < chars.length; i++) {{
+                            accumulated += this.getGlyphAdvance(chars[i]) * textMetrics.size / textMetrics.unitsPerEm;
+                            if (accumulated > available) break;
+                            cut = i + 1;
+                        }}
+                        text = chars.slice(0, cut).join('').trimEnd() + '...';
+                    }}
+                    const layout = {{ width, text }};
+                    this.labelLayouts.set(name, layout);
+                    return layout;
+                }}
+
                 renderNode(nodeData) {{
                     let group = document.getElementById(nodeData.id);
                     if (!group) {{
@@ -776,38 +1392,12 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                         const rect = document.createElementNS('http://www.w3.org/2000/svg', 'rect');
                         const textEl = document.createElementNS('http://www.w3.org/2000/svg', 'text');
                         
-                        const fullNodeName = nodeData.name;
-                        const fontSize = 13; 
-                        const charWidthMultiplier = 7; // Estimativa de pixels por caracter
-                        const internalPadding = 20; // Espaçamento interno total (horizontal) para o texto
-
-                        let idealRectWidth = (fullNodeName.length * charWidthMultiplier) + internalPadding;
-
-                        const minNodeWidth = 100;
-                        const maxNodeWidth = 350; // Aumentado para nomes mais longos
-
-                        let finalRectWidth = Math.max(minNodeWidth, idealRectWidth);
-                        finalRectWidth = Math.min(finalRectWidth, maxNodeWidth);
-
+                        const fontSize = textMetrics.size;
+                        const labelLayout = this.getNodeLabelLayout(nodeData.name);
+                        const finalRectWidth = labelLayout.width;
+                        const displayText = labelLayout.text;
                         const rectHeight = 40; 
-
-                        let displayText = fullNodeName;
-                        const maxCharsInFinalRect = Math.floor((finalRectWidth - internalPadding) / charWidthMultiplier);
-
-                        if (fullNodeName.length > maxCharsInFinalRect && maxCharsInFinalRect > 0) {{
-                            if (maxCharsInFinalRect <= 3) {{ // Muito pouco espaço, mostrar reticências ou 1-2 chars
-                                displayText = fullNodeName.substring(0, maxCharsInFinalRect) + "..";
-                            }} else {{
-                                displayText = fullNodeName.substring(0, maxCharsInFinalRect - 3) + "...";
-                            }}
-                        }} else if (maxCharsInFinalRect <= 0 && fullNodeName.length > 0) {{
-                             displayText = "..."; // Nenhum espaço para texto
-                        }}
-                        
-                        if (displayText.replace(/\./g, '').length === 0 && fullNodeName.length > 0) {{
-                           displayText = fullNodeName.substring(0,1) + (fullNodeName.length > 1 ? "..." : "");
-                        }}
-
+                        this.nodeWidths.set(nodeData.id, finalRectWidth);
 
                         rect.setAttribute('x', -finalRectWidth / 2);
                         rect.setAttribute('y', -rectHeight / 2);
@@ -824,8 +1414,9 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                         textEl.setAttribute('y', 5); 
                         textEl.setAttribute('text-anchor', 'middle');
                         textEl.setAttribute('fill', 'white');
+                        textEl.setAttribute('font-family', textMetrics.family);
                         textEl.setAttribute('font-size', fontSize + 'px');
-                        textEl.setAttribute('font-weight', '600');
+                        textEl.setAttribute('font-weight', String(textMetrics.weight));
                         textEl.textContent = displayText;
                         
                         group.appendChild(rect);
@@ -883,26 +1474,13 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
 
                     const nodeIdToDelete = this.selectedNodeId;
 
-                    const nodeElement = document.getElementById(nodeIdToDelete);
-                    if (nodeElement) nodeElement.remove();
-
-                    const edgesToRemove = [];
-                    this.edges.forEach((edge, edgeId) => {{
-                        if (edge.source === nodeIdToDelete || edge.target === nodeIdToDelete) {{
-                            edgesToRemove.push(edgeId);
-                            document.getElementById(edgeId)?.remove();
-                        }}
-                    }});
-                    edgesToRemove.forEach(edgeId => this.edges.delete(edgeId));
-
-                    this.nodes.forEach(node => {{
-                        if (node.parentId === nodeIdToDelete) {{
-                            node.parentId = AWS_CENTER_ID;
-                            this.addEdge(AWS_CENTER_ID, node.id);
-                        }}
+                    this.beginHistoryBatch();
+                    this.getChildIds(nodeIdToDelete).forEach(childId => {{
+                        this.layoutSides.delete(childId);
+                        this.reparentNode(childId, AWS_CENTER_ID);
                     }});
-
-                    this.nodes.delete(nodeIdToDelete);
+                    this.removeNode(nodeIdToDelete);
+                    this.endHistoryBatch();
 
                     this.showNotification(`Nó "${{nodeToDeleteData.name}}" apagado.`, "success");
                     this.selectedNodeId = AWS_CENTER_ID;
@@ -911,6 +1489,200 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                 }}
 
 
+                // ---------- Histórico (desfazer/refazer) ----------
+                // Operações primitivas: add/remove (nó inteiro), move e reparent. Cada uma toca só o nó
+                // afetado e as arestas ligadas a ele; lotes (categoria, apagar, limpar) viram um comando 'batch'.
+
+                recordHistory(command) {{
+                    this.queueAutosaveOp(command);
+                    if (this.isApplyingRemote) return; // operações de outros editores não entram no histórico local
+                    this.queueCollabOp(command);
+                    if (this.isReplayingHistory) return;
+                    command.time = Date.now();
+                    if (this.historyBatch) {{
+                        this.historyBatch.commands.push(command);
+                        return;
+                    }}
+                    const last = this.undoStack[this.undoStack.length - 1];
+                    if (command.type === 'move' && last && last.type === 'move' && last.id === command.id
+                        && command.time - last.time < this.moveCoalesceMs) {{
+                        last.to = command.to;
+                        last.time = command.time;
+                        this.redoStack = [];
+                        this.updateHistoryButtons();
+                        return;
+                    }}
+                    this._pushUndo(command);
+                }}
+
+                _pushUndo(command) {{
+                    this.undoStack.push(command);
+                    this.historyOpCount += this._commandSize(command);
+                    this.redoStack = [];
+                    while (this.historyOpCount > this.historyMaxOps && this.undoStack.length > 1) {{
+                        this.historyOpCount -= this._commandSize(this.undoStack.shift());
+                    }}
+                    this.updateHistoryButtons();
+                }}
+
+                _commandSize(command) {{
+                    return command.type === 'batch' ? command.commands.length : 1;
+                }}
+
+                beginHistoryBatch() {{
+                    if (this.isReplayingHistory) return;
+                    if (this.historyBatchDepth++ === 0) this.historyBatch = {{ type: 'batch', commands: [] }};
+                }}
+
+                endHistoryBatch() {{
+                    if (this.isReplayingHistory || this.historyBatchDepth === 0) return;
+                    if (--this.historyBatchDepth > 0) return;
+                    const batch = this.historyBatch;
+                    this.historyBatch = null;
+                    if (batch.commands.length === 1) {{
+                        this._pushUndo(batch.commands[0]);
+                    }} else if (batch.commands.length > 1) {{
+                        batch.time = Date.now();
+                        this._pushUndo(batch);
+                    }}
+                }}
+
+                resetHistory() {{
+                    this.undoStack = [];
+                    this.redoStack = [];
+                    this.historyOpCount = 0;
+                    this.updateHistoryButtons();
+                }}
+
+                updateHistoryButtons() {{
+                    this.undoBtn.disabled = this.undoStack.length === 0;
+                    this.redoBtn.disabled = this.redoStack.length === 0;
+                }}
+
+                undo() {{
+                    const command = this.undoStack.pop();
+                    if (!command) return;
+                    this.historyOpCount -= this._commandSize(command);
+                    this._replayCommand(command, true);
+                    this.redoStack.push(command);
+                    this.updateHistoryButtons();
+                }}
+
+                redo() {{
+                    const command = this.redoStack.pop();
+                    if (!command) return;
+                    this._replayCommand(command, false);
+                    this.undoStack.push(command);
+                    this.historyOpCount += this._commandSize(command);
+                    this.updateHistoryButtons();
+                }}
+
+                _replayCommand(command, reverse) {{
+                    this.isReplayingHistory = true;
+                    try {{
+                        this._applyCommand(command, reverse);
+                    }} finally {{
+                        this.isReplayingHistory = false;
+                    }}
+                    if (!this.nodes.has(this.selectedNodeId)) this.selectNode(AWS_CENTER_ID);
+                    this.updateStats();
+                }}
+
+                _applyCommand(command, reverse) {{
+                    switch (command.type) {{
+                        case 'batch': {{
+                            const commands = reverse ? command.commands.slice().reverse() : command.commands;
+                            commands.forEach(c => this._applyCommand(c, reverse));
+                            break;
+                        }}
+                        case 'add':
+                            if (reverse) this.removeNode(command.node.id); else this.restoreNode(command.node);
+                            break;
+                        case 'remove':
+                            if (reverse) this.restoreNode(command.node); else this.removeNode(command.node.id);
+                            break;
+                        case 'move': {{
+                            const position = reverse ? command.from : command.to;
+                            this.moveNodeTo(command.id, position.x, position.y);
+                            if (this.autoLayoutEnabled) this.layoutSubtreeAt(command.id);
+                            break;
+                        }}
+                        case 'reparent':
+                            this.reparentNode(command.id, reverse ? command.from : command.to);
+                            break;
+                    }}
+                }}
+
+                removeNode(nodeId) {{
+                    const node = this.nodes.get(nodeId);
+                    if (!node) return;
+                    document.getElementById(nodeId)?.remove();
+                    this._removeEdge(node.parentId, nodeId);
+                    this.getChildIds(nodeId).forEach(childId => this._removeEdge(nodeId, childId));
+                    this.invalidateLayout(node.parentId, false);
+                    this._unindexChild(node.parentId, nodeId);
+                    this.layoutExtents.delete(nodeId);
+                    this.layoutSides.delete(nodeId);
+                    this.nodeWidths.delete(nodeId);
+                    this.nodes.delete(nodeId);
+                    if (this.selectedNodeId === nodeId) this.selectedNodeId = null;
+                    this.recordHistory({{ type: 'remove', node }});
+                }}
+
+                restoreNode(node) {{
+                    this.nodes.set(node.id, node);
+                    this._indexChild(node.parentId, node.id);
+                    this.renderNode(node);
+                    this.refreshParentEdge(node.id);
+                    this.getChildIds(node.id).forEach(childId => this.refreshParentEdge(childId));
+                    this.invalidateLayout(node.id, true);
+                    this.recordHistory({{ type: 'add', node }});
+                }}
+
+                moveNodeTo(nodeId, x, y) {{
+                    const node = this.nodes.get(nodeId);
+                    if (!node || (node.x === x && node.y === y)) return;
+                    const from = {{ x: node.x, y: node.y }};
+                    node.x = x;
+                    node.y = y;
+                    this.updateNodePosition(node);
+                    this.updateConnectedEdges(nodeId);
+                    this.recordHistory({{ type: 'move', id: nodeId, from, to: {{ x, y }} }});
+                }}
+
+                _isInSubtree(nodeId, rootId) {{
+                    // Sobe pelos pais a partir de nodeId; o conjunto de vistos encerra a subida em mapas já com ciclo
+                    const seen = new Set();
+                    for (let id = nodeId; id && !seen.has(id); id = this.nodes.get(id)?.parentId) {{
+                        if (id === rootId) return true;
+                        seen.add(id);
+                    }}
+                    return false;
+                }}
+
+                reparentNode(nodeId, newParentId) {{
+                    const node = this.nodes.get(nodeId);
+                    if (!node || node.parentId === newParentId) return;
+                    // Pai dentro da própria subárvore criaria um ciclo (ex.: dois editores trocando A e B ao mesmo tempo)
+                    if (newParentId && this._isInSubtree(newParentId, nodeId)) return;
+                    const oldParentId = node.parentId;
+                    this._removeEdge(oldParentId, nodeId);
+                    this.invalidateLayout(oldParentId, false);
+                    this._unindexChild(oldParentId, nodeId);
+                    node.parentId = newParentId;
+                    this._indexChild(newParentId, nodeId);
+                    this.refreshParentEdge(nodeId);
+                    this.invalidateLayout(nodeId, true);
+                    this.recordHistory({{ type: 'reparent', id: nodeId, from: oldParentId, to: newParentId }});
+                }}
+
+                _removeEdge(sourceId, targetId) {{
+                    if (!sourceId) return;
+                    const edgeId = `edge_${{sourceId}}_${{targetId}}`;
+                    document.getElementById(edgeId)?.remove();
+                    this.edges.delete(edgeId);
+                }}
+
                 updateNodePosition(nodeData) {{
                     const group = document.getElementById(nodeData.id);
                     if (group) {{
@@ -986,82 +1758,259 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                 }}
 
                 updateConnectedEdges(nodeId) {{
-                    const edgesToRemove = [];
-                    this.edges.forEach((edge, edgeId) => {{
-                        if (edge.source === nodeId || edge.target === nodeId) {{
-                            edgesToRemove.push(edgeId);
-                            const edgeElement = document.getElementById(edgeId);
-                            if (edgeElement) edgeElement.remove();
-                        }}
-                    }});
-                    edgesToRemove.forEach(edgeId => this.edges.delete(edgeId));
+                    this.refreshParentEdge(nodeId);
+                    this.getChildIds(nodeId).forEach(childId => this.refreshParentEdge(childId));
+                }}
 
+                refreshParentEdge(nodeId) {{
                     const nodeData = this.nodes.get(nodeId);
-                    if (nodeData && nodeData.parentId && this.nodes.has(nodeData.parentId)) {{
-                        if (nodeData.id !== nodeData.parentId) {{ 
-                           this.addEdge(nodeData.parentId, nodeId);
-                        }}
+                    if (!nodeData || !nodeData.parentId || nodeData.parentId === nodeId || !this.nodes.has(nodeData.parentId)) return;
+                    const edgeId = `edge_${{nodeData.parentId}}_${{nodeId}}`;
+                    const edgeData = this.edges.get(edgeId);
+                    if (edgeData) {{
+                        this.renderEdge(edgeData);
+                    }} else {{
+                        this.addEdge(nodeData.parentId, nodeId);
                     }}
-                    this.nodes.forEach(childNode => {{
-                        if (childNode.parentId === nodeId) {{
-                             if (childNode.id !== nodeId) {{ 
-                                this.addEdge(nodeId, childNode.id);
-                             }}
-                        }}
-                    }});
                 }}
 
-                clearAllNodes() {{
-                    if (!confirm(`Limpar todos os nós (exceto AWS central)? O mapa atual será perdido.`)) return;
+                // ---------- Índice de filhos ----------
 
-                    this.nodesG.innerHTML = ''; 
-                    this.edgesG.innerHTML = ''; 
-                    
-                    this.nodes.clear();
-                    this.edges.clear();
-                    
-                    this.addCentralAWSNode(); 
-                    this.selectNode(AWS_CENTER_ID); 
-                    this.updateStats();
-                    this.showNotification('Mapa limpo. Nó central AWS restaurado.', 'success');
+                getChildIds(parentId) {{
+                    const children = this.childrenIndex.get(parentId);
+                    return children ? Array.from(children) : [];
                 }}
 
-                updateViewBoxAttribute() {{
-                    this.canvas.setAttribute('viewBox',
-                        `${{this.currentViewBox.x}} ${{this.currentViewBox.y}} ${{this.currentViewBox.width}} ${{this.currentViewBox.height}}`);
+                _indexChild(parentId, childId) {{
+                    if (!parentId || parentId === childId) return;
+                    if (!this.childrenIndex.has(parentId)) this.childrenIndex.set(parentId, new Set());
+                    this.childrenIndex.get(parentId).add(childId);
                 }}
 
-                resetView() {{
-                    this.currentViewBox = {{ ...this.initialViewBox }};
-                    if (this.nodes.has(AWS_CENTER_ID)) {{
-                        const centralNode = this.nodes.get(AWS_CENTER_ID);
-                        this.currentViewBox.x = centralNode.x - this.initialViewBox.width / 2;
-                        this.currentViewBox.y = centralNode.y - this.initialViewBox.height / 2;
+                _unindexChild(parentId, childId) {{
+                    const children = this.childrenIndex.get(parentId);
+                    if (children) children.delete(childId);
+                }}
+
+                // ---------- Layout automático incremental ----------
+                // Cada nó guarda em cache a extensão vertical da sua subárvore. Uma edição no nó X
+                // invalida apenas X e seus ancestrais; no próximo frame, o layout desce pelo caminho
+                // raiz -> X, desloca (sem recalcular) os irmãos cuja posição mudou e recalcula só a subárvore de X.
+
+                toggleAutoLayout() {{
+                    this.autoLayoutEnabled = !this.autoLayoutEnabled;
+                    this.autoLayoutBtn.textContent = this.autoLayoutEnabled ? '🌳Auto-organizar: ON' : '🌳Auto-organizar';
+                    if (this.autoLayoutEnabled) {{
+                        this.resetLayoutCache();
+                        this.invalidateLayout(AWS_CENTER_ID, true);
+                        this.showNotification('Layout automático ativado.', 'success');
+                    }} else {{
+                        this.showNotification('Layout automático desativado.', 'info');
                     }}
-                    this.updateViewBoxAttribute();
-                    this.showNotification('Visualização resetada!', 'success');
                 }}
 
-                updateStats() {{
-                    const serviceNodesCount = Array.from(this.nodes.values()).filter(n => !n.isCentral).length;
-                    const categoriesInMap = new Set(
-                        Array.from(this.nodes.values())
-                             .filter(n => !n.isCentral && n.category)
-                             .map(s => s.category)
-                    );
-                    document.getElementById('totalServices').textContent = serviceNodesCount;
-                    document.getElementById('totalCategories').textContent = categoriesInMap.size;
+                resetLayoutCache() {{
+                    this.layoutExtents.clear();
+                    this.layoutSides.clear();
+                    this.layoutPathIds.clear();
+                    this.layoutSubtreeIds.clear();
                 }}
 
-                showTooltip(event, nodeData) {{
-                    if (nodeData.isCentral) return;
-                    this.tooltip.innerHTML = `
-                        <div style="font-weight: bold; margin-bottom: 8px; color: #FF9900;">${{nodeData.name}}</div>
-                        <div style="margin-bottom: 6px;"><strong>Categoria:</strong> ${{nodeData.category}}</div>
-                        <div><strong>Descrição:</strong> ${{nodeData.description || 'N/A'}}</div>
-                    `;
-                    this.tooltip.style.display = 'block';
-                    this.updateTooltipPosition(event);
+                invalidateLayout(nodeId, includeSubtree) {{
+                    if (!this.autoLayoutEnabled || !nodeId || !this.nodes.has(nodeId)) return;
+                    let currentId = nodeId;
+                    let guard = this.nodes.size;
+                    while (currentId && this.nodes.has(currentId) && guard-- >= 0) {{
+                        this.layoutExtents.delete(currentId);
+                        this.layoutPathIds.add(currentId);
+                        currentId = this.nodes.get(currentId).parentId;
+                    }}
+                    if (includeSubtree) this.layoutSubtreeIds.add(nodeId);
+                    if (!this.layoutFrameRequested) {{
+                        this.layoutFrameRequested = true;
+                        requestAnimationFrame(() => this.flushLayout());
+                    }}
+                }}
+
+                getNodeSlotHeight(nodeId) {{
+                    return nodeId === AWS_CENTER_ID ? 90 : 52;
+                }}
+
+                getNodeHalfWidth(nodeId) {{
+                    if (nodeId === AWS_CENTER_ID) return 45;
+                    return (this.nodeWidths.get(nodeId) || 100) / 2;
+                }}
+
+                getSubtreeExtent(nodeId) {{
+                    const cached = this.layoutExtents.get(nodeId);
+                    if (cached !== undefined) return cached;
+                    let childrenExtent = 0;
+                    this.getChildIds(nodeId).forEach(childId => {{
+                        childrenExtent += this.getSubtreeExtent(childId);
+                    }});
+                    const extent = Math.max(this.getNodeSlotHeight(nodeId), childrenExtent);
+                    this.layoutExtents.set(nodeId, extent);
+                    return extent;
+                }}
+
+                getRootSide(childId) {{
+                    let side = this.layoutSides.get(childId);
+                    if (side === undefined) {{
+                        let rightExtent = 0, leftExtent = 0;
+                        this.layoutSides.forEach((s, id) => {{
+                            if (id === childId || !this.nodes.has(id)) return;
+                            if (s > 0) rightExtent += this.getSubtreeExtent(id);
+                            else leftExtent += this.getSubtreeExtent(id);
+                        }});
+                        side = rightExtent <= leftExtent ? 1 : -1;
+                        this.layoutSides.set(childId, side);
+                    }}
+                    return side;
+                }}
+
+                flushLayout() {{
+                    this.layoutFrameRequested = false;
+                    if (!this.autoLayoutEnabled || !this.nodes.has(AWS_CENTER_ID)) return;
+                    const movedIds = [];
+                    const root = this.nodes.get(AWS_CENTER_ID);
+                    const rootChildren = this.getChildIds(AWS_CENTER_ID);
+                    // Garante o lado de cada filho da raiz antes de empilhar
+                    rootChildren.forEach(childId => this.getRootSide(childId));
+                    [1, -1].forEach(side => {{
+                        const sideChildren = rootChildren.filter(childId => this.layoutSides.get(childId) === side);
+                        this._placeChildren(AWS_CENTER_ID, root, sideChildren, side,
+                            this.layoutSubtreeIds.has(AWS_CENTER_ID), movedIds);
+                    }});
+                    this.layoutPathIds.clear();
+                    this.layoutSubtreeIds.clear();
+                    movedIds.forEach(id => this.refreshParentEdge(id));
+                }}
+
+                _placeChildren(parentId, parentNode, childIds, direction, fullLayout, movedIds) {{
+                    let totalExtent = 0;
+                    childIds.forEach(childId => {{
+                        totalExtent += this.getSubtreeExtent(childId);
+                    }});
+                    let top = parentNode.y - totalExtent / 2;
+                    childIds.forEach(childId => {{
+                        const extent = this.getSubtreeExtent(childId);
+                        const childNode = this.nodes.get(childId);
+                        const targetX = parentNode.x + direction * (this.getNodeHalfWidth(parentId) + 70 + this.getNodeHalfWidth(childId));
+                        const targetY = top + extent / 2;
+                        top += extent;
+                        if (fullLayout || this.layoutSubtreeIds.has(childId)) {{
+                            this._layoutSubtree(childId, targetX, targetY, direction, movedIds);
+                        }} else if (this.layoutPathIds.has(childId)) {{
+                            this._moveNodeTo(childNode, targetX, targetY, movedIds);
+                            this._placeChildren(childId, childNode, this.getChildIds(childId), direction, false, movedIds);
+                        }} else {{
+                            const dx = targetX - childNode.x;
+                            const dy = targetY - childNode.y;
+                            if (Math.abs(dx) > 0.5 || Math.abs(dy) > 0.5) this._shiftSubtree(childId, dx, dy, movedIds);
+                        }}
+                    }});
+                }}
+
+                _layoutSubtree(nodeId, x, y, direction, movedIds) {{
+                    const node = this.nodes.get(nodeId);
+                    this._moveNodeTo(node, x, y, movedIds);
+                    this._placeChildren(nodeId, node, this.getChildIds(nodeId), direction, true, movedIds);
+                }}
+
+                _shiftSubtree(nodeId, dx, dy, movedIds) {{
+                    const stack = [nodeId];
+                    while (stack.length > 0) {{
+                        const node = this.nodes.get(stack.pop());
+                        if (!node) continue;
+                        this._moveNodeTo(node, node.x + dx, node.y + dy, movedIds);
+                        this.getChildIds(node.id).forEach(childId => stack.push(childId));
+                    }}
+                }}
+
+                _moveNodeTo(node, x, y, movedIds) {{
+                    if (node.x === x && node.y === y) return;
+                    node.x = x;
+                    node.y = y;
+                    this.updateNodePosition(node);
+                    this.queueAutosaveOp({{ type: 'move', id: node.id }});
+                    this.queueCollabOp({{ type: 'move', id: node.id }});
+                    movedIds.push(node.id);
+                }}
+
+                layoutSubtreeAt(nodeId) {{
+                    // Após arrastar X, só os descendentes de X acompanham a nova posição.
+                    const node = this.nodes.get(nodeId);
+                    if (!node) return;
+                    let direction = 1;
+                    if (node.isCentral) {{
+                        this.invalidateLayout(AWS_CENTER_ID, true);
+                        return;
+                    }}
+                    const parent = this.nodes.get(node.parentId);
+                    if (parent) direction = node.x >= parent.x ? 1 : -1;
+                    if (parent && parent.isCentral) this.layoutSides.set(nodeId, direction);
+                    const movedIds = [node.id];
+                    this._placeChildren(nodeId, node, this.getChildIds(nodeId), direction, true, movedIds);
+                    movedIds.forEach(id => this.refreshParentEdge(id));
+                }}
+
+                clearAllNodes() {{
+                    if (!confirm(`Limpar todos os nós (exceto AWS central)? Use "Desfazer" para recuperá-los.`)) return;
+
+                    this.beginHistoryBatch();
+                    Array.from(this.nodes.keys()).forEach(nodeId => {{
+                        if (nodeId !== AWS_CENTER_ID) this.removeNode(nodeId);
+                    }});
+                    if (!this.nodes.has(AWS_CENTER_ID)) {{
+                        this.addCentralAWSNode();
+                    }} else {{
+                        this.moveNodeTo(AWS_CENTER_ID, this.centerX, this.centerY);
+                    }}
+                    this.endHistoryBatch();
+                    this.resetLayoutCache();
+
+                    this.selectNode(AWS_CENTER_ID); 
+                    this.updateStats();
+                    this.showNotification('Mapa limpo. Nó central AWS restaurado.', 'success');
+                }}
+
+                updateViewBoxAttribute() {{
+                    this.canvas.setAttribute('viewBox',
+                        `${{this.currentViewBox.x}} ${{this.currentViewBox.y}} ${{this.currentViewBox.width}} ${{this.currentViewBox.height}}`);
+                    this.queueAutosaveView();
+                }}
+
+                resetView() {{
+                    this.currentViewBox = {{ ...this.initialViewBox }};
+                    if (this.nodes.has(AWS_CENTER_ID)) {{
+                        const centralNode = this.nodes.get(AWS_CENTER_ID);
+                        this.currentViewBox.x = centralNode.x - this.initialViewBox.width / 2;
+                        this.currentViewBox.y = centralNode.y - this.initialViewBox.height / 2;
+                    }}
+                    this.updateViewBoxAttribute();
+                    this.showNotification('Visualização resetada!', 'success');
+                }}
+
+                updateStats() {{
+                    const serviceNodesCount = Array.from(this.nodes.values()).filter(n => !n.isCentral).length;
+                    const categoriesInMap = new Set(
+                        Array.from(this.nodes.values())
+                             .filter(n => !n.isCentral && n.category)
+                             .map(s => s.category)
+                    );
+                    document.getElementById('totalServices').textContent = serviceNodesCount;
+                    document.getElementById('totalCategories').textContent = categoriesInMap.size;
+                }}
+
+                showTooltip(event, nodeData) {{
+                    if (nodeData.isCentral) return;
+                    this.tooltip.innerHTML = `
+                        <div style="font-weight: bold; margin-bottom: 8px; color: #FF9900;">${{nodeData.name}}</div>
+                        <div style="margin-bottom: 6px;"><strong>Categoria:</strong> ${{nodeData.category}}</div>
+                        <div><strong>Descrição:</strong> ${{nodeData.description || 'N/A'}}</div>
+                    `;
+                    this.tooltip.style.display = 'block';
+                    this.updateTooltipPosition(event);
                 }}
                 updateTooltipPosition(event) {{
                     this.tooltip.style.left = (event.pageX + 15) + 'px';
@@ -1075,7 +2024,7 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     setTimeout(() => {{ this.notification.classList.remove('show'); }}, 3500);
                 }}
 
-                saveMindMapState() {{
+                async saveMindMapState() {{
                     if (this.nodes.size === 0 ){{
                        this.showNotification("Mapa está vazio. Nada para salvar.", "info");
                        return;
@@ -1089,18 +2038,42 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                         }}
                     }}
 
-                    const nodesArray = Array.from(this.nodes.values());
-                    const dataToSave = {{
-                        nodes: nodesArray,
-                        viewBox: this.currentViewBox 
-                    }};
+                    const format = this.saveFormatSelect.value;
+                    if (this.isComponent && serverMapsEnabled) {{
+                        // Com MINDMAP_SERVER_MAPS o mapa vai para a pasta de mapas salvos do servidor em vez de virar download
+                        const state = format === 'legacy'
+                            ? {{ nodes: Array.from(this.nodes.values()), viewBox: this.currentViewBox }}
+                            : this.serializeMapState();
+                        this.sendComponentEvent('save', {{ state, format }});
+                        this.showNotification("Mapa enviado para salvar no servidor.", "success");
+                        return;
+                    }}
+                    const dateStamp = new Date().toISOString().slice(0,10).replace(/-/g,'');
+                    let blob;
+                    let fileName = `aws-mindmap-estado-${{dateStamp}}.json`;
+                    if (format === 'legacy') {{
+                        const dataToSave = {{
+                            nodes: Array.from(this.nodes.values()),
+                            viewBox: this.currentViewBox 
+                        }};
+                        blob = new Blob([JSON.stringify(dataToSave, null, 2)], {{ type: "application/json" }});
+                    }} else {{
+                        const jsonString = JSON.stringify(this.serializeMapState());
+                        blob = new Blob([jsonString], {{ type: "application/json" }});
+                        if (format === 'gzip') {{
+                            if (typeof CompressionStream === 'undefined') {{
+                                this.showNotification("Navegador sem suporte a gzip; salvando JSON compacto sem compressão.", "warning");
+                            }} else {{
+                                blob = await new Response(blob.stream().pipeThrough(new CompressionStream('gzip'))).blob();
+                                fileName += '.gz';
+                            }}
+                        }}
+                    }}
 
-                    const jsonString = JSON.stringify(dataToSave, null, 2);
-                    const blob = new Blob([jsonString], {{ type: "application/json" }});
                     const url = URL.createObjectURL(blob);
                     const a = document.createElement("a");
                     a.href = url;
-                    a.download = `aws-mindmap-estado-${{new Date().toISOString().slice(0,10).replace(/-/g,'')}}.json`;
+                    a.download = fileName;
                     document.body.appendChild(a);
                     a.click();
                     document.body.removeChild(a);
@@ -1112,17 +2085,16 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     const file = event.target.files[0];
                     if (!file) return;
 
-                    if (file.type !== "application/json") {{
-                        this.showNotification("Por favor, selecione um arquivo JSON (.json) válido.", "error");
+                    if (!/\.(json|gz|deflate)$/i.test(file.name) && file.type !== "application/json") {{
+                        this.showNotification("Por favor, selecione um arquivo de mapa (.json ou .json.gz) válido.", "error");
                         event.target.value = null;
                         return;
                     }}
 
-                    const reader = new FileReader();
-                    reader.onload = (e) => {{
+                    file.arrayBuffer().then(async (buffer) => {{
                         try {{
-                            const fileContent = e.target.result;
-                            const loadedData = JSON.parse(fileContent);
+                            const storedData = await this.parseStateBytes(buffer);
+                            const loadedData = this.expandMapState(storedData);
 
                             if (!loadedData.nodes || !Array.isArray(loadedData.nodes)) {{
                                 throw new Error("Formato de nós inválido.");
@@ -1138,25 +2110,914 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                             }} 
                             
                             if (!confirm("Carregar este mapa? O mapa atual será substituído.")) {{
-                                event.target.value = null;
                                 return;
                             }}
 
                             this.loadMindMapState(loadedData);
-                            this.showNotification("Mapa carregado com sucesso!", "success");
+                            this.queueAutosaveReset();
+                            this.publishMapToCollab();
+                            if (loadedData.missingRefs && loadedData.missingRefs.length > 0) {{
+                                this.showNotification(`Mapa carregado, mas ${{loadedData.missingRefs.length}} serviço(s) não existem mais no catálogo.`, "warning");
+                            }} else if (storedData.catalog && storedData.catalog.hash && storedData.catalog.hash !== catalogInfo.hash) {{
+                                this.showNotification("Mapa carregado. O catálogo mudou desde que ele foi salvo; dados dos serviços foram atualizados.", "warning");
+                            }} else {{
+                                this.showNotification("Mapa carregado com sucesso!", "success");
+                            }}
 
                         }} catch (err) {{
-                            console.error("Erro ao carregar ou parsear o arquivo JSON:", err);
+                            console.error("Erro ao carregar ou parsear o arquivo:", err);
                             this.showNotification(`Erro ao carregar arquivo: ${{err.message}}`, "error");
                         }} finally {{
                             event.target.value = null; 
                         }}
-                    }};
-                    reader.onerror = () => {{
+                    }}, () => {{
                         this.showNotification("Erro ao ler o arquivo.", "error");
                         event.target.value = null;
+                    }});
+                }}
+
+                // ---------- Ponte com o Streamlit (componente bidirecional, ver mindmap/component.py) ----------
+                // Protocolo do streamlit-component-lib via postMessage. Os eventos ficam numa fila até o Python
+                // confirmar (args ackSession/ackSeq), pois valores enviados em sequência rápida podem se sobrepor.
+                // Fora do componente (iframe srcdoc) nada é enviado e o mapa funciona sozinho.
+
+                initComponentBridge() {{
+                    this.isComponent = new URLSearchParams(window.location.search).has('streamlitUrl');
+                    if (!this.isComponent) return;
+                    this.componentSessionId = `${{Date.now().toString(36)}}${{Math.random().toString(36).slice(2, 6)}}`;
+                    window.addEventListener('message', (event) => {{
+                        const data = event.data;
+                        if (data && data.type === 'streamlit:render') this.handleComponentRender(data.args || {{}});
+                    }});
+                    this._postToStreamlit('streamlit:componentReady', {{ apiVersion: 1 }});
+                    this._postToStreamlit('streamlit:setFrameHeight', {{ height: COMPONENT_FRAME_HEIGHT }});
+                }}
+
+                _postToStreamlit(type, payload) {{
+                    window.parent.postMessage({{ isStreamlitMessage: true, type, ...payload }}, '*');
+                }}
+
+                sendComponentEvent(type, payload = {{}}) {{
+                    if (!this.isComponent) return false;
+                    this.componentOutbox.push({{ seq: ++this.componentEventSeq, type, ...payload }});
+                    this._postToStreamlit('streamlit:setComponentValue', {{
+                        value: {{ session: this.componentSessionId, events: this.componentOutbox }},
+                        dataType: 'json'
+                    }});
+                    return true;
+                }}
+
+                handleComponentRender(args) {{
+                    if (args.sidecarToken && !this.sidecarToken) {{
+                        // Token da sessão do Streamlit: sem ele o servidor auxiliar recusa as requisições
+                        this.sidecarToken = args.sidecarToken;
+                        this.initAutosave();
+                    }}
+                    if (args.collabToken && !this.collabToken) {{
+                        this.collabToken = args.collabToken;
+                        if (this.collabRoom && !this.collabSocket) this._connectCollab();
+                    }}
+                    if (args.ackSession === this.componentSessionId && args.ackSeq) {{
+                        this.componentOutbox = this.componentOutbox.filter(event => event.seq > args.ackSeq);
+                    }}
+                    const request = args.loadMap;
+                    if (!request || request.nonce === this.lastLoadNonce) return;
+                    this.lastLoadNonce = request.nonce;
+                    try {{
+                        const loadedData = this.expandMapState(request.state);
+                        if (!loadedData || !Array.isArray(loadedData.nodes)) throw new Error("Formato de nós inválido.");
+                        this.loadMindMapState(loadedData);
+                        this.queueAutosaveReset();
+                        this.publishMapToCollab();
+                        this.showNotification(`Mapa "${{request.name}}" carregado.`, 'success');
+                    }} catch (err) {{
+                        this.showNotification(`Erro ao carregar mapa: ${{err.message}}`, 'error');
+                    }}
+                    this.sendComponentEvent('loaded', {{ nonce: request.nonce }});
+                }}
+
+                notifySelection() {{
+                    if (!this.isComponent) return;
+                    clearTimeout(this.selectEventTimer);
+                    // Agrupa cliques seguidos: cada valor enviado provoca um rerun do script
+                    this.selectEventTimer = setTimeout(() => {{
+                        if (this.selectedNodeId === this.lastSentSelection) return;
+                        this.lastSentSelection = this.selectedNodeId;
+                        this.sendComponentEvent('select', {{ nodeId: this.selectedNodeId }});
+                    }}, 400);
+                }}
+
+                // ---------- Coedição em tempo real (hub WebSocket em mindmap/collab.py) ----------
+                // Operações locais recebem carimbo de Lamport [contador, cliente] e vão em lotes para a sala;
+                // operações remotas passam pelos mesmos primitivos (restoreNode/moveNodeTo/...), com
+                // último-escritor-vence por nó e campo (existência, posição, pai), sem recarregar o mapa.
+
+                resolveCollabUrl() {{
+                    const url = this._resolveAuxUrl(collabConfig, 'wss', 'ws');
+                    if (collabConfig && !url) {{
+                        this.showServerNotice('Coedição desligada: defina MINDMAP_COLLAB_PUBLIC_URL (wss) no servidor');
+                    }}
+                    return url;
+                }}
+
+                initCollab() {{
+                    this.collabBaseUrl = this.resolveCollabUrl();
+                    if (!this.collabBaseUrl || typeof WebSocket === 'undefined') {{
+                        this.collabBtn.style.display = 'none';
+                        return;
+                    }}
+                    this.collabBtn.addEventListener('click', () => this.promptCollabRoom());
+                    let room = null;
+                    try {{
+                        room = new URLSearchParams(window.parent.location.search).get('sala');
+                    }} catch (e) {{ /* iframe sem acesso à página pai */ }}
+                    room = room || new URLSearchParams(window.location.search).get('sala');
+                    if (room && /^[A-Za-z0-9_-]{{1,64}}$/.test(room)) this.joinCollabRoom(room);
+                }}
+
+                promptCollabRoom() {{
+                    if (this.collabRoom) {{
+                        if (confirm(`Sair da sala "${{this.collabRoom}}"? O mapa continua aberto aqui.`)) this.leaveCollabRoom();
+                        return;
+                    }}
+                    const input = prompt('Nome da sala para editar em grupo (letras, números, "-" ou "_"):',
+                        Math.random().toString(36).slice(2, 8));
+                    if (!input) return;
+                    const room = input.trim();
+                    if (!/^[A-Za-z0-9_-]{{1,64}}$/.test(room)) {{
+                        this.showNotification('Nome de sala inválido. Use letras, números, "-" ou "_".', 'error');
+                        return;
+                    }}
+                    this.joinCollabRoom(room);
+                }}
+
+                joinCollabRoom(room) {{
+                    this.collabRoom = room;
+                    this.collabJoined = false;
+                    this.collabBtn.textContent = `👥Sala: ${{room}}`;
+                    this.collabBtn.title = `Abra o app com ?sala=${{room}} em outro navegador para editar junto`;
+                    this._connectCollab();
+                }}
+
+                leaveCollabRoom() {{
+                    const socket = this.collabSocket;
+                    this.collabRoom = null;
+                    this.collabSocket = null;
+                    if (socket) socket.close();
+                    clearTimeout(this.collabTimer);
+                    this.collabTimer = null;
+                    this.collabRegisters.clear();
+                    this.collabOutbox = [];
+                    this.collabMoves.clear();
+                    this.collabBtn.textContent = '👥Coeditar';
+                    this.collabBtn.title = '';
+                    this.updateCollabEditors(0);
+                }}
+
+                _connectCollab() {{
+                    // Sem o token da sessão o hub recusa a entrada; handleComponentRender conecta quando ele chegar
+                    if (!this.collabToken) return;
+                    const room = encodeURIComponent(this.collabRoom);
+                    const socket = new WebSocket(`${{this.collabBaseUrl}}/collab/${{room}}?token=${{encodeURIComponent(this.collabToken)}}`);
+                    this.collabSocket = socket;
+                    socket.onopen = () => {{
+                        this.collabRetryMs = 1000;
+                    }};
+                    socket.onmessage = (event) => {{
+                        if (this.collabSocket === socket) this.handleCollabMessage(JSON.parse(event.data));
+                    }};
+                    socket.onclose = () => {{
+                        if (this.collabSocket !== socket) return;
+                        this.collabSocket = null;
+                        this.updateCollabEditors(0);
+                        setTimeout(() => {{
+                            if (this.collabRoom && !this.collabSocket) this._connectCollab();
+                        }}, this.collabRetryMs);
+                        this.collabRetryMs = Math.min(this.collabRetryMs * 2, 30000);
+                    }};
+                }}
+
+                handleCollabMessage(message) {{
+                    if (message.type === 'snapshot') {{
+                        this.applyCollabSnapshot(message);
+                    }} else if (message.type === 'ops') {{
+                        this.applyRemoteOps(message.ops);
+                    }} else if (message.type === 'presence') {{
+                        this.updateCollabEditors(message.editors);
+                    }} else if (message.type === 'error') {{
+                        console.warn('[MINDMAP COLLAB]', message.message);
+                    }}
+                }}
+
+                updateCollabEditors(count) {{
+                    this.collabStat.style.display = count > 0 ? '' : 'none';
+                    this.collabEditorsEl.textContent = count;
+                }}
+
+                applyCollabSnapshot(snapshot) {{
+                    this.collabClock = Math.max(this.collabClock, snapshot.clock || 0);
+                    const entries = snapshot.nodes || [];
+                    const roomHasContent = entries.some(entry => entry.alive && !entry.node.isCentral);
+                    if (!this.collabJoined && roomHasContent) {{
+                        // Primeira entrada numa sala com conteúdo: o mapa local dá lugar ao da sala
+                        this.collabRegisters.clear();
+                        this.collabOutbox = [];
+                        this.collabMoves.clear();
+                        entries.forEach(entry => this.collabRegisters.set(entry.node.id, {{ ...entry.ts, removed: !entry.alive }}));
+                        const nodes = entries.filter(entry => entry.alive).map(entry => ({{ ...entry.node }}));
+                        this.isApplyingRemote = true;
+                        try {{
+                            this.loadMindMapState({{ nodes, viewBox: this.currentViewBox }});
+                        }} finally {{
+                            this.isApplyingRemote = false;
+                        }}
+                        this.queueAutosaveReset();
+                        this.showNotification(`Você entrou na sala "${{this.collabRoom}}".`, 'success');
+                    }} else {{
+                        // Sala vazia ou reconexão: mescla o estado da sala e publica o que só existe aqui
+                        const ops = [];
+                        entries.forEach(entry => {{
+                            const id = entry.node.id;
+                            if (entry.ts.alive) ops.push(entry.alive ? {{ op: 'add', ts: entry.ts.alive, node: entry.node }} : {{ op: 'remove', ts: entry.ts.alive, id }});
+                            if (entry.ts.pos) ops.push({{ op: 'move', ts: entry.ts.pos, id, x: entry.node.x, y: entry.node.y }});
+                            if (entry.ts.parent) ops.push({{ op: 'reparent', ts: entry.ts.parent, id, parentId: entry.node.parentId }});
+                        }});
+                        this.applyRemoteOps(ops);
+                        this.nodes.forEach(node => {{
+                            if (!this.collabRegisters.has(node.id)) this.queueCollabOp({{ type: 'add', node }});
+                        }});
+                        if (!this.collabJoined) this.showNotification(`Sala "${{this.collabRoom}}" criada com o mapa atual.`, 'success');
+                    }}
+                    this.collabJoined = true;
+                    this.updateCollabEditors(snapshot.editors);
+                    this.flushCollab();
+                }}
+
+                publishMapToCollab() {{
+                    // Mapa substituído localmente (arquivo, mapa salvo): a sala passa a refletir o mapa atual
+                    if (!this.collabRoom) return;
+                    this.collabRegisters.forEach((regs, id) => {{
+                        if (!regs.removed && !this.nodes.has(id)) this.queueCollabOp({{ type: 'remove', node: {{ id }} }});
+                    }});
+                    this.nodes.forEach(node => this.queueCollabOp({{ type: 'add', node }}));
+                }}
+
+                _collabRegs(id) {{
+                    let regs = this.collabRegisters.get(id);
+                    if (!regs) {{
+                        regs = {{ alive: null, pos: null, parent: null, removed: false }};
+                        this.collabRegisters.set(id, regs);
+                    }}
+                    return regs;
+                }}
+
+                _collabNewer(ts, current) {{
+                    return !current || ts[0] > current[0] || (ts[0] === current[0] && ts[1] > current[1]);
+                }}
+
+                queueCollabOp(command) {{
+                    if (!this.collabRoom || this.isApplyingRemote) return;
+                    const ts = [++this.collabClock, this.collabClientId];
+                    if (command.type === 'move') {{
+                        this._collabRegs(command.id).pos = ts;
+                        this.collabMoves.set(command.id, ts); // posição lida só no envio
+                    }} else if (command.type === 'add') {{
+                        const regs = this._collabRegs(command.node.id);
+                        regs.alive = regs.pos = regs.parent = ts;
+                        regs.removed = false;
+                        this.collabOutbox.push({{ op: 'add', ts, node: command.node }});
+                    }} else if (command.type === 'remove') {{
+                        const regs = this._collabRegs(command.node.id);
+                        regs.alive = ts;
+                        regs.removed = true;
+                        this.collabMoves.delete(command.node.id);
+                        this.collabOutbox.push({{ op: 'remove', ts, id: command.node.id }});
+                    }} else if (command.type === 'reparent') {{
+                        this._collabRegs(command.id).parent = ts;
+                        this.collabOutbox.push({{ op: 'reparent', ts, id: command.id, parentId: command.to }});
+                    }} else {{
+                        return;
+                    }}
+                    if (!this.collabTimer) this.collabTimer = setTimeout(() => this.flushCollab(), this.collabFlushMs);
+                }}
+
+                flushCollab() {{
+                    clearTimeout(this.collabTimer);
+                    this.collabTimer = null;
+                    const socket = this.collabSocket;
+                    if (!socket || socket.readyState !== WebSocket.OPEN || !this.collabJoined) return; // reenviado após o snapshot
+                    if (this.collabOutbox.length === 0 && this.collabMoves.size === 0) return;
+                    const ops = this.collabOutbox.map(entry => {{
+                        if (entry.op !== 'add') return entry;
+                        const node = entry.node;
+                        return {{ op: 'add', ts: entry.ts, node: {{
+                            id: node.id, name: node.name, category: node.category, description: node.description,
+                            x: this._roundCoordinate(node.x), y: this._roundCoordinate(node.y), parentId: node.parentId,
+                            isCustom: !!node.isCustom, isCentral: !!node.isCentral
+                        }} }};
+                    }});
+                    this.collabMoves.forEach((ts, id) => {{
+                        const node = this.nodes.get(id);
+                        if (node) ops.push({{ op: 'move', ts, id, x: this._roundCoordinate(node.x), y: this._roundCoordinate(node.y) }});
+                    }});
+                    this.collabOutbox = [];
+                    this.collabMoves.clear();
+                    socket.send(JSON.stringify({{ ops }}));
+                }}
+
+                applyRemoteOps(ops) {{
+                    this.isApplyingRemote = true;
+                    try {{
+                        ops.forEach(op => this._applyRemoteOp(op));
+                    }} finally {{
+                        this.isApplyingRemote = false;
+                    }}
+                    this.updateStats();
+                }}
+
+                _applyRemoteOp(op) {{
+                    if (!Array.isArray(op.ts)) return;
+                    this.collabClock = Math.max(this.collabClock, op.ts[0]);
+                    const id = op.op === 'add' ? (op.node && op.node.id) : op.id;
+                    if (!id) return;
+                    const regs = this._collabRegs(id);
+                    const dragging = this.draggedNode && this.draggedNode.id === id; // arraste local vence ao soltar
+                    if (op.op === 'add') {{
+                        const data = op.node;
+                        const x = Number(data.x) || 0;
+                        const y = Number(data.y) || 0;
+                        if (this._collabNewer(op.ts, regs.alive)) {{
+                            regs.alive = op.ts;
+                            regs.removed = false;
+                            if (!this.nodes.has(id)) {{
+                                regs.pos = regs.parent = op.ts;
+                                this.restoreNode({{
+                                    id, name: data.name || id, category: data.category || 'Outros',
+                                    description: data.description || '', x, y, parentId: data.parentId || null,
+                                    isCentral: !!data.isCentral, isCustom: !!data.isCustom
+                                }});
+                                return;
+                            }}
+                        }}
+                        if (this._collabNewer(op.ts, regs.pos)) {{
+                            regs.pos = op.ts;
+                            if (!dragging) this.moveNodeTo(id, x, y);
+                        }}
+                        if (this._collabNewer(op.ts, regs.parent)) {{
+                            regs.parent = op.ts;
+                            this.reparentNode(id, data.parentId || null);
+                        }}
+                    }} else if (op.op === 'remove' && this._collabNewer(op.ts, regs.alive)) {{
+                        regs.alive = op.ts;
+                        regs.removed = true;
+                        const node = this.nodes.get(id);
+                        if (node && !node.isCentral) {{
+                            if (dragging) this.draggedNode = null;
+                            this.removeNode(id);
+                        }}
+                    }} else if (op.op === 'move' && this._collabNewer(op.ts, regs.pos)) {{
+                        regs.pos = op.ts;
+                        if (!dragging) this.moveNodeTo(id, Number(op.x) || 0, Number(op.y) || 0);
+                    }} else if (op.op === 'reparent' && this._collabNewer(op.ts, regs.parent)) {{
+                        regs.parent = op.ts;
+                        this.reparentNode(id, op.parentId || null);
+                    }}
+                }}
+
+                // ---------- Métricas de desempenho (mindmap/client_metrics.py via sidecar) ----------
+                // Só as sessões sorteadas medem: nas outras os métodos ficam intactos e o custo é zero.
+                // As medidas viram histogramas por faixa de tamanho do mapa aqui mesmo e saem em lotes.
+
+                initPerfMetrics() {{
+                    const url = this.sidecarBaseUrl;
+                    if (!perfConfig || !url || !(Math.random() < perfConfig.amostra)) return;
+                    if (!window.performance || typeof performance.mark !== 'function' || typeof performance.measure !== 'function') return;
+                    this.perfSessionId = (window.crypto && crypto.randomUUID)
+                        ? crypto.randomUUID()
+                        : `${{Date.now().toString(36)}}-${{Math.random().toString(36).slice(2, 12)}}`;
+                    this.perfHistograms = {{}};
+                    this.perfPending = false;
+                    this.perfSeq = 0;
+                    perfConfig.operacoes.forEach(name => this._instrumentMethod(name));
+                    this._observeLongTasks();
+                    this.perfTimer = setInterval(() => this.flushPerfMetrics(), perfConfig.intervaloMs);
+                    const flushNow = () => this.flushPerfMetrics(true);
+                    window.addEventListener('pagehide', flushNow);
+                    document.addEventListener('visibilitychange', () => {{
+                        if (document.visibilityState === 'hidden') flushNow();
+                    }});
+                }}
+
+                _wrapMethod(name, start, finish) {{
+                    // Propriedade da instância: encobre o método da classe (ou um invólucro anterior) só nesta sessão
+                    const original = this[name];
+                    if (typeof original !== 'function') return () => {{}};
+                    const previous = Object.prototype.hasOwnProperty.call(this, name) ? original : null;
+                    this[name] = function (...args) {{
+                        const token = start();
+                        const done = () => finish(token);
+                        let result;
+                        try {{
+                            result = original.apply(this, args);
+                        }} catch (e) {{
+                            done();
+                            throw e;
+                        }}
+                        if (result && typeof result.then === 'function') {{
+                            result.then(done, done); // métodos assíncronos (downloadPDF) medem até o fim
+                        }} else {{
+                            done();
+                        }}
+                        return result;
+                    }};
+                    return () => {{
+                        if (previous) this[name] = previous;
+                        else delete this[name];
                     }};
-                    reader.readAsText(file);
+                }}
+
+                _instrumentMethod(name) {{
+                    this._wrapMethod(name, () => {{
+                        const mark = `mindmap:${{name}}:${{++this.perfSeq}}`;
+                        performance.mark(mark);
+                        return mark;
+                    }}, mark => this._finishPerfMeasure(name, mark));
+                }}
+
+                _finishPerfMeasure(name, mark) {{
+                    let duration;
+                    try {{
+                        const entry = performance.measure(`mindmap:${{name}}`, mark);
+                        if (entry) duration = entry.duration;
+                    }} catch (e) {{ /* marca descartada pelo navegador */ }}
+                    if (duration === undefined) {{
+                        const marks = performance.getEntriesByName(mark);
+                        duration = marks.length ? performance.now() - marks[0].startTime : 0;
+                    }}
+                    performance.clearMarks(mark);
+                    this._recordPerf(name, duration);
+                }}
+
+                _observeLongTasks() {{
+                    if (typeof PerformanceObserver === 'undefined'
+                        || !(PerformanceObserver.supportedEntryTypes || []).includes('longtask')) return;
+                    this.perfLongTaskObserver = new PerformanceObserver(list => {{
+                        list.getEntries().forEach(entry => this._recordPerf('longtask', entry.duration));
+                    }});
+                    this.perfLongTaskObserver.observe({{ type: 'longtask', buffered: true }});
+                }}
+
+                _recordPerf(name, duration) {{
+                    const size = this.nodes.size;
+                    let band = perfConfig.faixas[0][0];
+                    perfConfig.faixas.forEach(([label, minNodes]) => {{
+                        if (size >= minNodes) band = label;
+                    }});
+                    const byBand = this.perfHistograms[name] || (this.perfHistograms[name] = {{}});
+                    const histogram = byBand[band] || (byBand[band] = {{
+                        n: 0, soma: 0, max: 0, baldes: new Array(perfConfig.baldes.length + 1).fill(0)
+                    }});
+                    let bucket = 0;
+                    while (bucket < perfConfig.baldes.length && duration > perfConfig.baldes[bucket]) bucket++;
+                    histogram.baldes[bucket]++;
+                    histogram.n++;
+                    histogram.soma += duration;
+                    if (duration > histogram.max) histogram.max = duration;
+                    this.perfPending = true;
+                }}
+
+                flushPerfMetrics(leavingPage = false) {{
+                    // Sem o token da sessão o servidor recusa o lote: as medidas esperam nos histogramas
+                    if (!this.perfPending || !this.sidecarToken) return;
+                    const report = {{ versao: perfConfig.versao, sessao: this.perfSessionId, operacoes: this.perfHistograms }};
+                    this.perfHistograms = {{}};
+                    this.perfPending = false;
+                    // As medidas já estão nos histogramas; sem isso o buffer do navegador cresce a cada renderNode
+                    perfConfig.operacoes.forEach(name => performance.clearMeasures(`mindmap:${{name}}`));
+                    fetch(this.sidecarUrl('/metricas/cliente'), {{
+                        method: 'POST',
+                        headers: {{ 'Content-Type': 'text/plain;charset=UTF-8' }},
+                        body: JSON.stringify(report),
+                        keepalive: leavingPage
+                    }}).catch(() => {{ /* métricas perdidas não afetam o mapa */ }});
+                }}
+
+                // ---------- Painel de desempenho (Alt+Shift+D ou ?desempenho=1) ----------
+                // Desligado, só existe o atalho: nenhum elemento, laço de quadros ou invólucro de método.
+
+                initPerfOverlay() {{
+                    document.addEventListener('keydown', (e) => {{
+                        if (e.altKey && e.shiftKey && e.code === 'KeyD') {{
+                            e.preventDefault();
+                            this.togglePerfOverlay();
+                        }}
+                    }});
+                    let flag = null;
+                    try {{
+                        flag = new URLSearchParams(window.parent.location.search).get('desempenho');
+                    }} catch (e) {{ /* iframe sem acesso à página pai */ }}
+                    if (flag === null) flag = new URLSearchParams(window.location.search).get('desempenho');
+                    if (flag !== null && flag !== '0' && flag !== 'false') this.togglePerfOverlay(true);
+                }}
+
+                togglePerfOverlay(show = !this.perfOverlay) {{
+                    if (show === !!this.perfOverlay) return;
+                    if (!show) {{
+                        const overlay = this.perfOverlay;
+                        this.perfOverlay = null;
+                        cancelAnimationFrame(overlay.frame);
+                        clearInterval(overlay.timer);
+                        this.canvas.removeEventListener('wheel', overlay.onWheel);
+                        overlay.restore.forEach(restore => restore());
+                        overlay.el.remove();
+                        return;
+                    }}
+                    const el = document.createElement('div');
+                    el.style.cssText = 'position:fixed;top:8px;right:8px;z-index:10000;pointer-events:none;'
+                        + 'background:rgba(35,47,62,0.88);color:#fff;font:11px/1.45 monospace;padding:8px 10px;'
+                        + 'border-radius:6px;white-space:pre;min-width:230px;';
+                    document.body.appendChild(el);
+                    const overlay = {{
+                        el, restore: [], operations: [], lastFrameAt: performance.now(), frames: 0, worstFrame: 0,
+                        fps: 0, mode: 'parado', lastWheelAt: 0, frameRender: {{ nodes: 0, edges: 0, ms: 0 }},
+                        lastRender: null, windowStart: performance.now()
+                    }};
+                    overlay.onWheel = () => {{ overlay.lastWheelAt = performance.now(); }};
+                    this.canvas.addEventListener('wheel', overlay.onWheel, {{ passive: true }});
+                    const renderTimer = (key) => (name) => overlay.restore.push(this._wrapMethod(name, () => performance.now(), (t0) => {{
+                        overlay.frameRender[key]++;
+                        overlay.frameRender.ms += performance.now() - t0;
+                    }}));
+                    renderTimer('nodes')('renderNode');
+                    renderTimer('edges')('renderEdge');
+                    PERF_OVERLAY_OPERATIONS.forEach(name => overlay.restore.push(this._wrapMethod(name, () => performance.now(), (t0) => {{
+                        overlay.operations.unshift({{ name, ms: performance.now() - t0 }});
+                        overlay.operations.length = Math.min(overlay.operations.length, PERF_OVERLAY_HISTORY);
+                    }})));
+                    const onFrame = (now) => {{
+                        if (this.perfOverlay !== overlay) return;
+                        const interacting = this._perfOverlayMode(overlay, now) !== 'parado';
+                        if (interacting) overlay.worstFrame = Math.max(overlay.worstFrame, now - overlay.lastFrameAt);
+                        overlay.lastFrameAt = now;
+                        overlay.frames++;
+                        if (overlay.frameRender.nodes || overlay.frameRender.edges) {{
+                            overlay.lastRender = overlay.frameRender;
+                            overlay.frameRender = {{ nodes: 0, edges: 0, ms: 0 }};
+                        }}
+                        overlay.frame = requestAnimationFrame(onFrame);
+                    }};
+                    overlay.frame = requestAnimationFrame(onFrame);
+                    overlay.timer = setInterval(() => this._updatePerfOverlay(overlay), PERF_OVERLAY_REFRESH_MS);
+                    this.perfOverlay = overlay;
+                    this._updatePerfOverlay(overlay);
+                }}
+
+                _perfOverlayMode(overlay, now) {{
+                    if (this.draggedNode) return 'arrastando';
+                    if (this.isPanning) return 'movendo';
+                    if (now - overlay.lastWheelAt < 300) return 'zoom';
+                    return 'parado';
+                }}
+
+                _updatePerfOverlay(overlay) {{
+                    const now = performance.now();
+                    const elapsed = now - overlay.windowStart;
+                    if (elapsed > 0) overlay.fps = Math.round(overlay.frames * 1000 / elapsed);
+                    const mode = this._perfOverlayMode(overlay, now);
+                    if (mode !== 'parado') overlay.mode = mode;
+                    const render = overlay.lastRender;
+                    const lines = [
+                        'Desempenho (Alt+Shift+D)',
+                        `FPS: ${{overlay.fps}} (${{mode}})` + (overlay.worstFrame ? ` · pior quadro ${{overlay.worstFrame.toFixed(0)}} ms em "${{overlay.mode}}"` : ''),
+                        `DOM: ${{document.getElementsByTagName('*').length}} elementos`,
+                        `nodes: ${{this.nodes.size}} · edges: ${{this.edges.size}}`,
+                        render ? `Último desenho: ${{render.nodes}} nó(s), ${{render.edges}} aresta(s), ${{render.ms.toFixed(1)}} ms` : 'Último desenho: —',
+                        'Operações recentes:'
+                    ];
+                    overlay.operations.forEach(op => lines.push(`  ${{op.name}} ${{op.ms.toFixed(1)}} ms`));
+                    if (!overlay.operations.length) lines.push('  —');
+                    overlay.el.textContent = lines.join('\\n');
+                    overlay.frames = 0;
+                    overlay.windowStart = now;
+                }}
+
+                // ---------- Salvamento automático no servidor (mindmap/autosave.py via sidecar) ----------
+                // Cada mudança vira um delta pequeno; os deltas são agrupados e enviados após um intervalo
+                // sem edições (ou no máximo a cada autosaveMaxWaitMs), sem rerun do Streamlit.
+
+                _resolveAuxUrl(config, secureScheme, plainScheme) {{
+                    // URL de um servidor auxiliar vista pelo navegador, ou null se a página não consegue alcançá-lo
+                    if (!config) return null;
+                    const page = window.location; // o iframe do componente tem a mesma origem da página
+                    if (config.url) {{
+                        const url = config.url.replace(/\/+$/, '');
+                        // Página https não pode chamar http/ws (conteúdo misto)
+                        return page.protocol === 'https:' && !url.startsWith(`${{secureScheme}}://`) ? null : url;
+                    }}
+                    // Sem URL pública o servidor só escuta no próprio computador: serve apenas para páginas locais
+                    if (page.protocol !== 'http:' || !['localhost', '127.0.0.1', '[::1]'].includes(page.hostname)) return null;
+                    return `${{plainScheme}}://${{page.hostname}}:${{config.port}}`;
+                }}
+
+                showServerNotice(text) {{
+                    // Recurso desligado por falta de URL pública: aviso fixo na barra e uma notificação
+                    this.serverNotices = this.serverNotices || [];
+                    if (this.serverNotices.includes(text)) return;
+                    this.serverNotices.push(text);
+                    this.serverNoticeEl.textContent = `⚠️ ${{this.serverNotices.join(' · ')}}`;
+                    this.serverNoticeEl.style.display = '';
+                    this.showNotification(text, 'warning');
+                }}
+
+                resolveSidecarUrl() {{
+                    const url = this._resolveAuxUrl(sidecarConfig, 'https', 'http');
+                    if (sidecarConfig && !url) {{
+                        this.showServerNotice('Salvamento automático desligado: defina MINDMAP_SIDECAR_PUBLIC_URL (https) no servidor');
+                    }}
+                    return url;
+                }}
+
+                sidecarUrl(path) {{
+                    return `${{this.sidecarBaseUrl}}${{path}}?token=${{encodeURIComponent(this.sidecarToken)}}`;
+                }}
+
+                getAutosaveMapId() {{
+                    const key = 'awsMindMapAutosaveId';
+                    const newId = () => (window.crypto && crypto.randomUUID)
+                        ? crypto.randomUUID()
+                        : `${{Date.now().toString(36)}}-${{Math.random().toString(36).slice(2, 12)}}`;
+                    try {{
+                        let mapId = localStorage.getItem(key);
+                        if (!mapId) {{
+                            mapId = newId();
+                            localStorage.setItem(key, mapId);
+                        }}
+                        return mapId;
+                    }} catch (e) {{
+                        return newId(); // sem localStorage: salva só durante esta sessão
+                    }}
+                }}
+
+                initAutosave() {{
+                    if (!this.sidecarBaseUrl) return;
+                    this.autosaveMapId = this.getAutosaveMapId();
+                    this.autosaveEndpoint = this.sidecarUrl(`/autosave/${{encodeURIComponent(this.autosaveMapId)}}`);
+                    this.autosaveClientId = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+                    const flushNow = () => this.flushAutosave(true);
+                    window.addEventListener('pagehide', flushNow);
+                    document.addEventListener('visibilitychange', () => {{
+                        if (document.visibilityState === 'hidden') flushNow();
+                    }});
+                    this.restoreAutosave();
+                }}
+
+                async restoreAutosave() {{
+                    try {{
+                        const response = await fetch(this.autosaveEndpoint, {{ cache: 'no-store' }});
+                        if (response.ok) {{
+                            const {{state}} = await response.json();
+                            const hasContent = state && ((state.refs || []).length > 0 || (state.custom || []).length > 0);
+                            if (hasContent && !this.autosaveTouched) {{
+                                this.loadMindMapState(this.expandMapState(state));
+                                this.autosaveOps = [];
+                                this.autosaveMoveIds.clear();
+                                this.autosaveViewDirty = false;
+                                this.showNotification('Mapa restaurado do salvamento automático.', 'info');
+                            }} else if (hasContent) {{
+                                // Usuário editou antes da resposta: o mapa atual substitui o salvo
+                                this.queueAutosaveReset();
+                            }}
+                        }} else if (response.status !== 404) {{
+                            console.warn('[MINDMAP AUTOSAVE] Falha ao restaurar:', response.status);
+                        }}
+                    }} catch (e) {{
+                        console.warn('[MINDMAP AUTOSAVE] Servidor de salvamento automático indisponível.', e);
+                    }} finally {{
+                        this.autosaveReady = true;
+                        if (this.hasPendingAutosave()) this.scheduleAutosave();
+                    }}
+                }}
+
+                hasPendingAutosave() {{
+                    return this.autosaveUnsent.length > 0 || this.autosaveOps.length > 0 || this.autosaveViewDirty;
+                }}
+
+                queueAutosaveOp(command) {{
+                    if (!this.autosaveEndpoint) return;
+                    this.autosaveTouched = true;
+                    // As operações saem na ordem das edições; movimentos seguidos do mesmo nó viram um só,
+                    // com a posição lida no envio, até outra operação sobre o nó
+                    if (command.type === 'move') {{
+                        if (!this.autosaveMoveIds.has(command.id)) {{
+                            this.autosaveMoveIds.add(command.id);
+                            this.autosaveOps.push({{ op: 'move', id: command.id }});
+                        }}
+                    }} else if (command.type === 'add') {{
+                        this.autosaveOps.push({{ op: 'add', node: command.node }});
+                        this.autosaveMoveIds.delete(command.node.id);
+                    }} else if (command.type === 'remove') {{
+                        this.autosaveOps.push({{ op: 'remove', id: command.node.id }});
+                        this.autosaveMoveIds.delete(command.node.id);
+                    }} else if (command.type === 'reparent') {{
+                        this.autosaveOps.push({{ op: 'reparent', id: command.id, parentId: command.to }});
+                        this.autosaveMoveIds.delete(command.id);
+                    }}
+                    this.scheduleAutosave();
+                }}
+
+                queueAutosaveView() {{
+                    if (!this.autosaveEndpoint) return;
+                    this.autosaveViewDirty = true;
+                    this.scheduleAutosave();
+                }}
+
+                queueAutosaveReset() {{
+                    if (!this.autosaveEndpoint) return;
+                    this.autosaveTouched = true;
+                    this.autosaveUnsent = [];
+                    this.autosaveOps = [{{ op: 'reset', state: this.serializeMapState() }}];
+                    this.autosaveMoveIds.clear();
+                    this.autosaveViewDirty = false;
+                    this.scheduleAutosave();
+                }}
+
+                scheduleAutosave(delay = this.autosaveDebounceMs) {{
+                    if (!this.autosaveReady) return;
+                    const now = Date.now();
+                    if (!this.autosaveFirstPendingAt) this.autosaveFirstPendingAt = now;
+                    clearTimeout(this.autosaveTimer);
+                    const maxWaitLeft = this.autosaveMaxWaitMs - (now - this.autosaveFirstPendingAt);
+                    this.autosaveTimer = setTimeout(() => this.flushAutosave(), Math.max(0, Math.min(delay, maxWaitLeft)));
+                }}
+
+                _serializeAutosaveOps() {{
+                    const ops = this.autosaveUnsent;
+                    if (!this.autosaveCatalogSent) {{
+                        ops.unshift({{ op: 'catalog', catalog: {{ name: catalogInfo.name, hash: catalogInfo.hash }} }});
+                        this.autosaveCatalogSent = true;
+                    }}
+                    this.autosaveOps.forEach(entry => {{
+                        if (entry.op === 'move') {{
+                            const node = this.nodes.get(entry.id);
+                            if (node) ops.push({{ op: 'move', id: entry.id, x: this._roundCoordinate(node.x), y: this._roundCoordinate(node.y) }});
+                            return;
+                        }}
+                        if (entry.op !== 'add') {{
+                            ops.push(entry);
+                            return;
+                        }}
+                        const node = entry.node;
+                        const x = this._roundCoordinate(node.x);
+                        const y = this._roundCoordinate(node.y);
+                        ops.push(node.isCustom
+                            ? {{ op: 'add', node: {{ id: node.id, name: node.name, category: node.category, description: node.description, x, y, parentId: node.parentId }} }}
+                            : {{ op: 'add', ref: [node.id, x, y, node.parentId] }});
+                    }});
+                    if (this.autosaveViewDirty) {{
+                        const viewBox = this.currentViewBox;
+                        ops.push({{ op: 'view', viewBox: [viewBox.x, viewBox.y, viewBox.width, viewBox.height].map(v => this._roundCoordinate(v)) }});
+                    }}
+                    this.autosaveUnsent = [];
+                    this.autosaveOps = [];
+                    this.autosaveMoveIds.clear();
+                    this.autosaveViewDirty = false;
+                    // Lote grande demais (ou muitas falhas acumuladas): manda o mapa inteiro
+                    return ops.length > this.autosaveMaxOps ? [{{ op: 'reset', state: this.serializeMapState() }}] : ops;
+                }}
+
+                _postAutosave(ops, leavingPage) {{
+                    return fetch(this.autosaveEndpoint, {{
+                        method: 'POST',
+                        // text/plain evita o preflight CORS; keepalive permite enviar ao fechar a página
+                        headers: {{ 'Content-Type': 'text/plain;charset=UTF-8' }},
+                        body: JSON.stringify({{ ops, cliente: this.autosaveClientId, lote: ++this.autosaveBatch }}),
+                        keepalive: leavingPage
+                    }});
+                }}
+
+                async flushAutosave(leavingPage = false) {{
+                    clearTimeout(this.autosaveTimer);
+                    if (!this.autosaveReady) return;
+                    const previous = this.autosaveInFlight;
+                    if (previous && !leavingPage) {{
+                        // Um envio por vez: o próximo sai quando este terminar
+                        this.autosaveFlushAgain = true;
+                        return;
+                    }}
+                    if (!previous && !this.hasPendingAutosave()) return;
+                    // Ao fechar a página com um envio em voo, o lote novo leva também as operações dele
+                    // (com keepalive); o servidor descarta o lote antigo se ele chegar depois
+                    const ops = (previous || []).concat(this.hasPendingAutosave() ? this._serializeAutosaveOps() : []);
+                    this.autosaveFirstPendingAt = 0;
+                    this.autosaveInFlight = ops;
+                    let error = null;
+                    try {{
+                        const response = await this._postAutosave(ops, leavingPage);
+                        if (!response.ok) error = new Error(`HTTP ${{response.status}}`);
+                    }} catch (e) {{
+                        error = e;
+                    }}
+                    if (this.autosaveInFlight !== ops) return; // substituído por um lote que já leva estas operações
+                    this.autosaveInFlight = null;
+                    if (error) {{
+                        console.warn('[MINDMAP AUTOSAVE] Falha ao enviar alterações; tentando de novo.', error);
+                        this.autosaveUnsent = ops.concat(this.autosaveUnsent);
+                        this.autosaveRetryMs = Math.min(this.autosaveRetryMs * 2, 60000);
+                        this.autosaveFirstPendingAt = Date.now();
+                        this.autosaveFlushAgain = false;
+                        this.autosaveTimer = setTimeout(() => this.flushAutosave(), this.autosaveRetryMs);
+                        return;
+                    }}
+                    this.autosaveRetryMs = this.autosaveDebounceMs;
+                    if (this.autosaveFlushAgain) {{
+                        this.autosaveFlushAgain = false;
+                        this.scheduleAutosave();
+                    }}
+                }}
+
+                // ---------- Formato de arquivo (mesmo esquema de mindmap/state_format.py) ----------
+
+                _roundCoordinate(value) {{
+                    return Math.round(Number(value) * 10) / 10;
+                }}
+
+                serializeMapState() {{
+                    // Nós do catálogo viram referências [id, x, y, parentId]; só nós customizados levam os dados completos
+                    const center = this.nodes.get(AWS_CENTER_ID);
+                    const refs = [];
+                    const custom = [];
+                    this.nodes.forEach(node => {{
+                        if (node.isCentral) return;
+                        const x = this._roundCoordinate(node.x);
+                        const y = this._roundCoordinate(node.y);
+                        if (node.isCustom) {{
+                            custom.push({{ id: node.id, name: node.name, category: node.category, description: node.description, x, y, parentId: node.parentId }});
+                        }} else {{
+                            refs.push([node.id, x, y, node.parentId]);
+                        }}
+                    }});
+                    const viewBox = this.currentViewBox;
+                    return {{
+                        format: STATE_FORMAT_NAME,
+                        version: STATE_FORMAT_VERSION,
+                        catalog: {{ name: catalogInfo.name, hash: catalogInfo.hash }},
+                        center: center ? [this._roundCoordinate(center.x), this._roundCoordinate(center.y)] : [this.centerX, this.centerY],
+                        refs,
+                        custom,
+                        viewBox: [viewBox.x, viewBox.y, viewBox.width, viewBox.height].map(v => this._roundCoordinate(v))
+                    }};
+                }}
+
+                expandMapState(data) {{
+                    // Aceita o formato legado ({{ nodes: [...] }}) e o compacto; devolve sempre o legado
+                    if (!data || data.format !== STATE_FORMAT_NAME || !Array.isArray(data.refs)) return data;
+                    const centerPosition = data.center || [this.centerX, this.centerY];
+                    const nodes = [{{
+                        id: AWS_CENTER_ID, name: 'AWS', category: 'Central', description: 'Amazon Web Services',
+                        x: centerPosition[0], y: centerPosition[1], isCentral: true, parentId: null
+                    }}];
+                    const missingRefs = [];
+                    data.refs.forEach(([id, x, y, parentId]) => {{
+                        let service = this.csvData[this.serviceIndexByName.get(id)];
+                        if (!service) {{
+                            missingRefs.push(id);
+                            service = {{ Category: 'Outros', Description: 'Serviço não encontrado no catálogo atual' }};
+                        }}
+                        nodes.push({{
+                            id, name: id,
+                            category: service.Category || 'Outros',
+                            description: service.Description || 'Serviço AWS',
+                            x, y, parentId, isCentral: false, isCustom: false
+                        }});
+                    }});
+                    (data.custom || []).forEach(node => nodes.push({{ ...node, isCentral: false, isCustom: true }}));
+                    const expanded = {{ nodes, missingRefs }};
+                    if (Array.isArray(data.viewBox)) {{
+                        const [x, y, width, height] = data.viewBox;
+                        expanded.viewBox = {{ x, y, width, height }};
+                    }}
+                    return expanded;
+                }}
+
+                async parseStateBytes(buffer) {{
+                    const bytes = new Uint8Array(buffer);
+                    let compression = null;
+                    if (bytes[0] === 0x1f && bytes[1] === 0x8b) {{
+                        compression = 'gzip';
+                    }} else if (bytes[0] === 0x78 && ((bytes[0] << 8) + bytes[1]) % 31 === 0) {{
+                        compression = 'deflate';
+                    }}
+                    let text;
+                    if (compression) {{
+                        if (typeof DecompressionStream === 'undefined') {{
+                            throw new Error("Navegador sem suporte a arquivos comprimidos.");
+                        }}
+                        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream(compression));
+                        text = await new Response(stream).text();
+                    }} else {{
+                        text = new TextDecoder('utf-8').decode(bytes);
+                    }}
+                    return JSON.parse(text);
                 }}
 
                 loadMindMapState(loadedData) {{
@@ -1164,6 +3025,9 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                     this.edgesG.innerHTML = '';
                     this.nodes.clear();
                     this.edges.clear();
+                    this.childrenIndex.clear();
+                    this.resetLayoutCache();
+                    this.resetHistory();
                     this.selectedNodeId = null;
 
                     let centralNodeIdToSelect = null;
@@ -1209,9 +3073,11 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
 
                     this.nodes.forEach(nodeData => {{
                         if (nodeData.parentId && this.nodes.has(nodeData.parentId) && nodeData.id !== nodeData.parentId) {{
+                            this._indexChild(nodeData.parentId, nodeData.id);
                             this.addEdge(nodeData.parentId, nodeData.id);
                         }}
                     }});
+                    if (this.autoLayoutEnabled) this.invalidateLayout(AWS_CENTER_ID, true);
 
                     this.updateStats();
                     if (centralNodeIdToSelect && this.nodes.has(centralNodeIdToSelect)) {{
@@ -1229,209 +3095,429 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
                 }}
 
 
-                async downloadPDF() {{
-                    this.showNotification('Preparando PDF... Por favor, aguarde.', 'info');
-                    const {{ jsPDF }} = window.jspdf;
-                    const pdf = new jsPDF({{ orientation: 'landscape', unit: 'pt', format: 'a4' }});
-                    
-                    const svgElement = this.canvas;
-                    const canvasContainer = svgElement.parentNode; 
+                // ---------- Exportação PDF e PNG ----------
+                // Mapas pequenos cabem numa página. Os maiores são divididos em blocos do tamanho da página
+                // numa escala fixa (rótulos sempre legíveis), precedidos de uma página de visão geral com a
+                // grade numerada; cada bloco é capturado, gravado no PDF e liberado antes do próximo, então
+                // a memória de pico é a de um bloco, qualquer que seja o tamanho do mapa.
+                // As imagens saem de uma cópia serializada do SVG (a tela não muda durante a exportação),
+                // desenhada num OffscreenCanvas dentro de um worker.
 
-                    const originalViewBox = svgElement.getAttribute('viewBox');
-                    const originalSvgWidth = svgElement.style.width;
-                    const originalSvgHeight = svgElement.style.height;
-                    
-                    const originalContainerWidth = canvasContainer.style.width;
-                    const originalContainerHeight = canvasContainer.style.height;
-                    const originalContainerOverflow = canvasContainer.style.overflow;
+                _computeExportBounds() {{
+                    if (this.nodes.size === 1 && this.nodes.has(AWS_CENTER_ID)) {{
+                        const centralElem = document.getElementById(AWS_CENTER_ID);
+                        if (!centralElem || !centralElem.hasChildNodes()) return null;
+                        const vb = this.currentViewBox;
+                        return {{ minX: vb.x, minY: vb.y, maxX: vb.x + vb.width, maxY: vb.y + vb.height, boxes: [] }};
+                    }}
+                    let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+                    const boxes = [];
+                    this.nodes.forEach(node => {{
+                        if (node.x === undefined || node.y === undefined) return;
+                        const nodeElem = document.getElementById(node.id);
+                        let nodeWidth = 100;
+                        let nodeHeight = 40;
+                        if (node.isCentral) {{
+                            nodeWidth = 80; nodeHeight = 60;
+                            const centralChild = nodeElem ? nodeElem.firstChild : null;
+                            if (centralChild && typeof centralChild.getBBox === 'function') {{
+                                try {{
+                                    const bbox = centralChild.getBBox();
+                                    nodeWidth = bbox.width > 0 ? bbox.width : 80;
+                                    nodeHeight = bbox.height > 0 ? bbox.height : 60;
+                                }} catch (e) {{ /* mantém o tamanho padrão */ }}
+                            }}
+                        }} else {{
+                            const rect = nodeElem ? nodeElem.querySelector('rect') : null;
+                            if (rect) {{
+                                nodeWidth = parseFloat(rect.getAttribute('width')) || nodeWidth;
+                                nodeHeight = parseFloat(rect.getAttribute('height')) || nodeHeight;
+                            }} else {{ nodeWidth = 150; }}
+                        }}
+                        const box = {{ x0: node.x - nodeWidth / 2 - 30, y0: node.y - nodeHeight / 2 - 30,
+                                      x1: node.x + nodeWidth / 2 + 30, y1: node.y + nodeHeight / 2 + 30 }};
+                        boxes.push(box);
+                        minX = Math.min(minX, box.x0); minY = Math.min(minY, box.y0);
+                        maxX = Math.max(maxX, box.x1); maxY = Math.max(maxY, box.y1);
+                    }});
+                    this.edges.forEach(edge => {{
+                        const source = this.nodes.get(edge.source);
+                        const target = this.nodes.get(edge.target);
+                        if (!source || !target) return;
+                        boxes.push({{ x0: Math.min(source.x, target.x), y0: Math.min(source.y, target.y),
+                                     x1: Math.max(source.x, target.x), y1: Math.max(source.y, target.y) }});
+                    }});
+                    if (minX === Infinity) return null;
+                    return {{ minX, minY, maxX, maxY, boxes }};
+                }}
 
-                    const defsElement = svgElement.querySelector('defs');
-                    let defsParentNode = null;
-                    let originalDefsNextSibling = null; 
+                _planPdfTiles(bounds, pageContentWidth, pageContentHeight) {{
+                    // Área do mapa coberta por uma página na escala fixa, com sobreposição entre vizinhos
+                    const tileWidth = pageContentWidth / this.pdfTileScale;
+                    const tileHeight = pageContentHeight / this.pdfTileScale;
+                    const stepX = tileWidth - this.pdfTileOverlap;
+                    const stepY = tileHeight - this.pdfTileOverlap;
+                    const contentWidth = bounds.maxX - bounds.minX;
+                    const contentHeight = bounds.maxY - bounds.minY;
+                    const cols = Math.max(1, Math.ceil((contentWidth - this.pdfTileOverlap) / stepX));
+                    const rows = Math.max(1, Math.ceil((contentHeight - this.pdfTileOverlap) / stepY));
+                    // Grade centralizada no conteúdo
+                    const originX = bounds.minX - (cols * stepX + this.pdfTileOverlap - contentWidth) / 2;
+                    const originY = bounds.minY - (rows * stepY + this.pdfTileOverlap - contentHeight) / 2;
+                    const tiles = [];
+                    for (let row = 0; row < rows; row++) {{
+                        for (let col = 0; col < cols; col++) {{
+                            const x = originX + col * stepX;
+                            const y = originY + row * stepY;
+                            // Blocos sem nenhum nó nem ligação não viram página
+                            const used = bounds.boxes.some(b => b.x1 >= x && b.x0 <= x + tileWidth && b.y1 >= y && b.y0 <= y + tileHeight);
+                            if (used) tiles.push({{ row, col, x, y, width: tileWidth, height: tileHeight }});
+                        }}
+                    }}
+                    return {{ cols, rows, tiles, tileWidth, tileHeight, originX, originY, stepX, stepY }};
+                }}
 
-                    if (defsElement) {{
-                        defsParentNode = defsElement.parentNode;
-                        originalDefsNextSibling = defsElement.nextSibling; 
-                        defsParentNode.removeChild(defsElement); 
+                _serializeMapSvg() {{
+                    // Cópia do mapa sem o estado da tela (viewBox, tamanho, seleção); o SVG ao vivo não é tocado
+                    const clone = this.canvas.cloneNode(true);
+                    ['id', 'class', 'style', 'viewBox', 'width', 'height'].forEach(attr => clone.removeAttribute(attr));
+                    clone.querySelectorAll('.selected').forEach(el => el.classList.remove('selected'));
+                    const markup = new XMLSerializer().serializeToString(clone);
+                    const headEnd = markup.indexOf('>');
+                    // Só a tag de abertura muda entre uma região e outra; o corpo é serializado uma vez
+                    return {{
+                        head: markup.slice(0, markup[headEnd - 1] === '/' ? headEnd - 1 : headEnd),
+                        body: markup.slice(markup[headEnd - 1] === '/' ? headEnd - 1 : headEnd)
+                    }};
+                }}
+
+                async _openRasterSession() {{
+                    // Fontes carregadas antes de serializar: é o sinal de prontidão, no lugar da espera fixa
+                    if (document.fonts && document.fonts.ready) await document.fonts.ready;
+                    const session = {{
+                        source: this._serializeMapSvg(), worker: null, workerUrl: null,
+                        pending: new Map(), nextId: 0, images: 0
+                    }};
+                    if (typeof Worker === 'function' && typeof OffscreenCanvas === 'function' && typeof createImageBitmap === 'function') {{
+                        try {{
+                            session.workerUrl = URL.createObjectURL(new Blob([RASTER_WORKER_SOURCE], {{ type: 'text/javascript' }}));
+                            session.worker = new Worker(session.workerUrl);
+                            session.worker.onmessage = e => {{
+                                const request = session.pending.get(e.data.id);
+                                if (!request) return;
+                                session.pending.delete(e.data.id);
+                                if (e.data.error) request.reject(new Error(e.data.error));
+                                else request.resolve(e.data.blob);
+                            }};
+                            session.worker.onerror = e => {{
+                                e.preventDefault();
+                                this._stopRasterWorker(session, new Error(e.message || 'worker de exportação falhou'));
+                            }};
+                        }} catch (e) {{
+                            console.warn('[MINDMAP EXPORT] Worker indisponível, codificando na thread principal:', e);
+                            this._stopRasterWorker(session, e);
+                        }}
                     }}
+                    return session;
+                }}
 
-                    try {{
-                        pdf.setFontSize(20); 
-                        pdf.setFont(undefined, 'bold');
-                        const appTitle = "AWS MindMap pro";
-                        const appTitleWidth = pdf.getTextDimensions(appTitle).w;
-                        const pageWidthForTitle = pdf.internal.pageSize.getWidth();
-                        pdf.text(appTitle, (pageWidthForTitle - appTitleWidth) / 2, 40);
+                _stopRasterWorker(session, error) {{
+                    if (session.worker) session.worker.terminate();
+                    if (session.workerUrl) URL.revokeObjectURL(session.workerUrl);
+                    session.worker = null;
+                    session.workerUrl = null;
+                    session.pending.forEach(request => request.reject(error || new Error('exportação encerrada')));
+                    session.pending.clear();
+                }}
 
+                _closeRasterSession(session) {{
+                    this._stopRasterWorker(session);
+                    session.source = null;
+                }}
 
-                        if (this.nodes.size === 0) {{
-                            this.showNotification('Nada para exportar no mapa.', 'warning');
-                            return;
-                        }}
+                _loadSvgImage(session, x, y, width, height, pixelWidth, pixelHeight) {{
+                    const svgBlob = new Blob([
+                        session.source.head,
+                        ` width="${{pixelWidth}}" height="${{pixelHeight}}" viewBox="${{x}} ${{y}} ${{width}} ${{height}}" preserveAspectRatio="xMidYMid meet"`,
+                        session.source.body
+                    ], {{ type: 'image/svg+xml;charset=utf-8' }});
+                    const url = URL.createObjectURL(svgBlob);
+                    const image = new Image(pixelWidth, pixelHeight);
+                    // O evento load (imagem decodificada) é o sinal de que dá para rasterizar
+                    return new Promise((resolve, reject) => {{
+                        image.onload = () => resolve(image);
+                        image.onerror = () => reject(new Error('não foi possível desenhar o SVG do mapa'));
+                        image.src = url;
+                    }}).finally(() => URL.revokeObjectURL(url));
+                }}
 
-                        let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
-                        let hasAnyContentToExport = false;
+                async _encodeInWorker(session, image) {{
+                    const bitmap = await createImageBitmap(image);
+                    if (!session.worker) {{
+                        bitmap.close();
+                        throw new Error('worker de exportação encerrado');
+                    }}
+                    return new Promise((resolve, reject) => {{
+                        const id = ++session.nextId;
+                        session.pending.set(id, {{ resolve, reject }});
+                        session.worker.postMessage({{ id, bitmap, type: 'image/png', background: EXPORT_BACKGROUND }}, [bitmap]);
+                    }});
+                }}
 
-                        if (this.nodes.size === 1 && this.nodes.has(AWS_CENTER_ID)) {{
-                            const centralElem = document.getElementById(AWS_CENTER_ID);
-                            if (!centralElem || !centralElem.hasChildNodes()) {{
-                                this.showNotification('Nó central não renderizado, nada para exportar.', 'warning');
-                                return;
+                async _encodeOnMainThread(image, pixelWidth, pixelHeight) {{
+                    const canvas = document.createElement('canvas');
+                    canvas.width = pixelWidth;
+                    canvas.height = pixelHeight;
+                    const ctx = canvas.getContext('2d');
+                    ctx.fillStyle = EXPORT_BACKGROUND;
+                    ctx.fillRect(0, 0, pixelWidth, pixelHeight);
+                    ctx.drawImage(image, 0, 0, pixelWidth, pixelHeight);
+                    try {{
+                        return await new Promise((resolve, reject) => canvas.toBlob(
+                            blob => blob ? resolve(blob) : reject(new Error('falha ao codificar a imagem')), 'image/png'));
+                    }} finally {{
+                        canvas.width = 0;
+                        canvas.height = 0;
+                    }}
+                }}
+
+                async _rasterizeRegion(session, x, y, width, height, pixelWidth, pixelHeight) {{
+                    // Região do mapa -> PNG (Blob). A rasterização parte da cópia serializada e a codificação
+                    // roda no worker (OffscreenCanvas); sem worker, cai para um canvas na thread principal.
+                    const image = await this._loadSvgImage(session, x, y, width, height, pixelWidth, pixelHeight);
+                    try {{
+                        if (session.worker) {{
+                            try {{
+                                return await this._encodeInWorker(session, image);
+                            }} catch (e) {{
+                                console.warn('[MINDMAP EXPORT] Worker falhou, codificando na thread principal:', e);
+                                this._stopRasterWorker(session, e);
                             }}
-                            minX = this.currentViewBox.x;
-                            minY = this.currentViewBox.y;
-                            maxX = this.currentViewBox.x + this.currentViewBox.width;
-                            maxY = this.currentViewBox.y + this.currentViewBox.height;
-                            hasAnyContentToExport = true;
-                        }} else {{
-                            this.nodes.forEach(node => {{
-                                if (node.x !== undefined && node.y !== undefined) {{
-                                    hasAnyContentToExport = true;
-                                    const nodeElem = document.getElementById(node.id);
-                                    let nodeWidth = 100; 
-                                    let nodeHeight = 40; 
-
-                                    if (node.isCentral) {{
-                                        const centralChild = nodeElem ? nodeElem.firstChild : null;
-                                        if (centralChild && typeof centralChild.getBBox === 'function') {{
-                                            try {{
-                                                const bbox = centralChild.getBBox();
-                                                nodeWidth = bbox.width > 0 ? bbox.width : 80;
-                                                nodeHeight = bbox.height > 0 ? bbox.height : 60;
-                                            }} catch (e) {{ nodeWidth = 80; nodeHeight = 60; }}
-                                        }} else {{ nodeWidth = 80; nodeHeight = 60; }}
-                                    }} else {{ 
-                                        const rect = nodeElem ? nodeElem.querySelector('rect') : null;
-                                        if (rect) {{
-                                            nodeWidth = parseFloat(rect.getAttribute('width')) || nodeWidth;
-                                            nodeHeight = parseFloat(rect.getAttribute('height')) || nodeHeight;
-                                        }} else {{ nodeWidth = 150; }} 
-                                    }}
-                                    minX = Math.min(minX, node.x - nodeWidth / 2 - 30); 
-                                    minY = Math.min(minY, node.y - nodeHeight / 2 - 30);
-                                    maxX = Math.max(maxX, node.x + nodeWidth / 2 + 30);
-                                    maxY = Math.max(maxY, node.y + nodeHeight / 2 + 30);
-                                }}
-                            }});
                         }}
+                        return await this._encodeOnMainThread(image, pixelWidth, pixelHeight);
+                    }} finally {{
+                        session.images++;
+                    }}
+                }}
 
-                        if (!hasAnyContentToExport) {{
-                            this.showNotification('Nenhum conteúdo desenhável encontrado para exportar.', 'warning');
-                            return;
-                        }}
+                async _addImageToPdf(pdf, png, x, y, width, height) {{
+                    // Bytes do PNG direto para o jsPDF (sem data URL em base64); o Blob é liberado em seguida
+                    pdf.addImage(new Uint8Array(await png.arrayBuffer()), 'PNG', x, y, width, height, undefined, 'FAST');
+                }}
 
-                        const contentWidth = Math.max(maxX - minX, 100);
-                        const contentHeight = Math.max(maxY - minY, 100);
-                        
-                        svgElement.setAttribute('viewBox', `${{minX}} ${{minY}} ${{contentWidth}} ${{contentHeight}}`);
-                        
-                        const captureWidth = Math.max(contentWidth, 1200);
-                        const captureHeight = (captureWidth / contentWidth) * contentHeight;
-                        
-                        svgElement.style.width = `${{captureWidth}}px`;
-                        svgElement.style.height = `${{captureHeight}}px`;
-
-                        canvasContainer.style.width = `${{captureWidth}}px`;
-                        canvasContainer.style.height = `${{captureHeight}}px`;
-                        canvasContainer.style.overflow = 'visible';
-
-
-                        await new Promise(resolve => setTimeout(resolve, 450)); 
-
-                        const canvasImage = await html2canvas(canvasContainer, {{ 
-                            backgroundColor: '#f8f9fa',
-                            scale: 1, 
-                            useCORS: true,
-                            logging: false, 
-                            width: captureWidth,
-                            height: captureHeight,
-                            x: 0, 
-                            y: 0, 
-                            windowWidth: captureWidth, 
-                            windowHeight: captureHeight 
-                        }});
+                _reportExportProgress(label, done, total) {{
+                    const percent = total > 0 ? Math.round(done / total * 100) : 100;
+                    this.showNotification(`${{label}}: imagem ${{Math.min(done + 1, total)}} de ${{total}} (${{percent}}%)...`, 'info');
+                }}
 
-                        const imgData = canvasImage.toDataURL('image/png', 0.95);
-                        const imgProps = pdf.getImageProperties(imgData);
-                        
-                        const titleAreaHeight = 60; 
-                        const pdfPageContentWidth = pdf.internal.pageSize.getWidth() - 40; 
-                        const pdfPageContentHeight = pdf.internal.pageSize.getHeight() - titleAreaHeight - 20;
+                _pdfPageTitle(pdf, title, subtitle) {{
+                    const pageWidth = pdf.internal.pageSize.getWidth();
+                    pdf.setFontSize(20);
+                    pdf.setFont(undefined, 'bold');
+                    pdf.text(title, (pageWidth - pdf.getTextDimensions(title).w) / 2, 40);
+                    if (subtitle) {{
+                        pdf.setFontSize(10);
+                        pdf.setFont(undefined, 'normal');
+                        pdf.text(subtitle, (pageWidth - pdf.getTextDimensions(subtitle).w) / 2, 54);
+                    }}
+                }}
 
-                        const imgRatio = imgProps.width / imgProps.height;
-                        let finalImgWidth = pdfPageContentWidth;
-                        let finalImgHeight = pdfPageContentWidth / imgRatio;
+                async _addFittedMapPage(pdf, session, bounds, plan) {{
+                    // Página única (ou visão geral): o mapa inteiro reduzido para caber na página
+                    const pageWidth = pdf.internal.pageSize.getWidth();
+                    const pageHeight = pdf.internal.pageSize.getHeight();
+                    const titleAreaHeight = 60;
+                    const areaWidth = pageWidth - 40;
+                    const areaHeight = pageHeight - titleAreaHeight - 20;
+                    let x = bounds.minX, y = bounds.minY;
+                    let width = Math.max(bounds.maxX - bounds.minX, 100);
+                    let height = Math.max(bounds.maxY - bounds.minY, 100);
+                    if (plan) {{
+                        // Enquadra a grade inteira, para os números dos blocos ficarem no lugar certo
+                        x = plan.originX;
+                        y = plan.originY;
+                        width = plan.cols * plan.stepX + this.pdfTileOverlap;
+                        height = plan.rows * plan.stepY + this.pdfTileOverlap;
+                    }}
+                    const scale = Math.min(areaWidth / width, areaHeight / height);
+                    const drawWidth = width * scale;
+                    const drawHeight = height * scale;
+                    const offsetX = (pageWidth - drawWidth) / 2;
+                    const offsetY = titleAreaHeight + (areaHeight - drawHeight) / 2;
+                    // Resolução da captura limitada: a visão geral custa o mesmo que um bloco
+                    const pixelScale = Math.min(this.pdfPixelsPerPoint * scale, this.pdfMaxCapturePixels / Math.max(width, height));
+                    const png = await this._rasterizeRegion(session, x, y, width, height,
+                        Math.max(1, Math.round(width * pixelScale)), Math.max(1, Math.round(height * pixelScale)));
+                    await this._addImageToPdf(pdf, png, offsetX, offsetY, drawWidth, drawHeight);
+                    if (!plan) return;
+                    pdf.setDrawColor(255, 153, 0);
+                    pdf.setTextColor(35, 47, 62);
+                    pdf.setLineWidth(1);
+                    pdf.setFontSize(12);
+                    pdf.setFont(undefined, 'bold');
+                    plan.tiles.forEach(tile => {{
+                        const tx = offsetX + (tile.x - x) * scale;
+                        const ty = offsetY + (tile.y - y) * scale;
+                        pdf.rect(tx, ty, tile.width * scale, tile.height * scale);
+                        pdf.text(`p. ${{tile.page}}`, tx + 4, ty + 14);
+                    }});
+                    pdf.setTextColor(0, 0, 0);
+                }}
 
-                        if (finalImgHeight > pdfPageContentHeight) {{
-                            finalImgHeight = pdfPageContentHeight;
-                            finalImgWidth = pdfPageContentHeight * imgRatio;
-                        }}
-                        const xOffsetImage = (pdf.internal.pageSize.getWidth() - finalImgWidth) / 2;
-                        let yOffsetImage = titleAreaHeight + (pdfPageContentHeight - finalImgHeight) / 2;
-                        if (yOffsetImage < titleAreaHeight) yOffsetImage = titleAreaHeight;
+                async _addTilePage(pdf, session, tile, plan, pageOf, index) {{
+                    const pageWidth = pdf.internal.pageSize.getWidth();
+                    const pageHeight = pdf.internal.pageSize.getHeight();
+                    const margin = this.pdfTileMargin;
+                    const drawWidth = tile.width * this.pdfTileScale;
+                    const drawHeight = tile.height * this.pdfTileScale;
+                    pdf.addPage();
+                    pdf.setFontSize(10);
+                    pdf.setFont(undefined, 'bold');
+                    pdf.text(`AWS MindMap pro - página ${{tile.page}} (linha ${{tile.row + 1}}, coluna ${{tile.col + 1}}, bloco ${{index + 1}} de ${{plan.tiles.length}})`, margin, margin - 22);
+                    const png = await this._rasterizeRegion(session, tile.x, tile.y, tile.width, tile.height,
+                        Math.round(drawWidth * this.pdfPixelsPerPoint), Math.round(drawHeight * this.pdfPixelsPerPoint));
+                    await this._addImageToPdf(pdf, png, margin, margin, drawWidth, drawHeight);
+                    pdf.setDrawColor(200, 200, 200);
+                    pdf.rect(margin, margin, drawWidth, drawHeight);
+                    // Referências às páginas vizinhas nas bordas do bloco
+                    pdf.setFont(undefined, 'normal');
+                    pdf.setFontSize(9);
+                    const neighbor = (dr, dc) => pageOf.get(`${{tile.row + dr}},${{tile.col + dc}}`);
+                    const up = neighbor(-1, 0), down = neighbor(1, 0), left = neighbor(0, -1), right = neighbor(0, 1);
+                    const centerX = margin + drawWidth / 2;
+                    if (up) pdf.text(`^ continua na p. ${{up}}`, centerX, margin - 6, {{ align: 'center' }});
+                    if (down) pdf.text(`v continua na p. ${{down}}`, centerX, margin + drawHeight + 12, {{ align: 'center' }});
+                    if (left) pdf.text(`< p. ${{left}}`, margin - 4, margin + drawHeight / 2, {{ angle: 90 }});
+                    if (right) pdf.text(`p. ${{right}} >`, Math.min(pageWidth - 4, margin + drawWidth + 12), margin + drawHeight / 2, {{ angle: 90 }});
+                    pdf.text('Visão geral: p. 1', pageWidth - margin, pageHeight - 8, {{ align: 'right' }});
+                }}
 
+                _exportFileName(extension) {{
+                    return `aws-mindmap-pro-${{new Date().toISOString().slice(0,10).replace(/-/g,'')}}.${{extension}}`;
+                }}
 
-                        pdf.addImage(imgData, 'PNG', xOffsetImage, yOffsetImage, finalImgWidth, finalImgHeight);
+                async downloadPNG() {{
+                    if (this.nodes.size === 0) {{
+                        this.showNotification('Nada para exportar no mapa.', 'warning');
+                        return;
+                    }}
+                    const bounds = this._computeExportBounds();
+                    if (!bounds) {{
+                        this.showNotification('Nenhum conteúdo desenhável encontrado para exportar.', 'warning');
+                        return;
+                    }}
+                    this._reportExportProgress('Gerando PNG', 0, 1);
+                    const width = Math.max(bounds.maxX - bounds.minX, 100);
+                    const height = Math.max(bounds.maxY - bounds.minY, 100);
+                    const pixelScale = Math.min(this.pngPixelsPerUnit, this.pngMaxPixels / Math.max(width, height));
+                    const session = await this._openRasterSession();
+                    try {{
+                        const png = await this._rasterizeRegion(session, bounds.minX, bounds.minY, width, height,
+                            Math.max(1, Math.round(width * pixelScale)), Math.max(1, Math.round(height * pixelScale)));
+                        const url = URL.createObjectURL(png);
+                        const a = document.createElement('a');
+                        a.href = url;
+                        a.download = this._exportFileName('png');
+                        document.body.appendChild(a);
+                        a.click();
+                        document.body.removeChild(a);
+                        URL.revokeObjectURL(url);
+                        this.showNotification('PNG gerado com sucesso!', 'success');
+                        this.sendComponentEvent('export', {{ format: 'png', nodes: this.nodes.size, pages: 1 }});
+                    }} catch (error) {{
+                        console.error('[MINDMAP PNG] Erro ao gerar PNG:', error);
+                        this.showNotification(`Falha ao gerar PNG: ${{error.message || 'Erro desconhecido'}}`, 'error');
+                    }} finally {{
+                        this._closeRasterSession(session);
+                    }}
+                }}
+
+                async downloadPDF() {{
+                    this.showNotification('Preparando PDF... Por favor, aguarde.', 'info');
+                    const {{ jsPDF }} = window.jspdf;
+                    const pdf = new jsPDF({{ orientation: 'landscape', unit: 'pt', format: 'a4' }});
+                    if (this.nodes.size === 0) {{
+                        this.showNotification('Nada para exportar no mapa.', 'warning');
+                        return;
+                    }}
+                    const bounds = this._computeExportBounds();
+                    if (!bounds) {{
+                        this.showNotification('Nenhum conteúdo desenhável encontrado para exportar.', 'warning');
+                        return;
+                    }}
+                    const session = await this._openRasterSession();
+                    try {{
+                        const pageWidth = pdf.internal.pageSize.getWidth();
+                        const pageHeight = pdf.internal.pageSize.getHeight();
+                        const plan = this._planPdfTiles(bounds, pageWidth - 2 * this.pdfTileMargin, pageHeight - 2 * this.pdfTileMargin);
+                        let mapPages = 1;
+                        if (plan.tiles.length <= 1) {{
+                            this._reportExportProgress('Gerando PDF', 0, 1);
+                            this._pdfPageTitle(pdf, 'AWS MindMap pro');
+                            await this._addFittedMapPage(pdf, session, bounds, null);
+                        }} else {{
+                            const pageOf = new Map();
+                            plan.tiles.forEach((tile, i) => {{
+                                tile.page = i + 2;
+                                pageOf.set(`${{tile.row}},${{tile.col}}`, tile.page);
+                            }});
+                            this._pdfPageTitle(pdf, 'AWS MindMap pro',
+                                `Visão geral - o mapa continua em ${{plan.tiles.length}} páginas em escala legível (números na grade)`);
+                            this._reportExportProgress('Gerando PDF', 0, plan.tiles.length + 1);
+                            await this._addFittedMapPage(pdf, session, bounds, plan);
+                            for (let i = 0; i < plan.tiles.length; i++) {{
+                                this._reportExportProgress('Gerando PDF', i + 1, plan.tiles.length + 1);
+                                await this._addTilePage(pdf, session, plan.tiles[i], plan, pageOf, i);
+                            }}
+                            mapPages = plan.tiles.length + 1;
+                        }}
 
                         const serviceNodes = Array.from(this.nodes.values()).filter(n => !n.isCentral);
                         if (serviceNodes.length > 0) {{
                             pdf.addPage();
                             pdf.setFontSize(16);
                             pdf.setFont(undefined, 'bold');
-                            pdf.text('Detalhes dos Nós no Mapa', 40, 50); 
-                            
+                            pdf.text('Detalhes dos Nós no Mapa', 40, 50);
+
                             let yPos = 80;
                             pdf.setFontSize(10);
 
                             serviceNodes.sort((a,b) => a.name.localeCompare(b.name)).forEach(node => {{
                                 const lineHeight = 12;
-                                const blockSpacing = 15; 
-                                const textMaxWidth = pdf.internal.pageSize.getWidth() - 80; 
+                                const blockSpacing = 15;
+                                const textMaxWidth = pdf.internal.pageSize.getWidth() - 80;
 
-                                if (yPos > pdf.internal.pageSize.getHeight() - 60) {{ 
+                                if (yPos > pdf.internal.pageSize.getHeight() - 60) {{
                                     pdf.addPage();
                                     yPos = 50;
-                                    pdf.setFontSize(16); 
+                                    pdf.setFontSize(16);
                                     pdf.setFont(undefined, 'bold');
                                     pdf.text('Detalhes dos Nós no Mapa (continuação)', 40, yPos);
                                     yPos = 80;
                                     pdf.setFontSize(10);
                                 }}
                                 pdf.setFont(undefined, 'bold');
-                                pdf.text(`Nó: ${{node.name}} ${{(node.isCustom ? "(Customizado)" : "")}}`, 40, yPos); 
+                                pdf.text(`Nó: ${{node.name}} ${{(node.isCustom ? "(Customizado)" : "")}}`, 40, yPos);
                                 yPos += lineHeight + 2;
-                                
+
                                 pdf.setFont(undefined, 'normal');
                                 pdf.text(`Categoria: ${{node.category || 'N/A'}}`, 50, yPos);
                                 yPos += lineHeight + 2;
-                                
+
                                 const descLines = pdf.splitTextToSize(`Descrição: ${{node.description || 'N/A'}}`, textMaxWidth);
                                 pdf.text(descLines, 50, yPos);
-                                yPos += descLines.length * lineHeight + blockSpacing; 
+                                yPos += descLines.length * lineHeight + blockSpacing;
                             }});
                         }}
-                        pdf.save(`aws-mindmap-pro-${{new Date().toISOString().slice(0,10).replace(/-/g,'')}}.pdf`);
+                        pdf.save(this._exportFileName('pdf'));
                         this.showNotification('PDF gerado com sucesso!', 'success');
+                        this.sendComponentEvent('export', {{ format: 'pdf', nodes: this.nodes.size, pages: mapPages }});
 
                     }} catch (error) {{
                         console.error("[MINDMAP PDF] Erro detalhado ao gerar PDF:", error);
                         this.showNotification(`Falha ao gerar PDF: ${{error.message || 'Erro desconhecido'}}`, 'error');
                     }} finally {{
-                        if(originalViewBox) svgElement.setAttribute('viewBox', originalViewBox);
-                        svgElement.style.width = originalSvgWidth || '100%';
-                        svgElement.style.height = originalSvgHeight || '100%';
-                        
-                        canvasContainer.style.width = originalContainerWidth;
-                        canvasContainer.style.height = originalContainerHeight;
-                        canvasContainer.style.overflow = originalContainerOverflow;
-                        
-                        if (defsElement && defsParentNode) {{
-                            if (originalDefsNextSibling) {{
-                                defsParentNode.insertBefore(defsElement, originalDefsNextSibling);
-                            }} else {{
-                                defsParentNode.appendChild(defsElement);
-                            }}
-                        }}
+                        this._closeRasterSession(session);
                     }}
                 }}
             }} // Fim da classe AWSMindMapPro
@@ -1461,35 +3547,305 @@ def create_mindmap_html(df, csv_filename, logo_info_tuple):
     '''
     return html_content
 
+@RERUN_METRICS.cached(st.cache_resource, show_spinner=False)
+def get_mindmap_build(df, csv_filename, logo_info_tuple, relations_mtimes, _sidecar, _collab_hub):
+    """Página do mapa: o HTML é gerado e gravado uma vez por versão (e de novo quando as relações mudam)"""
+    return write_component_build(create_mindmap_html(df, csv_filename, logo_info_tuple, _sidecar, _collab_hub,
+                                                     relations_mtimes))
+
+def handle_mindmap_events(value):
+    """Processa os eventos ainda não confirmados enviados pelo mapa"""
+    if not value:
+        return
+    session = value.get('session')
+    acked_session, acked_seq = st.session_state.get('mindmap_acked', (None, 0))
+    last_seq = acked_seq if acked_session == session else 0
+    for event in value.get('events', []):
+        if event.get('seq', 0) <= last_seq:
+            continue
+        last_seq = event['seq']
+        kind = event.get('type')
+        if kind == 'save':
+            try:
+                path = save_map_event(event)
+                st.toast(f"Mapa salvo no servidor: {path.name}", icon="💾")
+            except (OSError, ValueError) as e:
+                st.error(f"Erro ao salvar o mapa: {e}")
+        elif kind == 'select':
+            st.session_state['mindmap_selected'] = event.get('nodeId')
+        elif kind == 'loaded':
+            request = st.session_state.get('mindmap_load_request')
+            if request and request['nonce'] == event.get('nonce'):
+                st.session_state['mindmap_load_request'] = None
+        elif kind == 'export':
+            st.session_state['mindmap_last_export'] = {'format': event.get('format'), 'nodes': event.get('nodes')}
+    st.session_state['mindmap_acked'] = (session, last_seq)
+
+def request_map_load(path):
+    """Pede ao componente para abrir um mapa salvo no servidor"""
+    try:
+        st.session_state['mindmap_load_request'] = {
+            'nonce': time.time_ns(), 'name': path.name, 'state': read_state_file(path)
+        }
+    except (OSError, ValueError) as e:
+        st.error(f"Erro ao ler o mapa: {e}")
+    else:
+        st.rerun()
+
+def render_catalog_sources():
+    """Origem do catálogo quando há mais de um arquivo (e os serviços repetidos entre eles)"""
+    registry = get_catalog_registry()
+    counts = registry.counts()
+    if len(counts) < 2:
+        return
+    sources = ", ".join(f"{Path(path).name} ({count})" for path, count in counts.items())
+    conflicts = registry.conflicts()
+    note = f" · {len(conflicts)} serviço(s) em mais de um catálogo (vale o primeiro da lista)" if conflicts else ""
+    st.caption(f"📚 Catálogos: {sources}{note}")
+
+def render_saved_maps_picker(saved_maps):
+    """Lista os mapas salvos no servidor para abrir no mapa ou baixar"""
+    paths_by_name = {path.name: path for path in saved_maps}
+    col_select, col_open, col_view, col_download = st.columns([4, 1, 1, 1])
+    choice = col_select.selectbox("Mapas salvos no servidor", list(paths_by_name), label_visibility="collapsed")
+    path = paths_by_name[choice]
+    if col_open.button("📂 Abrir no mapa", width="stretch"):
+        request_map_load(path)
+    col_view.link_button("👁️ Visualizar", f"?ver={quote(choice)}", width="stretch")
+    col_download.download_button("⬇️ Baixar", data=path.read_bytes(), file_name=choice,
+                                 on_click="ignore", width="stretch")
+    return path
+
+@RERUN_METRICS.cached(st.cache_resource, show_spinner=False)
+def get_export_jobs():
+    """Fila de exportações em segundo plano, compartilhada por todas as sessões"""
+    return ExportJobManager()
+
+def render_export_job_progress(key):
+    """Progresso de uma exportação em andamento (o fragmento se atualiza sozinho)"""
+    job = get_export_jobs().poll(key)
+    if job is None or not job.active:
+        st.rerun()
+    text = f"{EXPORT_FORMATS[job.format][0]} de {job.source}: {job.stage or job.status}"
+    if job.total:
+        text += f" ({job.done}/{job.total})"
+    st.progress(job.fraction or 0.0, text=text)
+    if st.button("✖️ Cancelar exportação"):
+        job = get_export_jobs().cancel(key, session_key())
+        if job is not None and job.subscribers:
+            # Outras sessões ainda esperam o arquivo: só esta deixa de acompanhar
+            st.session_state['export_job'] = None
+        st.rerun()
+
+def render_map_exports(path, df):
+    """Exportações do mapa salvo selecionado, geradas no servidor sem travar a página"""
+    col_format, col_export = st.columns([4, 1])
+    fmt = col_format.selectbox("Exportar no servidor", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0],
+                               label_visibility="collapsed", key="export_format")
+    if col_export.button("⚙️ Exportar", width="stretch"):
+        try:
+            job = get_export_jobs().submit(path, fmt, get_catalog_by_name(df), get_catalog_hash(df), session_key())
+            st.session_state['export_job'] = job.key
+        except OSError as e:
+            st.error(f"Erro ao ler o mapa: {e}")
+    key = st.session_state.get('export_job')
+    job = get_export_jobs().poll(key) if key else None
+    if job is None:
+        return
+    if job.active:
+        st.fragment(render_export_job_progress, run_every=EXPORT_POLL_SECONDS)(key)
+    elif job.status == DONE:
+        data = get_export_jobs().read_artifact(job)
+        if data is None:
+            st.session_state['export_job'] = None
+            st.warning("O arquivo exportado saiu do cache; exporte de novo.")
+            return
+        st.download_button(f"⬇️ {EXPORT_FORMATS[job.format][0]} de {job.source}", data=data, file_name=job.file_name,
+                           mime=job.mime, on_click="ignore")
+    elif job.status == CANCELLED:
+        st.info(f"Exportação de {job.source} cancelada.")
+    else:
+        st.error(f"Falha na exportação de {job.source}: {job.error}")
+
+@RERUN_METRICS.cached(st.cache_data, show_spinner=False, max_entries=32)
+def get_viewer_html(path_str, mtime_ns, df, logo_info_tuple):
+    """Página estática do modo visualização, refeita só quando o mapa (ou o catálogo) muda"""
+    state = read_state_file(path_str, get_catalog_by_name(df))
+    return render_viewer_html(state.get('nodes', []), f"AWS MindMap pro - {Path(path_str).name}",
+                              build_center_node_svg(logo_info_tuple))
+
+def render_map_viewer(name, df):
+    """Modo visualização (?ver=<arquivo>): o mapa salvo pré-renderizado, sem o editor"""
+    path = {p.name: p for p in list_saved_maps()}.get(name)
+    if path is None:
+        st.error(f"Mapa salvo não encontrado: {name}")
+        return
+    try:
+        viewer_html = get_viewer_html(str(path), path.stat().st_mtime_ns, df, app_logo_info)
+    except (OSError, ValueError) as e:
+        st.error(f"Erro ao ler o mapa: {e}")
+        return
+    # Nomes e descrições saem escapados do renderizador; os tooltips usam textContent
+    st.iframe(viewer_html, height=VIEWER_FRAME_HEIGHT)
+    RERUN_METRICS.payload("visualizador", len(viewer_html.encode('utf-8')))
+    st.download_button("⬇️ Baixar visualização (HTML)", data=viewer_html, file_name=f"{state_file_stem(path.name)}.html",
+                       mime="text/html", on_click="ignore")
+
+@RERUN_METRICS.cached(st.cache_resource, show_spinner=False)
+def get_thumbnail_cache():
+    """Cache em disco das miniaturas dos mapas salvos"""
+    return ThumbnailCache()
+
+@RERUN_METRICS.cached(st.cache_data, show_spinner=False)
+def get_catalog_by_name(df):
+    """Registros do catálogo por nome do serviço"""
+    return {record['Service']: record for record in df.to_dict('records')}
+
+def render_saved_maps_gallery(saved_maps, df):
+    """Galeria com miniaturas dos mapas salvos no servidor"""
+    with st.expander(f"🖼️ Galeria de mapas salvos ({len(saved_maps)})"):
+        pages = max(1, -(-len(saved_maps) // GALLERY_PAGE_SIZE))
+        page = st.number_input("Página", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+        cache = get_thumbnail_cache()
+        catalog_by_name = get_catalog_by_name(df)
+        digest = get_catalog_hash(df)
+        page_maps = saved_maps[(page - 1) * GALLERY_PAGE_SIZE:page * GALLERY_PAGE_SIZE]
+        columns = st.columns(GALLERY_COLUMNS)
+        for i, path in enumerate(page_maps):
+            with columns[i % GALLERY_COLUMNS]:
+                try:
+                    st.image(cache.thumbnail_for(path, catalog_by_name, digest), width="stretch")
+                except (OSError, ValueError) as e:
+                    st.warning(f"Sem miniatura: {e}")
+                st.caption(path.name)
+                if st.button("📂 Abrir", key=f"gallery_open_{path.name}", width="stretch"):
+                    request_map_load(path)
+
+GALLERY_PAGE_SIZE = 12
+EXPORT_POLL_SECONDS = 1.0
+VIEWER_FRAME_HEIGHT = 800
+GALLERY_COLUMNS = 4
+
 app_logo_info = None 
 
-def main():
-    """Função principal da aplicação"""
+def load_logo_info():
+    """Logo do nó central (ou (None, None) sem arquivo de logo)"""
     global app_logo_info
-
-    df, csv_filename = load_csv_data()
-
-    if df.empty:
-        st.info("Por favor, adicione um arquivo CSV válido na pasta raiz para gerar o mapa mental.")
-        st.stop()
-
     if app_logo_info is None: 
         logo_b64, logo_ext = get_aws_logo_base64()
         if logo_b64:
             app_logo_info = (logo_b64, logo_ext)
         else:
             app_logo_info = (None, None) 
+    return app_logo_info
 
-    html_content = create_mindmap_html(df, csv_filename, app_logo_info)
+def warm_up_steps(report):
+    """Aquecimento: o mesmo trabalho (e os mesmos caches) da primeira visita, passo a passo"""
+    with report.step("catálogo"):
+        df, csv_filename = load_csv_data()
+    if df.empty:
+        return
+    with report.step("logo"):
+        load_logo_info()
+    with report.step("servidores auxiliares"):
+        get_sidecar()
+        get_collab_hub()
+    with report.step("página do mapa"):
+        get_mindmap_build(df, csv_filename, app_logo_info, get_relations_mtimes(df, csv_filename),
+                          get_sidecar(), get_collab_hub())
+    with report.step("miniaturas"):
+        cache = get_thumbnail_cache()
+        catalog_by_name = get_catalog_by_name(df)
+        digest = get_catalog_hash(df)
+        for path in list_saved_maps()[:GALLERY_PAGE_SIZE]:
+            try:
+                cache.thumbnail_for(path, catalog_by_name, digest)
+            except (OSError, ValueError):
+                pass
+
+def rerun_metrics_page_requested():
+    """?metricas=<MINDMAP_ADMIN_TOKEN>; sem a variável (ou com outro valor) o app segue para o mapa"""
+    admin_token = os.environ.get(ADMIN_TOKEN_ENV)
+    given = st.query_params.get('metricas')
+    return bool(admin_token and given and hmac.compare_digest(given, admin_token))
+
+def render_rerun_metrics_page():
+    """Página ?metricas=<token>: tempo por etapa, bytes enviados e acertos de cache deste processo"""
+    metrics = RERUN_METRICS.snapshot()
+    st.subheader("📈 Métricas do servidor")
+    st.caption(f"{metrics['reruns']} rerun(s) em {metrics['segundos_no_ar']:.0f}s de processo. "
+               "Para monitoramento: `GET /metricas/servidor` (JSON) ou `/metricas/servidor/prometheus` "
+               "no servidor auxiliar, com o mesmo token (`?token=` ou `Authorization: Bearer`).")
+    st.markdown("**Etapas (segundos)**")
+    st.dataframe(pd.DataFrame.from_dict(metrics['etapas_segundos'], orient='index'))
+    st.markdown("**Bytes enviados ao navegador**")
+    st.dataframe(pd.DataFrame.from_dict(metrics['bytes_enviados'], orient='index'))
+    st.markdown("**Caches**")
+    st.dataframe(pd.DataFrame.from_dict(metrics['caches'], orient='index'))
+    st.download_button("⬇️ Baixar métricas (JSON)", data=json.dumps(metrics, ensure_ascii=False, indent=2),
+                       file_name="metricas-servidor.json", mime="application/json", on_click="ignore")
 
-    st.components.v1.html(
-        html_content,
-        height=900, 
-        scrolling=False
-    )
+def main():
+    """Função principal da aplicação"""
+    with RERUN_METRICS.stage("catálogo"):
+        df, csv_filename = load_csv_data()
+
+    if df.empty:
+        st.info("Por favor, adicione um arquivo CSV válido na pasta raiz para gerar o mapa mental.")
+        st.stop()
+
+    # Sem aquecimento na subida do servidor (streamlit run app.py), a primeira visita aquece
+    with RERUN_METRICS.stage("aquecimento"):
+        warm_up(warm_up_steps)
+    with RERUN_METRICS.stage("logo"):
+        load_logo_info()
+    if rerun_metrics_page_requested():
+        render_rerun_metrics_page()
+        return
+    view_name = st.query_params.get('ver')
+    if view_name:
+        with RERUN_METRICS.stage("visualizador"):
+            render_map_viewer(view_name, df)
+        return
+
+    with RERUN_METRICS.stage("página do mapa"):
+        version, build = get_mindmap_build(df, csv_filename, app_logo_info, get_relations_mtimes(df, csv_filename),
+                                           get_sidecar(), get_collab_hub())
+        mindmap_component = declare_mindmap_component(version, build)
+    # O navegador só baixa a página quando a versão muda; os argumentos vão a cada rerun
+    if st.session_state.get('mindmap_build_version') != version:
+        st.session_state['mindmap_build_version'] = version
+        RERUN_METRICS.payload("página do mapa", (build / "index.html").stat().st_size)
+
+    with RERUN_METRICS.stage("componente"):
+        # Eventos do rerun anterior primeiro, para a confirmação já seguir nos argumentos
+        handle_mindmap_events(st.session_state.get('aws_mindmap'))
+        acked_session, acked_seq = st.session_state.get('mindmap_acked', (None, 0))
+        sidecar = get_sidecar()
+        collab_hub = get_collab_hub()
+        component_args = {
+            'loadMap': st.session_state.get('mindmap_load_request'),
+            'ackSession': acked_session,
+            'ackSeq': acked_seq,
+            'sidecarToken': sidecar.tokens.issue(session_key()) if sidecar else None,
+            'collabToken': collab_hub.tokens.issue(session_key()) if collab_hub else None,
+        }
+        RERUN_METRICS.payload("argumentos do componente", len(json.dumps(component_args, default=str).encode('utf-8')))
+        mindmap_component(**component_args, key='aws_mindmap', default=None)
+    with RERUN_METRICS.stage("mapas salvos"):
+        render_catalog_sources()
+        saved_maps = list_saved_maps()
+        if saved_maps:
+            selected_map = render_saved_maps_picker(saved_maps)
+            render_map_exports(selected_map, df)
+            render_saved_maps_gallery(saved_maps, df)
 
 if __name__ == "__main__":
-    main()
+    if globals().get("MINDMAP_WARMUP"):
+        warm_up(warm_up_steps)
+    else:
+        with RERUN_METRICS.rerun():
+            main()
 
 st.markdown("""
 <style>
@@ -0,0 +1,178 @@
+"""Medições dos caminhos quentes do app, com linha de base e limite de regressão.
+
+    python bench.py                       # mede e compara com a linha de base
+    python bench.py --gravar-linha-base   # mede e grava a nova linha de base
+    python bench.py --tamanhos 1000 10000 --limite 0.15 --json
+
+Mede ``load_csv_data``, ``get_aws_logo_base64`` e ``create_mindmap_html`` com o
+``services.csv`` real e com catálogos de ``mindmap.synthetic`` (1k, 10k e 100k
+linhas por padrão). Cada caso roda com os caches do Streamlit limpos, que é o custo da
+primeira visita (ou do aquecimento), e registra o melhor tempo entre as
+repetições, o pico de memória alocada (``tracemalloc``, numa execução à parte)
+e o tamanho do resultado. Tempo, memória ou tamanho acima da linha de base mais
+o limite (25% por padrão) contam como regressão e a saída termina com código 1.
+
+A linha de base depende da máquina; por isso fica em
+``.mindmap_data/benchmarks/linha_base.json`` e não no repositório.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25
+METRICS = ("segundos", "pico_bytes", "resultado_bytes")
+# Abaixo disso a variação é ruído do relógio, não regressão
+MIN_SECONDS = 0.005
+
+
+def _measure(run, repeat):
+    """Melhor tempo de ``repeat`` execuções, pico de memória de uma execução extra e o último resultado."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, log=print):
+    """Roda todos os casos; devolve ``{caso: {segundos, pico_bytes, resultado_bytes}}``."""
+    import streamlit as st
+    import app
+    from mindmap.synthetic import write_catalog
+
+    def cold(func, *args):
+        def run():
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            return func(*args)
+        return run
+
+    results = {}
+
+    def record(case, seconds, peak, size):
+        results[case] = {"segundos": round(seconds, 6), "pico_bytes": peak, "resultado_bytes": size}
+        log(f"{case:<34} {seconds * 1000:>10.1f} ms {peak / 1e6:>9.1f} MB {size / 1e6:>9.2f} MB")
+
+    seconds, peak, logo = _measure(cold(app.get_aws_logo_base64), repeat)
+    record("get_aws_logo_base64", seconds, peak, len(logo[0] or ""))
+    logo_info = logo if logo[0] else (None, None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalogs = [("real", str(ROOT / "services.csv"))]
+        for size in sizes:
+            path = Path(tmp) / f"sintetico_{size}.csv"
+            write_catalog(path, size)
+            catalogs.append((f"{size // 1000}k" if size % 1000 == 0 else str(size), str(path)))
+
+        previous = os.environ.get("MINDMAP_CATALOGS")
+        try:
+            for label, path in catalogs:
+                os.environ["MINDMAP_CATALOGS"] = path
+                seconds, peak, (df, name) = _measure(cold(app.load_csv_data), repeat)
+                record(f"load_csv_data[{label}]", seconds, peak, int(df.memory_usage(deep=True).sum()))
+                # Catálogos grandes custam segundos por execução; menos repetições bastam
+                html_repeat = max(1, repeat // 2) if len(df) > 50000 else repeat
+                seconds, peak, html = _measure(cold(app.create_mindmap_html, df, name, logo_info), html_repeat)
+                record(f"create_mindmap_html[{label}]", seconds, peak, len(html.encode("utf-8")))
+        finally:
+            if previous is None:
+                os.environ.pop("MINDMAP_CATALOGS", None)
+            else:
+                os.environ["MINDMAP_CATALOGS"] = previous
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Lista ``(caso, métrica, base, atual, variação)`` de tudo que passou do limite."""
+    regressions = []
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), metrics[metric]
+            if not old:
+                continue
+            if metric == "segundos" and new < MIN_SECONDS:
+                continue
+            change = new / old - 1
+            if change > threshold:
+                regressions.append((case, metric, old, new, change))
+    return regressions
+
+
+def default_baseline_path():
+    from mindmap.paths import data_dir
+
+    return data_dir("benchmarks") / "linha_base.json"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede os caminhos quentes do app e compara com a linha de base.")
+    parser.add_argument("--tamanhos", nargs="*", type=int, default=list(DEFAULT_SIZES),
+                        help="Linhas dos catálogos sintéticos.")
+    parser.add_argument("--repeticoes", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--limite", type=float, default=DEFAULT_THRESHOLD,
+                        help="Aumento tolerado sobre a linha de base (0.25 = 25%%).")
+    parser.add_argument("--linha-base", type=Path, help="Arquivo da linha de base.")
+    parser.add_argument("--gravar-linha-base", action="store_true", help="Grava os resultados como nova linha de base.")
+    parser.add_argument("--json", action="store_true", help="Resultado e regressões em JSON.")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    # Sem sessão do Streamlit os caches avisam a cada chamada
+    logging.disable(logging.WARNING)
+    baseline_path = args.linha_base or default_baseline_path()
+    log = (lambda line: None) if args.json else print
+
+    results = run_suite(args.tamanhos, args.repeticoes, log)
+
+    if args.gravar_linha_base:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps({
+            "_meta": {"python": platform.python_version(), "maquina": platform.node(),
+                      "gravada_em": time.strftime("%Y-%m-%d %H:%M:%S")},
+            "casos": results,
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+        log(f"Linha de base gravada em {baseline_path}")
+        regressions = []
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8")).get("casos", {})
+        regressions = compare(results, baseline, args.limite)
+        for case, metric, old, new, change in regressions:
+            log(f"REGRESSÃO {case} {metric}: {old} -> {new} (+{change:.0%})")
+        if not regressions:
+            log(f"Sem regressões acima de {args.limite:.0%} em relação a {baseline_path}")
+    else:
+        regressions = []
+        log(f"Sem linha de base em {baseline_path}; use --gravar-linha-base")
+
+    if args.json:
+        print(json.dumps({"resultados": results, "regressoes": [
+            {"caso": case, "metrica": metric, "base": old, "atual": new, "variacao": round(change, 4)}
+            for case, metric, old, new, change in regressions]}, ensure_ascii=False))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Módulos auxiliares do AWS MindMap pro (índices, formatos e ferramentas)."""
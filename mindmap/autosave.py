@@ -0,0 +1,311 @@
+"""Salvamento automático no servidor: log de deltas por mapa em SQLite, com compactação.
+
+O navegador envia lotes de operações pequenas (em vez do mapa inteiro)::
+
+    {"op": "add", "ref": [id, x, y, parentId]}              # nó do catálogo
+    {"op": "add", "node": {id, name, category, ...}}         # nó customizado
+    {"op": "move", "id": ..., "x": ..., "y": ...}
+    {"op": "reparent", "id": ..., "parentId": ...}
+    {"op": "remove", "id": ...}
+    {"op": "reset", "state": {...formato compacto...}}       # mapa carregado de arquivo
+    {"op": "view", "viewBox": [x, y, width, height]}
+    {"op": "catalog", "catalog": {"name": ..., "hash": ...}}  # catálogo em uso
+
+Cada lote vira uma linha na tabela ``deltas``. O navegador numera os seus lotes
+(``cliente`` + ``lote``) e manda um de cada vez; ao fechar a página com um
+lote ainda em voo, reenvia as operações dele junto com as novas num lote
+seguinte. As operações são atribuições (idempotentes), então basta descartar
+um lote que chegue depois de outro mais novo do mesmo cliente.
+
+Operações malformadas são recusadas antes de gravar (:func:`check_op`): um
+delta gravado é reaplicado em toda restauração e compactação, então um só
+delta inválido quebraria o mapa para sempre. Por segurança, :func:`apply_ops`
+também pula o que não passar na verificação.
+
+Quando um mapa acumula deltas demais, eles são aplicados sobre o último
+snapshot (formato compacto v2) e apagados; restaurar um mapa é ler o snapshot
+e aplicar só os deltas restantes.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from mindmap.paths import data_dir
+from mindmap.state_format import AWS_CENTER_ID, DEFAULT_CENTER, FORMAT_NAME, FORMAT_VERSION, dumps_state, encode_state
+
+COMPACT_EVERY_DELTAS = 50
+MAX_OPS_PER_BATCH = 5000
+MAX_TRACKED_CLIENTS = 10000
+OP_KINDS = ("add", "move", "reparent", "remove", "reset", "view", "catalog")
+
+
+def empty_state():
+    return {"format": FORMAT_NAME, "version": FORMAT_VERSION, "catalog": {"name": "", "hash": ""},
+            "center": list(DEFAULT_CENTER), "refs": [], "custom": []}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_id(value):
+    return isinstance(value, str) and bool(value)
+
+
+def _check_position(x, y, what):
+    if not (_is_number(x) and _is_number(y)):
+        raise ValueError(f"{what}: coordenadas devem ser números finitos.")
+
+
+def _check_parent(parent_id, what):
+    if parent_id is not None and not _is_id(parent_id):
+        raise ValueError(f"{what}: 'parentId' deve ser texto ou null.")
+
+
+def _check_ref(ref, what):
+    if not isinstance(ref, list) or len(ref) != 4:
+        raise ValueError(f"{what}: 'ref' deve ser [id, x, y, parentId].")
+    if not _is_id(ref[0]):
+        raise ValueError(f"{what}: id deve ser texto não vazio.")
+    _check_position(ref[1], ref[2], what)
+    _check_parent(ref[3], what)
+
+
+def _check_custom(node, what):
+    if not isinstance(node, dict) or not _is_id(node.get("id")):
+        raise ValueError(f"{what}: nó customizado precisa de 'id' (texto).")
+    _check_position(node.get("x"), node.get("y"), what)
+    _check_parent(node.get("parentId"), what)
+
+
+def _check_view_box(view_box, what):
+    if not isinstance(view_box, list) or len(view_box) != 4 or not all(_is_number(v) for v in view_box):
+        raise ValueError(f"{what}: 'viewBox' deve ter 4 números.")
+
+
+def _check_catalog(catalog, what):
+    if not isinstance(catalog, dict) or not all(isinstance(catalog.get(k, ""), str) for k in ("name", "hash")):
+        raise ValueError(f"{what}: 'catalog' deve ter 'name' e 'hash' em texto.")
+
+
+def _check_state(state, what):
+    if not isinstance(state, dict):
+        raise ValueError(f"{what}: 'state' deve ser um objeto.")
+    center = state.get("center", list(DEFAULT_CENTER))
+    if not isinstance(center, list) or len(center) != 2:
+        raise ValueError(f"{what}: 'center' deve ser [x, y].")
+    _check_position(center[0], center[1], what)
+    refs, custom = state.get("refs", []), state.get("custom", [])
+    if not isinstance(refs, list) or not isinstance(custom, list):
+        raise ValueError(f"{what}: 'refs' e 'custom' devem ser listas.")
+    for ref in refs:
+        _check_ref(ref, what)
+    for node in custom:
+        _check_custom(node, what)
+    if state.get("viewBox") is not None:
+        _check_view_box(state["viewBox"], what)
+    if "catalog" in state:
+        _check_catalog(state["catalog"], what)
+
+
+def check_op(op, what="operação"):
+    """Levanta ``ValueError`` se ``op`` não puder ser aplicada por :func:`apply_ops`."""
+    if not isinstance(op, dict) or op.get("op") not in OP_KINDS:
+        raise ValueError(f"{what}: tipo desconhecido.")
+    kind = op["op"]
+    if kind == "add":
+        if "ref" in op:
+            _check_ref(op["ref"], what)
+        else:
+            _check_custom(op.get("node"), what)
+    elif kind in ("move", "reparent", "remove"):
+        if not _is_id(op.get("id")):
+            raise ValueError(f"{what}: 'id' deve ser texto não vazio.")
+        if kind == "move":
+            _check_position(op.get("x"), op.get("y"), what)
+        elif kind == "reparent":
+            _check_parent(op.get("parentId"), what)
+    elif kind == "reset":
+        if op.get("state") is not None:
+            _check_state(op["state"], what)
+    elif kind == "view":
+        _check_view_box(op.get("viewBox"), what)
+    else:
+        _check_catalog(op.get("catalog"), what)
+
+
+def _state_to_nodes(state):
+    nodes = {AWS_CENTER_ID: {"id": AWS_CENTER_ID, "x": state.get("center", DEFAULT_CENTER)[0],
+                             "y": state.get("center", DEFAULT_CENTER)[1], "isCentral": True, "parentId": None}}
+    for node_id, x, y, parent_id in state.get("refs", []):
+        nodes[node_id] = {"id": node_id, "x": x, "y": y, "parentId": parent_id}
+    for node in state.get("custom", []):
+        nodes[node["id"]] = dict(node, isCustom=True)
+    return nodes
+
+
+def apply_ops(state, ops):
+    """Aplica uma lista de operações a um estado compacto e devolve o novo estado.
+
+    Operações malformadas (gravadas antes da verificação em :meth:`AutosaveStore.append`) são ignoradas.
+    """
+    nodes = _state_to_nodes(state)
+    view_box = state.get("viewBox")
+    catalog = state.get("catalog", {"name": "", "hash": ""})
+    for op in ops:
+        try:
+            check_op(op)
+        except ValueError:
+            continue
+        kind = op["op"]
+        if kind == "reset":
+            new_state = op.get("state") or empty_state()
+            nodes = _state_to_nodes(new_state)
+            view_box = new_state.get("viewBox")
+            catalog = new_state.get("catalog", catalog)
+        elif kind == "add":
+            if "ref" in op:
+                node_id, x, y, parent_id = op["ref"]
+                nodes[node_id] = {"id": node_id, "x": x, "y": y, "parentId": parent_id}
+            else:
+                nodes[op["node"]["id"]] = dict(op["node"], isCustom=True)
+        elif kind == "move" and op.get("id") in nodes:
+            nodes[op["id"]]["x"] = op.get("x", 0)
+            nodes[op["id"]]["y"] = op.get("y", 0)
+        elif kind == "reparent" and op.get("id") in nodes:
+            nodes[op["id"]]["parentId"] = op.get("parentId")
+        elif kind == "remove" and op.get("id") != AWS_CENTER_ID:
+            nodes.pop(op.get("id"), None)
+        elif kind == "view":
+            view_box = op["viewBox"]
+        elif kind == "catalog":
+            catalog = op["catalog"]
+
+    new_state = encode_state(list(nodes.values()), catalog_name=catalog.get("name", ""),
+                             catalog_digest=catalog.get("hash", ""))
+    if view_box:
+        new_state["viewBox"] = view_box
+    return new_state
+
+
+class AutosaveStore:
+    """Log de deltas por mapa em SQLite (um único arquivo para todos os mapas)."""
+
+    def __init__(self, db_path=None, compact_every=COMPACT_EVERY_DELTAS):
+        self.db_path = str(db_path or data_dir() / "autosave.sqlite3")
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._batches = OrderedDict()  # (mapa, cliente) -> último lote gravado
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                map_id TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS deltas (
+                map_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                ops TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (map_id, seq)
+            );
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _last_seq(self, map_id):
+        row = self._conn.execute(
+            "SELECT MAX(seq) FROM (SELECT seq FROM snapshots WHERE map_id = ? "
+            "UNION ALL SELECT seq FROM deltas WHERE map_id = ?)", (map_id, map_id)).fetchone()
+        return row[0] or 0
+
+    def append(self, map_id, ops, client=None, batch=None):
+        """Grava um lote de operações e devolve o número de sequência do lote.
+
+        Com ``client`` e ``batch``, um lote mais velho que o último gravado do mesmo
+        cliente é ignorado (devolve a sequência atual sem gravar). ``ValueError`` se
+        alguma operação for malformada; nesse caso nada é gravado.
+        """
+        if not ops:
+            return self.last_seq(map_id)
+        if len(ops) > MAX_OPS_PER_BATCH:
+            raise ValueError(f"Lote com {len(ops)} operações (máximo {MAX_OPS_PER_BATCH}).")
+        for i, op in enumerate(ops):
+            check_op(op, f"Operação {i}")
+        with self._lock:
+            if client is not None and batch is not None:
+                key = (map_id, client)
+                if batch <= self._batches.get(key, 0):
+                    return self._last_seq(map_id)
+                self._batches[key] = batch
+                self._batches.move_to_end(key)
+                while len(self._batches) > MAX_TRACKED_CLIENTS:
+                    self._batches.popitem(last=False)
+            seq = self._last_seq(map_id) + 1
+            self._conn.execute("INSERT INTO deltas (map_id, seq, ops, created_at) VALUES (?, ?, ?, ?)",
+                               (map_id, seq, json.dumps(ops, ensure_ascii=False, separators=(",", ":")), time.time()))
+            self._conn.commit()
+            pending = self._conn.execute("SELECT COUNT(*) FROM deltas WHERE map_id = ?", (map_id,)).fetchone()[0]
+            if pending >= self.compact_every:
+                self._compact_locked(map_id)
+        return seq
+
+    def last_seq(self, map_id):
+        with self._lock:
+            return self._last_seq(map_id)
+
+    def _load_locked(self, map_id):
+        row = self._conn.execute("SELECT seq, state FROM snapshots WHERE map_id = ?", (map_id,)).fetchone()
+        snapshot_seq, state = (row[0], json.loads(row[1])) if row else (0, None)
+        deltas = self._conn.execute("SELECT seq, ops FROM deltas WHERE map_id = ? AND seq > ? ORDER BY seq",
+                                    (map_id, snapshot_seq)).fetchall()
+        if state is None and not deltas:
+            return None, 0, 0
+        state = state or empty_state()
+        ops = []
+        for _, ops_json in deltas:
+            ops.extend(json.loads(ops_json))
+        if ops:
+            state = apply_ops(state, ops)
+        last_seq = deltas[-1][0] if deltas else snapshot_seq
+        return state, last_seq, len(deltas)
+
+    def restore(self, map_id):
+        """Estado compacto mais recente do mapa e seu número de sequência (ou (None, 0))."""
+        with self._lock:
+            state, seq, _ = self._load_locked(map_id)
+        return state, seq
+
+    def _compact_locked(self, map_id):
+        state, seq, pending = self._load_locked(map_id)
+        if state is None or pending == 0:
+            return False
+        self._conn.execute(
+            "INSERT INTO snapshots (map_id, seq, state, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(map_id) DO UPDATE SET seq = excluded.seq, state = excluded.state, updated_at = excluded.updated_at",
+            (map_id, seq, dumps_state(state), time.time()))
+        self._conn.execute("DELETE FROM deltas WHERE map_id = ? AND seq <= ?", (map_id, seq))
+        self._conn.commit()
+        return True
+
+    def compact(self, map_id):
+        """Aplica os deltas pendentes ao snapshot e os descarta."""
+        with self._lock:
+            return self._compact_locked(map_id)
+
+    def compact_all(self, min_idle_seconds=0):
+        """Compacta todos os mapas com deltas pendentes parados há pelo menos ``min_idle_seconds``."""
+        cutoff = time.time() - min_idle_seconds
+        with self._lock:
+            map_ids = [row[0] for row in self._conn.execute(
+                "SELECT map_id FROM deltas GROUP BY map_id HAVING MAX(created_at) <= ?", (cutoff,))]
+            return sum(1 for map_id in map_ids if self._compact_locked(map_id))
@@ -0,0 +1,195 @@
+"""Leitura do catálogo de serviços (CSV) sem depender do Streamlit.
+
+Usado pelas ferramentas de linha de comando e pelo app (``CatalogRegistry``).
+
+Sem configuração o app usa um catálogo só: ``services.csv`` ou, se não
+existir, o primeiro CSV da pasta em ordem alfabética (fora os de relações).
+Para juntar vários catálogos (o da AWS e um interno, por exemplo) num único
+espaço de nomes, liste-os em ``MINDMAP_CATALOGS`` (caminhos separados por
+vírgula, em ordem de precedência). Um serviço repetido vale o do primeiro
+catálogo da lista; cada registro leva a sua origem em ``Source``.
+"""
+import csv
+import os
+import threading
+from pathlib import Path
+
+from mindmap.relations import is_relations_file
+
+REQUIRED_COLUMNS = ("Service", "Category", "Description")
+CATALOGS_ENV = "MINDMAP_CATALOGS"
+DEFAULT_CATALOG = "services.csv"
+
+
+def canonical_column(col):
+    """Mapeia variações de cabeçalho ("Nome do Serviço", "Categoria"...) para Service/Category/Description."""
+    col_lower_stripped = col.lower().strip().replace("ç", "c").replace("ã", "a")
+    if col_lower_stripped in ("nome do servico", "service", "servico"):
+        return "Service"
+    if col_lower_stripped in ("categoria", "category"):
+        return "Category"
+    if col_lower_stripped in ("descricao", "description") or "descric" in col_lower_stripped:
+        return "Description"
+    return None
+
+
+def read_catalog(path):
+    """Lê um CSV de catálogo e devolve a lista de registros {Service, Category, Description}.
+
+    Aplica as mesmas regras de ``load_csv_data``: ignora linhas sem serviço,
+    remove duplicados (mantém o primeiro) e troca vazios por ''. Aceita o BOM
+    que o Excel grava no início de arquivos UTF-8.
+    """
+    with open(Path(path), newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = {}
+        for i, col in enumerate(header):
+            canonical = canonical_column(col)
+            if canonical and canonical not in positions:
+                positions[canonical] = i
+        missing = [col for col in REQUIRED_COLUMNS if col not in positions]
+        if missing:
+            raise ValueError(f"CSV deve conter as colunas: {missing}. Encontradas: {header}")
+
+        records = []
+        seen = set()
+        for row in reader:
+            record = {}
+            for col in REQUIRED_COLUMNS:
+                i = positions[col]
+                record[col] = row[i] if i < len(row) else ""
+            record["Service"] = record["Service"].strip()
+            if not record["Service"] or record["Service"] in seen:
+                continue
+            seen.add(record["Service"])
+            records.append(record)
+        return records
+
+
+def configured_catalog_paths(root="."):
+    """CSVs do catálogo em ordem de precedência (ver docstring do módulo)."""
+    setting = os.environ.get(CATALOGS_ENV, "").strip()
+    if setting:
+        return [item.strip() for item in setting.split(",") if item.strip()]
+    default = Path(root) / DEFAULT_CATALOG
+    if default.is_file():
+        return [str(default)]
+    candidates = sorted(str(path) for path in Path(root).glob("*.csv") if not is_relations_file(path))
+    return candidates[:1]
+
+
+class _CatalogFile:
+    def __init__(self, path, signature, records):
+        self.path = path
+        self.signature = signature
+        self.records = records
+        self.by_name = {record["Service"]: record for record in records}
+
+
+class CatalogRegistry:
+    """Catálogos configurados, com cache por arquivo e índice mesclado incremental.
+
+    ``refresh()`` confere o ``stat`` de cada arquivo; só os que mudaram são
+    relidos, e só os nomes deles são reavaliados no índice ``nome -> registro``.
+    """
+
+    def __init__(self, paths=None, root="."):
+        self._configured = list(paths) if paths is not None else None
+        self.root = root
+        self.order = []
+        self.errors = {}
+        self._files = {}
+        self._owners = {}  # nome -> caminhos que o definem, em ordem de precedência
+        self._merged = {}
+        self._records = None
+        self._lock = threading.Lock()
+
+    def _signature(self, path):
+        stat = Path(path).stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """Relê os arquivos alterados; devolve ``True`` se o catálogo mesclado mudou."""
+        with self._lock:
+            order = self._configured if self._configured is not None else configured_catalog_paths(self.root)
+            changed = order != self.order
+            if changed:
+                # Precedência nova: o cache por arquivo continua valendo, só o índice é refeito
+                self.order = list(order)
+                self._owners.clear()
+                self._merged.clear()
+                for path in list(self._files):
+                    if path not in self.order:
+                        del self._files[path]
+                for path in list(self.errors):
+                    if path not in self.order:
+                        del self.errors[path]
+                for path in self.order:
+                    if path in self._files:
+                        self._reindex(path, (), self._files[path].by_name)
+            for path in self.order:
+                try:
+                    signature = self._signature(path)
+                    current = self._files.get(path)
+                    if current is not None and current.signature == signature:
+                        continue
+                    loaded = _CatalogFile(path, signature, read_catalog(path))
+                except (OSError, ValueError, UnicodeDecodeError, csv.Error) as exc:
+                    self.errors[path] = str(exc)
+                    loaded = None
+                else:
+                    self.errors.pop(path, None)
+                old_names = self._files.pop(path).by_name if path in self._files else {}
+                if loaded is not None:
+                    self._files[path] = loaded
+                self._reindex(path, old_names, loaded.by_name if loaded else {})
+                changed = True
+            if changed:
+                self._records = None
+            return changed
+
+    def _reindex(self, path, old_names, new_names):
+        rank = {p: i for i, p in enumerate(self.order)}
+        for name in old_names:
+            if name not in new_names:
+                self._owners[name].remove(path)
+        for name in new_names:
+            owners = self._owners.setdefault(name, [])
+            if path not in owners:
+                owners.append(path)
+                owners.sort(key=rank.__getitem__)
+        for name in set(old_names) | set(new_names):
+            owners = self._owners.get(name)
+            if owners:
+                self._merged[name] = dict(self._files[owners[0]].by_name[name], Source=owners[0])
+            else:
+                self._owners.pop(name, None)
+                self._merged.pop(name, None)
+
+    def snapshot(self):
+        """``(assinatura, registros mesclados)``, coerentes entre si.
+
+        Os registros seguem os catálogos em ordem de precedência e as linhas na ordem do arquivo.
+        """
+        with self._lock:
+            if self._records is None:
+                self._records = [self._merged[name] for path in self.order if path in self._files
+                                 for name in self._files[path].by_name if self._owners[name][0] == path]
+            return self.signature, self._records
+
+    @property
+    def records(self):
+        return self.snapshot()[1]
+
+    @property
+    def signature(self):
+        """Identifica o conteúdo atual (muda quando qualquer arquivo muda)."""
+        return tuple((path, self._files[path].signature) for path in self.order if path in self._files)
+
+    def conflicts(self):
+        """Serviços definidos em mais de um catálogo: ``nome -> caminhos`` (o primeiro vale)."""
+        return {name: list(owners) for name, owners in self._owners.items() if len(owners) > 1}
+
+    def counts(self):
+        return {path: len(self._files[path].records) for path in self.order if path in self._files}
@@ -0,0 +1,199 @@
+"""Diferença entre duas versões do catálogo e migração em lote dos mapas salvos.
+
+Os ids dos nós são nomes de serviço; quando o ``services.csv`` muda, os mapas
+salvos ficam com referências e cópias antigas. Cada versão do catálogo vira um
+índice de hashes por linha (nome -> hash de categoria e descrição, hash ->
+nomes, nome normalizado -> nome), e a diferença sai de consultas a esses
+dicionários: o custo é linear no tamanho dos catálogos. Renomeações são
+reconhecidas pelo nome normalizado (maiúsculas, acentos e pontuação) ou, se
+não houver, por uma linha removida e uma incluída com o mesmo conteúdo.
+
+A migração passa uma vez por cada mapa (leitura incremental de
+``state_validator``), troca as referências renomeadas, grava os serviços
+removidos como nós customizados (com os dados do catálogo antigo) e lista
+esses nós no relatório, junto com as renomeações que caíram sobre um nó que
+já estava no mapa (só o primeiro é mantido). Cada mapa é gravado num ``.tmp``
+e só então substitui o destino, então ``--saida`` pode ser a própria pasta dos mapas.
+
+Uso::
+
+    python -m mindmap.catalog_diff diferenca services_antigo.csv services.csv
+    python -m mindmap.catalog_diff migrar services_antigo.csv services.csv .mindmap_data/maps --saida mapas_migrados
+    python -m mindmap.catalog_diff migrar services_antigo.csv services.csv .mindmap_data/maps --substituir
+"""
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+from mindmap.catalog import read_catalog
+from mindmap.search_index import normalize_text
+from mindmap.state_format import STATE_FILE_SUFFIXES
+from mindmap.state_validator import StateFormatError, index_catalog, repair_state_file
+
+SUFFIX_COMPRESSION = {".json.gz": "gzip", ".json.deflate": "deflate"}
+
+
+def _row_digest(*values):
+    digest = hashlib.blake2b(digest_size=8)
+    for value in values:
+        digest.update(str(value).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def name_key(name):
+    """Nome comparável entre versões: sem acentos, maiúsculas, espaços ou pontuação."""
+    return "".join(ch for ch in normalize_text(name) if ch.isalnum())
+
+
+class CatalogIndex:
+    """Índices de hash de uma versão do catálogo."""
+
+    def __init__(self, records):
+        self.records = {}
+        self.rows = {}
+        self.by_content = {}
+        self.by_key = {}
+        for record in records:
+            name = record["Service"]
+            self.records[name] = record
+            self.rows[name] = _row_digest(record.get("Category", ""), record.get("Description", ""))
+            self.by_content.setdefault(_row_digest(normalize_text(record.get("Description", ""))), []).append(name)
+            if name_key(name):
+                self.by_key.setdefault(name_key(name), name)
+
+    def content_key(self, name):
+        return _row_digest(normalize_text(self.records[name].get("Description", "")))
+
+
+class CatalogDiff:
+    """Serviços incluídos, removidos, renomeados (antigo -> novo) e alterados (campos)."""
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.added = [name for name in new.rows if name not in old.rows]
+        removed = [name for name in old.rows if name not in new.rows]
+        self.renamed = {}
+        added = set(self.added)
+        for name in removed:
+            candidate = new.by_key.get(name_key(name)) if name_key(name) else None
+            if candidate not in added:
+                same_content = [n for n in new.by_content.get(old.content_key(name), []) if n in added]
+                candidate = same_content[0] if len(same_content) == 1 else None
+            if candidate is not None:
+                self.renamed[name] = candidate
+                added.discard(candidate)
+        self.added = [name for name in self.added if name in added]
+        self.removed = [name for name in removed if name not in self.renamed]
+        self.changed = {}
+        for name, digest in old.rows.items():
+            target = self.renamed.get(name, name)
+            if target in new.rows and new.rows[target] != digest:
+                self.changed[target] = [field for field in ("Category", "Description")
+                                        if old.records[name].get(field) != new.records[target].get(field)]
+
+    def as_dict(self):
+        return {"incluidos": self.added, "removidos": self.removed, "renomeados": self.renamed,
+                "alterados": self.changed}
+
+    def summary(self):
+        return (f"{len(self.added)} incluído(s), {len(self.removed)} removido(s), "
+                f"{len(self.renamed)} renomeado(s), {len(self.changed)} alterado(s)")
+
+
+def diff_catalogs(old_records, new_records):
+    return CatalogDiff(CatalogIndex(old_records), CatalogIndex(new_records))
+
+
+def iter_map_files(paths):
+    """Arquivos de mapa informados diretamente ou dentro das pastas informadas."""
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from sorted(p for p in path.iterdir() if p.name.endswith(STATE_FILE_SUFFIXES))
+        else:
+            yield path
+
+
+def migrate_map_file(path, out_path, diff, new_records, compression=None, catalog_name="", catalog_index=None):
+    """Migra um mapa para o catálogo novo; devolve o relatório (com ``renamed_refs`` e ``removed_refs``)."""
+    return repair_state_file(path, out_path, new_records, compression, catalog_name=catalog_name,
+                             renamed=diff.renamed, previous_by_name=diff.old.records, catalog_index=catalog_index)
+
+
+def _compression_of(path):
+    return next((c for suffix, c in SUFFIX_COMPRESSION.items() if path.name.endswith(suffix)), None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara versões do catálogo e migra os mapas salvos.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    diff_cmd = sub.add_parser("diferenca", help="Mostra o que mudou entre dois CSVs de catálogo.")
+    diff_cmd.add_argument("antigo", type=Path)
+    diff_cmd.add_argument("novo", type=Path)
+    diff_cmd.add_argument("--json", action="store_true", help="Saída em JSON.")
+
+    migrate_cmd = sub.add_parser("migrar", help="Atualiza mapas salvos (arquivos ou pastas) para o catálogo novo.")
+    migrate_cmd.add_argument("antigo", type=Path)
+    migrate_cmd.add_argument("novo", type=Path)
+    migrate_cmd.add_argument("mapas", nargs="+", type=Path)
+    target = migrate_cmd.add_mutually_exclusive_group(required=True)
+    target.add_argument("--saida", type=Path, help="Pasta de saída.")
+    target.add_argument("--substituir", action="store_true", help="Regrava cada mapa no próprio arquivo.")
+
+    args = parser.parse_args(argv)
+    new_records = read_catalog(args.novo)
+    diff = diff_catalogs(read_catalog(args.antigo), new_records)
+
+    if args.comando == "diferenca":
+        if args.json:
+            print(json.dumps(diff.as_dict(), ensure_ascii=False))
+        else:
+            print(diff.summary())
+            for name in diff.added:
+                print(f"  + {name}")
+            for name in diff.removed:
+                print(f"  - {name}")
+            for old_name, new_name in diff.renamed.items():
+                print(f"  ~ {old_name} -> {new_name}")
+            for name, fields in diff.changed.items():
+                print(f"  * {name}: {', '.join(fields)}")
+        return 0
+
+    print(f"Catálogo: {diff.summary()}")
+    if args.saida:
+        args.saida.mkdir(parents=True, exist_ok=True)
+    catalog_index = index_catalog(new_records)
+    failures = 0
+    sources = {}
+    for path in iter_map_files(args.mapas):
+        compression = _compression_of(path)
+        out_path = path if args.substituir else args.saida / path.name
+        key = out_path.resolve()
+        if key in sources:
+            failures += 1
+            print(f"{path}: saída {out_path} já usada por {sources[key]}; arquivo ignorado.", file=sys.stderr)
+            continue
+        sources[key] = path
+        try:
+            report = migrate_map_file(path, out_path, diff, new_records, compression, args.novo.name, catalog_index)
+        except (StateFormatError, OSError) as e:
+            failures += 1
+            print(f"{path}: {e}", file=sys.stderr)
+            continue
+        print(f"{path}: {len(report.renamed_refs)} referência(s) renomeada(s), "
+              f"{len(report.removed_refs)} serviço(s) removido(s) do catálogo")
+        for node_id in report.removed_refs:
+            print(f"  removido: {node_id} (mantido como nó customizado)")
+        for issue in report.issues:
+            if issue["codigo"] == "renomeado_existente":
+                print(f"  aviso: {issue['mensagem']}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Métricas de desempenho medidas no navegador e agregadas no servidor.
+
+Uma fração das sessões (``MINDMAP_PERF_SAMPLE``, padrão 10%) mede com
+``performance.mark``/``measure`` as operações de :data:`OPERATIONS` e conta as
+tarefas longas (``longtask``). O navegador já agrupa as medidas em
+histogramas com os limites de :data:`BUCKETS_MS`, separados pelo tamanho do
+mapa no momento da medida (:data:`SIZE_BANDS`), e envia um lote pequeno pelo
+servidor auxiliar a cada ``intervaloMs`` e ao sair da página::
+
+    {"sessao": "...", "versao": 1,
+     "operacoes": {"renderNode": {"100-1k": {"n": 12, "soma": 30.5, "max": 9.1, "baldes": [0, 3, ...]}}}}
+
+Aqui os lotes são somados (:class:`ClientMetrics`) e gravados periodicamente em
+``.mindmap_data/metricas/cliente.json``. Comparar a mesma operação entre faixas
+mostra o que fica lento quando o mapa cresce.
+
+Uso::
+
+    python -m mindmap.client_metrics resumo
+    python -m mindmap.client_metrics resumo --operacao renderNode --json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from mindmap.paths import data_dir
+
+REPORT_VERSION = 1
+DEFAULT_SAMPLE_RATE = 0.1
+FLUSH_INTERVAL_MS = 30000
+SAVE_INTERVAL = 60
+# Limite superior (ms) de cada balde; o último balde recebe o que passar do maior limite
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 50, 100, 200, 400, 800, 1600, 3200, 6400)
+# (rótulo, mínimo de nós no mapa), em ordem crescente
+SIZE_BANDS = (("0-100", 0), ("100-1k", 100), ("1k-10k", 1000), ("10k+", 10000))
+LONG_TASK = "longtask"
+OPERATIONS = ("renderNode", "renderEdge", "loadMindMapState", "addServicesByCategory", "downloadPDF", LONG_TASK)
+# Tamanho de cada geração do conjunto de sessões recentes (a contagem é aproximada)
+MAX_SESSIONS = 10000
+
+
+def sample_rate():
+    """Fração das sessões medidas (``MINDMAP_PERF_SAMPLE``, entre 0 e 1)."""
+    try:
+        rate = float(os.environ.get("MINDMAP_PERF_SAMPLE", DEFAULT_SAMPLE_RATE))
+    except ValueError:
+        return DEFAULT_SAMPLE_RATE
+    return min(1.0, max(0.0, rate))
+
+
+def browser_config():
+    """Configuração repassada ao navegador junto com a página do mapa."""
+    return {"versao": REPORT_VERSION, "amostra": sample_rate(), "intervaloMs": FLUSH_INTERVAL_MS, "baldes": list(BUCKETS_MS),
+            "faixas": [list(band) for band in SIZE_BANDS], "operacoes": list(OPERATIONS[:-1])}
+
+
+class LatencyHistogram:
+    """Contagem por balde, soma e máximo das durações (ms) de uma operação numa faixa."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        for i, bound in enumerate(BUCKETS_MS):
+            if duration <= bound:
+                break
+        else:
+            i = len(BUCKETS_MS)
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def merge(self, data):
+        """Soma um histograma no formato do lote (``n``, ``soma``, ``max``, ``baldes``)."""
+        buckets = data.get("baldes")
+        if not isinstance(buckets, list) or len(buckets) != len(self.buckets):
+            raise ValueError(f"Histograma deve ter {len(self.buckets)} baldes.")
+        if not all(isinstance(v, int) and v >= 0 for v in buckets):
+            raise ValueError("Baldes devem ser contagens inteiras.")
+        total, peak = data.get("soma", 0), data.get("max", 0)
+        if not all(isinstance(v, (int, float)) and v >= 0 for v in (total, peak)):
+            raise ValueError("Soma e máximo devem ser números não negativos.")
+        for i, value in enumerate(buckets):
+            self.buckets[i] += value
+        self.count += sum(buckets)
+        self.total += total
+        self.max = max(self.max, peak)
+
+    def percentile(self, fraction):
+        """Estimativa pelo limite superior do balde (o último balde usa o máximo visto)."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for i, value in enumerate(self.buckets):
+            seen += value
+            if value and seen >= target:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {"n": self.count, "soma": round(self.total, 3), "max": round(self.max, 3), "baldes": list(self.buckets)}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.merge(data)
+        return histogram
+
+
+class ClientMetrics:
+    """Histogramas por ``(operação, faixa do mapa)``, somados de todos os lotes recebidos."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else data_dir("metricas") / "cliente.json"
+        self.histograms = {}
+        self.reports = 0
+        self.sessions = 0
+        # Duas gerações de ids recentes: ao encher, a atual vira a anterior e a mais velha é descartada.
+        # Uma sessão que volta depois de duas trocas conta de novo; a memória fica limitada.
+        self._recent_sessions = set()
+        self._older_sessions = set()
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        self.reports = data.get("lotes", 0)
+        self.sessions = data.get("sessoes", 0)
+        for op, bands in data.get("operacoes", {}).items():
+            for band, histogram in bands.items():
+                try:
+                    self.histograms[op, band] = LatencyHistogram.from_dict(histogram)
+                except ValueError:
+                    continue
+
+    def record(self, report):
+        """Soma um lote do navegador; ``ValueError`` se o lote for inválido (nada é somado)."""
+        if not isinstance(report, dict) or report.get("versao") != REPORT_VERSION:
+            raise ValueError(f"Lote de métricas deve ter versao {REPORT_VERSION}.")
+        operations = report.get("operacoes")
+        if not isinstance(operations, dict):
+            raise ValueError("Campo 'operacoes' deve ser um objeto.")
+        bands = {label for label, _ in SIZE_BANDS}
+        parsed = []
+        for op, by_band in operations.items():
+            if op not in OPERATIONS or not isinstance(by_band, dict):
+                raise ValueError(f"Operação desconhecida: {op}")
+            for band, data in by_band.items():
+                if band not in bands or not isinstance(data, dict):
+                    raise ValueError(f"Faixa desconhecida: {band}")
+                parsed.append(((op, band), LatencyHistogram.from_dict(data)))
+        with self._lock:
+            for key, histogram in parsed:
+                self.histograms.setdefault(key, LatencyHistogram()).merge(histogram.as_dict())
+            self.reports += 1
+            self._count_session(str(report.get("sessao", ""))[:64])
+            self.dirty = True
+        return len(parsed)
+
+    def _count_session(self, session):
+        if session in self._recent_sessions or session in self._older_sessions:
+            return
+        self.sessions += 1
+        self._recent_sessions.add(session)
+        if len(self._recent_sessions) >= MAX_SESSIONS:
+            self._older_sessions = self._recent_sessions
+            self._recent_sessions = set()
+
+    def _snapshot_locked(self):
+        operations = {}
+        for (op, band), histogram in sorted(self.histograms.items()):
+            operations.setdefault(op, {})[band] = histogram.as_dict()
+        return {"versao": REPORT_VERSION, "baldesMs": list(BUCKETS_MS), "lotes": self.reports,
+                "sessoes": self.sessions, "operacoes": operations}
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot_locked()
+
+    def summary(self, operation=None):
+        """Linhas ``{operacao, faixa, n, media, p50, p95, max}`` em ms, por operação e faixa crescente."""
+        order = {label: i for i, (label, _) in enumerate(SIZE_BANDS)}
+        with self._lock:
+            items = sorted(self.histograms.items(), key=lambda item: (item[0][0], order.get(item[0][1], 99)))
+            rows = []
+            for (op, band), histogram in items:
+                if operation and op != operation or not histogram.count:
+                    continue
+                rows.append({"operacao": op, "faixa": band, "n": histogram.count,
+                             "media": round(histogram.total / histogram.count, 2),
+                             "p50": histogram.percentile(0.5), "p95": histogram.percentile(0.95),
+                             "max": round(histogram.max, 2)})
+            return rows
+
+    def save(self):
+        """Grava o acumulado (só se mudou desde a última gravação)."""
+        with self._lock:
+            if not self.dirty:
+                return False
+            snapshot = self._snapshot_locked()
+            self.dirty = False
+        snapshot["gravadoEm"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        return True
+
+
+def format_summary(rows):
+    lines = [f"{'operação':<24} {'faixa':<8} {'n':>8} {'média':>9} {'p50':>8} {'p95':>8} {'máx':>9}"]
+    for row in rows:
+        lines.append(f"{row['operacao']:<24} {row['faixa']:<8} {row['n']:>8} {row['media']:>9.2f} "
+                     f"{row['p50']:>8.2f} {row['p95']:>8.2f} {row['max']:>9.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumo das métricas de desempenho enviadas pelos navegadores.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    summary_cmd = sub.add_parser("resumo", help="Latência por operação e tamanho do mapa.")
+    summary_cmd.add_argument("arquivo", type=Path, nargs="?", help="Padrão: .mindmap_data/metricas/cliente.json")
+    summary_cmd.add_argument("--operacao", choices=OPERATIONS)
+    summary_cmd.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.arquivo and not args.arquivo.exists():
+        print(f"{args.arquivo}: arquivo não encontrado", file=sys.stderr)
+        return 1
+    metrics = ClientMetrics(args.arquivo)
+    rows = metrics.summary(args.operacao)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False))
+    elif rows:
+        print(format_summary(rows))
+        print(f"\n{metrics.reports} lote(s)")
+    else:
+        print("Nenhuma métrica registrada.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""Hub de coedição em tempo real: salas por mapa, operações pequenas via WebSocket.
+
+Cada navegador envia lotes de operações com carimbo de Lamport ``ts = [contador, cliente]``::
+
+    {"op": "add", "ts": [...], "node": {id, name, category, description, x, y, parentId, ...}}
+    {"op": "move", "ts": [...], "id": ..., "x": ..., "y": ...}
+    {"op": "reparent", "ts": [...], "id": ..., "parentId": ...}
+    {"op": "remove", "ts": [...], "id": ...}
+
+O estado de cada nó é um conjunto de registradores "último escritor vence"
+(existência, posição e pai), comparados pelo carimbo. Uma troca de pai que
+poria o nó dentro da própria subárvore é ignorada (aqui e nos clientes), para
+o estado nunca ter ciclos. O hub aplica a mesma regra dos clientes, repassa aos outros editores só as operações que venceram e guarda
+o estado mesclado para quem entrar depois (mensagem ``snapshot``). As salas
+ficam só em memória; a persistência continua com o salvamento automático.
+
+Como no servidor auxiliar, o navegador só chega ao hub por
+``MINDMAP_COLLAB_PUBLIC_URL`` ou, sem ela, com a página aberta em ``localhost``.
+A entrada na sala exige o token da sessão do Streamlit (parâmetro ``token``,
+entregue ao mapa nos argumentos do componente), e a origem da página deve estar
+em ``MINDMAP_SIDECAR_ORIGINS``.
+
+Uso::
+
+    python -m mindmap.collab carga --editores 40 --taxa 20 --segundos 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import broadcast, serve
+from websockets.exceptions import ConnectionClosed
+
+from mindmap.sidecar import SessionTokens, allowed_origins, origin_allowed
+
+DEFAULT_PORT = 8766
+ROOM_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+ROOM_IDLE_SECONDS = 3600
+MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+NODE_FIELDS = ("id", "name", "category", "description", "isCustom", "isCentral")
+
+
+def _valid_ts(ts):
+    return (isinstance(ts, list) and len(ts) == 2 and isinstance(ts[0], int)
+            and not isinstance(ts[0], bool) and isinstance(ts[1], str))
+
+
+def _newer(ts, current):
+    return current is None or (ts[0], ts[1]) > (current[0], current[1])
+
+
+class Room:
+    """Estado mesclado de uma sala: ``id -> {"node", "alive", "ts": {"alive", "pos", "parent"}}``."""
+
+    def __init__(self):
+        self.clients = set()
+        self.nodes = {}
+        self.clock = 0
+        self.empty_since = None
+
+    def _entry(self, node_id):
+        entry = self.nodes.get(node_id)
+        if entry is None:
+            entry = self.nodes[node_id] = {"node": {"id": node_id}, "alive": False,
+                                           "ts": {"alive": None, "pos": None, "parent": None}}
+        return entry
+
+    def _in_subtree(self, node_id, root_id):
+        seen = set()
+        while node_id and node_id not in seen:
+            if node_id == root_id:
+                return True
+            seen.add(node_id)
+            entry = self.nodes.get(node_id)
+            node_id = entry["node"].get("parentId") if entry else None
+        return False
+
+    def _set_parent(self, entry, ts, parent_id):
+        """Troca o pai se o carimbo vencer e a troca não criar um ciclo."""
+        if not _newer(ts, entry["ts"]["parent"]):
+            return False
+        if parent_id and self._in_subtree(parent_id, entry["node"]["id"]):
+            return False
+        entry["ts"]["parent"] = ts
+        entry["node"]["parentId"] = parent_id
+        return True
+
+    def apply(self, op):
+        """Aplica uma operação; devolve ``True`` se algum registrador foi atualizado."""
+        ts = op.get("ts")
+        kind = op.get("op")
+        if not _valid_ts(ts):
+            return False
+        node_id = op["node"].get("id") if kind == "add" and isinstance(op.get("node"), dict) else op.get("id")
+        if not isinstance(node_id, str) or not node_id:
+            return False
+        self.clock = max(self.clock, ts[0])
+        entry = self._entry(node_id)
+        regs = entry["ts"]
+        changed = False
+        if kind == "add":
+            node = op["node"]
+            if _newer(ts, regs["alive"]):
+                regs["alive"] = ts
+                entry["alive"] = True
+                entry["node"].update({k: node[k] for k in NODE_FIELDS if k in node})
+                changed = True
+            if _newer(ts, regs["pos"]):
+                regs["pos"] = ts
+                entry["node"]["x"], entry["node"]["y"] = node.get("x", 0), node.get("y", 0)
+                changed = True
+            if self._set_parent(entry, ts, node.get("parentId")):
+                changed = True
+        elif kind == "remove" and _newer(ts, regs["alive"]):
+            regs["alive"] = ts
+            entry["alive"] = False
+            changed = True
+        elif kind == "move" and _newer(ts, regs["pos"]):
+            regs["pos"] = ts
+            entry["node"]["x"], entry["node"]["y"] = op.get("x", 0), op.get("y", 0)
+            changed = True
+        elif kind == "reparent" and self._set_parent(entry, ts, op.get("parentId")):
+            changed = True
+        return changed
+
+    def snapshot(self):
+        return {"type": "snapshot", "clock": self.clock, "editors": len(self.clients),
+                "nodes": list(self.nodes.values())}
+
+
+class CollabHub:
+    """Servidor WebSocket (``/collab/<sala>``) rodando num loop asyncio em thread própria."""
+
+    def __init__(self, host, port, public_url=None, origins=None):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.origins = set(origins or ())
+        self.tokens = SessionTokens()
+        self.rooms = {}
+        self._loop = None
+        self._stop = None
+        self._error = None
+
+    def _presence(self, room):
+        broadcast(room.clients, json.dumps({"type": "presence", "editors": len(room.clients)}))
+
+    @staticmethod
+    def _room_id(path):
+        parts = urlsplit(path)
+        room_id = parts.path.rstrip("/").rsplit("/", 1)[-1]
+        if not parts.path.startswith("/collab/") or not ROOM_ID_PATTERN.match(room_id):
+            return None
+        return room_id
+
+    def _check_request(self, connection, request):
+        """Recusa o handshake (antes de abrir o WebSocket) de sala inválida, origem estranha ou token ausente."""
+        if self._room_id(request.path) is None:
+            return connection.respond(HTTPStatus.NOT_FOUND, "Sala inválida.\n")
+        origin = request.headers.get("Origin")
+        if origin and not origin_allowed(origin, self.origins):
+            return connection.respond(HTTPStatus.FORBIDDEN, "Origem não permitida.\n")
+        token = (parse_qs(urlsplit(request.path).query).get("token") or [""])[0]
+        if not self.tokens.check(token):
+            return connection.respond(HTTPStatus.FORBIDDEN, "Token de sessão inválido.\n")
+        return None
+
+    async def _handler(self, connection):
+        room = self.rooms.setdefault(self._room_id(connection.request.path), Room())
+        room.clients.add(connection)
+        room.empty_since = None
+        try:
+            await connection.send(json.dumps(room.snapshot(), ensure_ascii=False, separators=(",", ":")))
+            self._presence(room)
+            async for message in connection:
+                try:
+                    payload = json.loads(message)
+                    ops = payload.get("ops") if isinstance(payload, dict) else None
+                    if not isinstance(ops, list):
+                        raise ValueError("Campo 'ops' deve ser uma lista.")
+                except ValueError as exc:
+                    await connection.send(json.dumps({"type": "error", "message": str(exc)}))
+                    continue
+                accepted = [op for op in ops if isinstance(op, dict) and room.apply(op)]
+                if accepted:
+                    others = room.clients - {connection}
+                    if others:
+                        broadcast(others, json.dumps({"type": "ops", "ops": accepted},
+                                                     ensure_ascii=False, separators=(",", ":")))
+        except ConnectionClosed:
+            pass
+        finally:
+            room.clients.discard(connection)
+            if room.clients:
+                self._presence(room)
+            else:
+                room.empty_since = time.monotonic()
+
+    async def _evict_idle_rooms(self):
+        while True:
+            await asyncio.sleep(60)
+            now = time.monotonic()
+            for room_id, room in list(self.rooms.items()):
+                if room.empty_since is not None and now - room.empty_since > ROOM_IDLE_SECONDS:
+                    del self.rooms[room_id]
+
+    async def _serve(self, ready):
+        self._loop = asyncio.get_running_loop()
+        self._stop = self._loop.create_future()
+        try:
+            # Sem compressão: as mensagens são pequenas e o broadcast() não precisa comprimir para cada editor
+            async with serve(self._handler, self.host, self.port, compression=None,
+                             max_size=MAX_MESSAGE_BYTES, process_request=self._check_request) as server:
+                self.port = server.sockets[0].getsockname()[1]
+                ready.set()
+                evictor = asyncio.create_task(self._evict_idle_rooms())
+                await self._stop
+                evictor.cancel()
+        except OSError as exc:
+            self._error = exc
+            ready.set()
+
+    def start(self):
+        ready = threading.Event()
+        threading.Thread(target=lambda: asyncio.run(self._serve(ready)),
+                         name="mindmap-collab", daemon=True).start()
+        ready.wait(10)
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(lambda: self._stop.done() or self._stop.set_result(None))
+
+
+def start_collab_hub():
+    """Sobe o hub de coedição; devolve ``None`` se desativado (``MINDMAP_COLLAB_PORT=0``) ou indisponível."""
+    port_setting = os.environ.get("MINDMAP_COLLAB_PORT", str(DEFAULT_PORT)).strip()
+    if port_setting in ("", "0"):
+        return None
+    host = os.environ.get("MINDMAP_SIDECAR_HOST", "127.0.0.1")
+    hub = CollabHub(host, int(port_setting), os.environ.get("MINDMAP_COLLAB_PUBLIC_URL") or None, allowed_origins())
+    try:
+        return hub.start()
+    except OSError as exc:
+        print(f"[collab] não foi possível abrir {host}:{port_setting}: {exc}")
+        return None
+
+
+async def _load_editor(url, index, rate, seconds, latencies, delivered):
+    """Um editor que move o próprio nó ``rate`` vezes por segundo e mede a entrega das operações dos outros."""
+    async with connect(url, compression=None) as connection:
+        await connection.recv()  # snapshot
+
+        async def read():
+            async for message in connection:
+                payload = json.loads(message)
+                if payload.get("type") != "ops":
+                    continue
+                delivered[0] += 1
+                now = time.perf_counter()
+                latencies.extend(now - op["enviado"] for op in payload["ops"] if "enviado" in op)
+
+        reader = asyncio.create_task(read())
+        clock = 0
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            clock += 1
+            op = {"op": "move", "ts": [clock, f"carga{index}"], "id": f"no{index}", "x": clock, "y": index,
+                  "enviado": time.perf_counter()}
+            await connection.send(json.dumps({"ops": [op]}))
+            await asyncio.sleep(1 / rate)
+        await asyncio.sleep(0.5)  # deixa chegar o que ainda está em trânsito
+        reader.cancel()
+
+
+def run_load_test(editors, rate, seconds):
+    """Sobe um hub local e mede a latência de entrega com ``editors`` editores na mesma sala."""
+    hub = CollabHub("127.0.0.1", 0).start()
+    latencies, delivered = [], [0]
+
+    async def run():
+        await asyncio.gather(*(
+            _load_editor(f"ws://127.0.0.1:{hub.port}/collab/carga?token={hub.tokens.issue(f'carga{i}')}",
+                         i, rate, seconds, latencies, delivered)
+            for i in range(editors)))
+
+    try:
+        asyncio.run(run())
+    finally:
+        hub.stop()
+    latencies.sort()
+
+    def percentile(fraction):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 2) if latencies else None
+
+    return {"editores": editors, "taxa": rate, "segundos": seconds, "mensagens": delivered[0],
+            "p50_ms": percentile(0.5), "p99_ms": percentile(0.99)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ferramentas do hub de coedição.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    load_cmd = sub.add_parser("carga", help="Mede a latência de entrega com vários editores numa sala.")
+    load_cmd.add_argument("--editores", type=int, default=40)
+    load_cmd.add_argument("--taxa", type=float, default=20, help="Movimentos por segundo de cada editor.")
+    load_cmd.add_argument("--segundos", type=float, default=5)
+    load_cmd.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.editores < 1 or args.taxa <= 0 or args.segundos <= 0:
+        parser.error("--editores, --taxa e --segundos devem ser positivos")
+    result = run_load_test(args.editores, args.taxa, args.segundos)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        print(f"{result['editores']} editor(es) a {result['taxa']:g} movimento(s)/s por {result['segundos']:g}s: "
+              f"{result['mensagens']} mensagem(ns) entregue(s), p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Mapa mental como componente bidirecional do Streamlit.
+
+Com ``components.v1.html`` o iframe é recriado (e todo o HTML reenviado) a cada
+rerun. Aqui o HTML gerado é gravado uma única vez por versão em
+``.mindmap_data/component/<versão>/index.html`` e servido como componente
+declarado: com uma ``key`` fixa, o Streamlit mantém o mesmo iframe entre reruns
+e só repassa os argumentos pequenos (mapa a carregar). Uma versão nova (catálogo,
+logo ou código diferentes) muda o nome do componente, o que recria o iframe.
+
+Salvar no servidor é opcional (``MINDMAP_SERVER_MAPS=1``): a pasta
+``.mindmap_data/maps`` é uma só para todos que acessam o app, então só deve ser
+ligada onde o mapa de um usuário pode ser visto pelos demais (uso pessoal ou de
+uma equipe). Desligada, o botão "Salvar" continua baixando o arquivo no navegador.
+
+O iframe devolve eventos como valor do componente::
+
+    {"id": "<sessão>-<n>", "type": "save", "state": {...}, "format": "json"}
+    {"id": ..., "type": "select", "nodeId": "..."}
+    {"id": ..., "type": "loaded", "nonce": ...}
+    {"id": ..., "type": "export", "format": "pdf", "nodes": 12}
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import streamlit.components.v1 as components
+
+from mindmap.paths import data_dir
+from mindmap.state_format import STATE_FILE_SUFFIXES, compress_bytes, dumps_state
+
+COMPONENT_NAME = "aws_mindmap"
+KEEP_BUILDS = 5
+SERVER_MAPS_ENV = "MINDMAP_SERVER_MAPS"
+
+
+def build_version(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()[:12]
+
+
+def _prune_builds(root, current):
+    builds = sorted((p for p in root.iterdir() if p.is_dir() and p != current),
+                    key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in builds[KEEP_BUILDS - 1:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def write_component_build(html):
+    """Grava o HTML da versão (se ainda não existir); devolve ``(versão, pasta)``."""
+    version = build_version(html)
+    root = data_dir("component")
+    build = root / version
+    index = build / "index.html"
+    if not index.exists():
+        build.mkdir(parents=True, exist_ok=True)
+        tmp = build / "index.html.tmp"
+        tmp.write_text(html, encoding="utf-8")
+        os.replace(tmp, index)
+        _prune_builds(root, build)
+    return version, build
+
+
+def declare_mindmap_component(version, build):
+    """Declara o componente que serve a versão gravada.
+
+    O registro é por execução do script (sem sessão, como no aquecimento, ele
+    não acontece), por isso fica fora do cache; declarar de novo é barato.
+    """
+    return components.declare_component(f"{COMPONENT_NAME}_{version}", path=str(build))
+
+
+def server_maps_enabled():
+    """Mapas salvos no servidor (pasta compartilhada) só com ``MINDMAP_SERVER_MAPS=1``."""
+    return os.environ.get(SERVER_MAPS_ENV, "").strip().lower() in ("1", "true", "sim")
+
+
+def saved_maps_dir():
+    return data_dir("maps")
+
+
+def list_saved_maps():
+    """Mapas salvos pelo componente, do mais recente para o mais antigo (nenhum se o recurso estiver desligado)."""
+    if not server_maps_enabled():
+        return []
+    paths = [p for p in saved_maps_dir().iterdir() if p.name.endswith(STATE_FILE_SUFFIXES)]
+    return sorted(paths, key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def save_map_event(event):
+    """Grava o mapa recebido num evento ``save`` e devolve o caminho do arquivo.
+
+    O nome leva a hora e um sufixo aleatório, e o arquivo é criado com ``"x"``:
+    dois salvamentos no mesmo segundo nunca gravam um sobre o outro.
+    """
+    if not server_maps_enabled():
+        raise ValueError(f"Salvar no servidor está desligado ({SERVER_MAPS_ENV}).")
+    state = event.get("state")
+    if not isinstance(state, dict):
+        raise ValueError("Evento de salvamento sem estado do mapa.")
+    file_format = event.get("format", "json")
+    compression = "gzip" if file_format == "gzip" else None
+    if file_format == "legacy":
+        raw = json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")
+    else:
+        raw = compress_bytes(dumps_state(state).encode("utf-8"), compression)
+    name = (time.strftime("aws-mindmap-estado-%Y%m%d-%H%M%S") + f"-{uuid.uuid4().hex[:8]}"
+            + (".json.gz" if compression else ".json"))
+    path = saved_maps_dir() / name
+    with open(path, "xb") as fp:
+        fp.write(raw)
+    return path
@@ -0,0 +1,351 @@
+"""Fila de exportações em segundo plano dentro do processo do Streamlit.
+
+Exportar um mapa grande (apêndice em PDF, tópicos em OPML...) leva segundos;
+o rerun que pediu a exportação só registra o trabalho e volta. Os trabalhos
+rodam num pool limitado de threads e são identificados pelo hash do arquivo
+do mapa, o formato e o hash do catálogo: clicar de novo em "exportar" (ou
+outro usuário pedindo o mesmo mapa) reaproveita o trabalho em andamento ou o
+arquivo já pronto.
+
+A tela consulta o trabalho periodicamente (:meth:`ExportJobManager.poll`);
+um trabalho que ninguém consulta há ``abandon_after`` segundos é cancelado
+no próximo passo. Cada sessão que pede o mesmo trabalho entra na lista de
+interessados; o botão "cancelar" de uma sessão só a tira da lista, e o
+trabalho só é interrompido quando não sobra ninguém. Os arquivos prontos ficam num cache LRU em disco limitado
+em bytes (mesma política das miniaturas).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from pathlib import Path
+
+from mindmap.node_details import (iter_detail_records, iter_map_records, sorted_records, write_details_csv,
+                                  write_details_markdown, write_details_pdf)
+from mindmap.outline_export import EXPORTERS, MapTree, write_chunks
+from mindmap.paths import data_dir
+from mindmap.state_format import state_file_stem
+
+EXPORT_VERSION = 1
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+ABANDON_AFTER = 30
+FINISHED_TTL = 3600
+CHECK_EVERY = 256
+
+QUEUED = "na fila"
+RUNNING = "executando"
+DONE = "pronto"
+FAILED = "erro"
+CANCELLED = "cancelado"
+
+# formato -> (rótulo, extensão, tipo MIME)
+FORMATS = {
+    "detalhes-pdf": ("Detalhes dos nós (PDF)", ".pdf", "application/pdf"),
+    "detalhes-csv": ("Detalhes dos nós (CSV)", ".csv", "text/csv"),
+    "detalhes-md": ("Detalhes dos nós (Markdown)", ".md", "text/markdown"),
+    "topicos-md": ("Tópicos (Markdown)", ".md", "text/markdown"),
+    "opml": ("Tópicos (OPML)", ".opml", "text/x-opml"),
+    "mermaid": ("Mermaid mindmap", ".mmd", "text/plain"),
+    "graphml": ("Grafo (GraphML)", ".graphml", "application/xml"),
+}
+_OUTLINE_FORMATS = {"topicos-md": "md", "opml": "opml", "mermaid": "mermaid", "graphml": "graphml"}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class ExportJob:
+    """Estado de uma exportação: situação, etapa, progresso e o arquivo gerado."""
+
+    def __init__(self, key, source, fmt, abandon_after=ABANDON_AFTER):
+        self.key = key
+        self.source = source
+        self.format = fmt
+        self.status = QUEUED
+        self.stage = ""
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.path = None
+        self.size = 0
+        self.created_at = time.time()
+        self.finished_at = None
+        self.last_seen = time.monotonic()
+        self.abandon_after = abandon_after
+        self.future = None
+        self.subscribers = set()
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def fraction(self):
+        """Progresso entre 0 e 1 (``None`` quando o total ainda não é conhecido)."""
+        if self.status == DONE:
+            return 1.0
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    @property
+    def file_name(self):
+        return f"{state_file_stem(self.source)}-{self.format}{FORMATS[self.format][1]}"
+
+    @property
+    def mime(self):
+        return FORMATS[self.format][2]
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.status = CANCELLED
+            self.finished_at = time.time()
+
+    def progress(self, stage, done, total=None):
+        self.stage, self.done, self.total = stage, done, total
+        self.check()
+
+    def check(self):
+        """Interrompe o trabalho se foi cancelado ou se a tela parou de consultá-lo."""
+        if not self._cancel.is_set() and time.monotonic() - self.last_seen > self.abandon_after:
+            self._cancel.set()
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def track(self, items, stage, total=None):
+        """Repassa ``items`` contando o progresso da etapa e checando o cancelamento."""
+        self.progress(stage, 0, total)
+        count = 0
+        for item in items:
+            yield item
+            count += 1
+            if count % CHECK_EVERY == 0:
+                self.progress(stage, count, total)
+        self.progress(stage, count, total)
+
+    def as_dict(self):
+        return {"chave": self.key, "mapa": self.source, "formato": self.format, "situacao": self.status,
+                "etapa": self.stage, "feito": self.done, "total": self.total, "erro": self.error,
+                "bytes": self.size}
+
+
+def run_export(job, path, out_path, catalog_by_name=None):
+    """Gera o formato do trabalho a partir do mapa em ``path``, gravando em ``out_path``."""
+    if job.format in _OUTLINE_FORMATS:
+        tree = MapTree.from_records(job.track(iter_map_records(path, catalog_by_name), "lendo o mapa"))
+        exporter = EXPORTERS[_OUTLINE_FORMATS[job.format]][0]
+        job.progress("gravando", 0, len(tree))
+        with open(out_path, "w", encoding="utf-8", newline="\n") as fp:
+            write_chunks(exporter(tree, progress=lambda opened: job.progress("gravando", opened, len(tree))), fp)
+        return
+
+    read = [0]
+
+    def counted():
+        for record in job.track(iter_detail_records(path, catalog_by_name), "lendo o mapa"):
+            read[0] += 1
+            yield record
+
+    ordered = sorted_records(counted(), "nome")
+    # A ordenação consome o mapa inteiro antes do primeiro registro: daí em diante o total é conhecido
+    first = next(ordered, None)
+    records = job.track(chain(() if first is None else (first,), ordered), "gravando", read[0])
+    if job.format == "detalhes-pdf":
+        with open(out_path, "wb") as fp:
+            write_details_pdf(records, fp)
+        return
+    with open(out_path, "w", encoding="utf-8", newline="") as fp:
+        if job.format == "detalhes-csv":
+            write_details_csv(records, fp)
+        else:
+            write_details_markdown(records, fp)
+
+
+class ExportJobManager:
+    """Pool limitado de exportações, com deduplicação por chave e cache LRU dos arquivos prontos."""
+
+    def __init__(self, root=None, max_workers=DEFAULT_WORKERS, max_bytes=DEFAULT_MAX_BYTES,
+                 abandon_after=ABANDON_AFTER):
+        self.root = Path(root) if root else data_dir("exports")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.abandon_after = abandon_after
+        self.hits = 0
+        self.misses = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mindmap-export")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._digests = {}  # caminho -> (tamanho, mtime_ns, sha256): arquivo inalterado não é relido
+        # Do menos para o mais recente; a ordem sobrevive a reinícios pelo mtime dos arquivos
+        self._entries = OrderedDict()
+        for path in sorted(self.root.glob("*.export"), key=lambda p: p.stat().st_mtime_ns):
+            self._entries[path.stem] = path.stat().st_size
+        self._total = sum(self._entries.values())
+        self._evict()
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def file_digest(self, path):
+        """sha256 do arquivo; o cache é lido e gravado sob o lock, a leitura do arquivo fica fora dele."""
+        path = Path(path)
+        stat = path.stat()
+        with self._lock:
+            cached = self._digests.get(str(path))
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as fp:
+            for block in iter(lambda: fp.read(1024 * 1024), b""):
+                digest.update(block)
+        with self._lock:
+            self._digests[str(path)] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+        return digest.hexdigest()
+
+    def key_for(self, path, fmt, catalog_digest=""):
+        return f"{self.file_digest(path)[:32]}-{fmt}-{catalog_digest or 'sem-catalogo'}-v{EXPORT_VERSION}"
+
+    def artifact_path(self, key):
+        return self.root / f"{key}.export"
+
+    def submit(self, path, fmt, catalog_by_name=None, catalog_digest="", subscriber=None):
+        """Pede a exportação de um mapa; devolve o trabalho em andamento, pronto ou novo.
+
+        ``subscriber`` (a sessão que pediu) entra na lista de interessados do trabalho.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato desconhecido: {fmt}")
+        path = Path(path)
+        key = self.key_for(path, fmt, catalog_digest)
+        self.reap()
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and (job.active or (job.status == DONE and key in self._entries)):
+                job.touch()
+                if subscriber is not None:
+                    job.subscribers.add(subscriber)
+                self.hits += 1
+                return job
+            job = ExportJob(key, path.name, fmt, self.abandon_after)
+            if subscriber is not None:
+                job.subscribers.add(subscriber)
+            self._jobs[key] = job
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._finish(job, self._entries[key])
+                self.hits += 1
+                return job
+            self.misses += 1
+            job.future = self._executor.submit(self._run, job, path, catalog_by_name)
+            return job
+
+    def poll(self, key):
+        """Consulta um trabalho (e o mantém vivo); ``None`` se a chave não existe mais."""
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None:
+            job.touch()
+        self.reap()
+        return job
+
+    def cancel(self, key, subscriber=None):
+        """Tira ``subscriber`` dos interessados e interrompe o trabalho se não sobrar nenhum.
+
+        Sem ``subscriber``, interrompe o trabalho de qualquer forma.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return None
+            if subscriber is not None:
+                job.subscribers.discard(subscriber)
+                if job.subscribers:
+                    return job
+        if job.active:
+            job.cancel()
+        return job
+
+    def read_artifact(self, job):
+        """Bytes do arquivo de um trabalho pronto (``None`` se já saiu do cache)."""
+        with self._lock:
+            if job.status != DONE or job.key not in self._entries:
+                return None
+            self._entries.move_to_end(job.key)
+        try:
+            os.utime(job.path)
+            return job.path.read_bytes()
+        except OSError:
+            return None
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def reap(self):
+        """Cancela trabalhos abandonados e esquece os terminados há mais de ``FINISHED_TTL``."""
+        now_monotonic, now = time.monotonic(), time.time()
+        with self._lock:
+            for key, job in list(self._jobs.items()):
+                if job.active and now_monotonic - job.last_seen > self.abandon_after:
+                    job.cancel()
+                elif not job.active and job.finished_at and now - job.finished_at > FINISHED_TTL:
+                    del self._jobs[key]
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _finish(self, job, size):
+        job.path = self.artifact_path(job.key)
+        job.size = size
+        job.status = DONE
+        job.stage = ""
+        job.finished_at = time.time()
+
+    def _run(self, job, path, catalog_by_name):
+        job.status = RUNNING
+        tmp = self.root / f"{job.key}.{threading.get_ident()}.tmp"
+        try:
+            job.check()
+            run_export(job, path, tmp, catalog_by_name)
+            job.check()
+            os.replace(tmp, self.artifact_path(job.key))
+        except JobCancelled:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        except Exception as exc:
+            job.status = FAILED
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.finished_at = time.time()
+            return
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        size = self.artifact_path(job.key).stat().st_size
+        with self._lock:
+            self._total += size - self._entries.pop(job.key, 0)
+            self._entries[job.key] = size
+            self._finish(job, size)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                self.artifact_path(key).unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,335 @@
+"""Apêndice "Detalhes dos Nós no Mapa" gerado em fluxo, para mapas muito grandes.
+
+O apêndice do PDF do navegador ordena todos os nós e monta o documento inteiro
+em memória. Aqui cada etapa é um gerador: os nós saem do arquivo um a um
+(leitura incremental de ``state_validator``), a ordenação por nome ou por
+categoria é externa (blocos ordenados em arquivos temporários e intercalados
+com ``heapq.merge``), as descrições são quebradas em linhas com a tabela de
+larguras de ``text_metrics`` (com cache) e cada página do PDF é gravada no
+disco assim que fica pronta. A memória depende do tamanho de um bloco, não do
+número de nós. O mesmo fluxo gera CSV ou Markdown.
+
+Uso::
+
+    python -m mindmap.node_details mapa.json --catalogo services.csv --saida detalhes.pdf
+    python -m mindmap.node_details mapa.json.gz --catalogo services.csv --formato csv --ordem categoria --saida detalhes.csv
+"""
+import argparse
+import csv
+import heapq
+import json
+import sys
+import tempfile
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+from mindmap.catalog import read_catalog
+from mindmap.search_index import normalize_text
+from mindmap.state_format import AWS_CENTER_ID
+from mindmap.state_validator import StateFormatError, iter_state_nodes
+from mindmap.text_metrics import char_advance, text_width
+
+FORMATS = ("pdf", "csv", "md")
+ORDERS = ("nome", "categoria")
+RUN_SIZE = 20000
+
+# Mesma página e mesmo desenho do apêndice do ``downloadPDF`` (A4 paisagem, em pontos)
+PAGE_WIDTH = 841.89
+PAGE_HEIGHT = 595.28
+MARGIN_X = 40
+TITLE = "Detalhes dos Nós no Mapa"
+TITLE_SIZE = 16
+TITLE_Y = 50
+BODY_TOP = 80
+BODY_SIZE = 10
+LINE_HEIGHT = 12
+BLOCK_SPACING = 15
+BOTTOM_LIMIT = 60
+
+MISSING_CATEGORY = "Outros"
+MISSING_DESCRIPTION = "Serviço não encontrado no catálogo atual"
+
+
+def iter_map_records(path, catalog_by_name=None):
+    """Gera ``{id, parentId, name, category, description, custom, central}`` de cada nó, na ordem do arquivo.
+
+    Inclui o nó central (``central`` verdadeiro); o formato compacto, que só guarda a
+    posição dele, não gera nó central.
+    """
+    catalog_by_name = catalog_by_name or {}
+    for key, node in iter_state_nodes(path):
+        if key == "meta" or "id" not in node:
+            continue
+        node_id = str(node["id"])
+        if node.get("isCentral") or node_id == AWS_CENTER_ID:
+            yield {"id": node_id, "parentId": None, "name": str(node.get("name") or "AWS"), "category": "",
+                   "description": "", "custom": False, "central": True}
+            continue
+        name = str(node.get("name") or node_id)
+        if key == "refs":
+            record = catalog_by_name.get(node["id"])
+            if record is None:
+                category, description = MISSING_CATEGORY, MISSING_DESCRIPTION
+            else:
+                category, description = record.get("Category") or MISSING_CATEGORY, record.get("Description", "")
+        else:
+            category, description = node.get("category") or "", node.get("description") or ""
+        parent_id = node.get("parentId")
+        yield {"id": node_id, "parentId": None if parent_id is None else str(parent_id), "name": name,
+               "category": str(category), "description": str(description),
+               "custom": bool(node.get("isCustom")), "central": False}
+
+
+def iter_detail_records(path, catalog_by_name=None):
+    """Gera ``{name, category, description, custom}`` de cada nó de serviço, na ordem do arquivo."""
+    for record in iter_map_records(path, catalog_by_name):
+        if not record["central"]:
+            yield {field: record[field] for field in ("name", "category", "description", "custom")}
+
+
+def _sort_key(order):
+    if order == "categoria":
+        return lambda r: (normalize_text(r["category"]), normalize_text(r["name"]), r["name"])
+    return lambda r: (normalize_text(r["name"]), r["name"])
+
+
+def sorted_records(records, order="nome", run_size=RUN_SIZE):
+    """Ordena registros em fluxo: blocos de ``run_size`` ordenados em disco e intercalados."""
+    if order not in ORDERS:
+        raise ValueError(f"Ordem desconhecida: {order}")
+    key = _sort_key(order)
+    runs = []
+    try:
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= run_size:
+                runs.append(_spill(sorted(chunk, key=key)))
+                chunk = []
+        chunk.sort(key=key)
+        if not runs:
+            yield from chunk
+            return
+        if chunk:
+            runs.append(_spill(chunk))
+        yield from heapq.merge(*(_read_run(run) for run in runs), key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _spill(chunk):
+    run = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for record in chunk:
+        run.write(json.dumps(record, ensure_ascii=False))
+        run.write("\n")
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    for line in run:
+        yield json.loads(line)
+
+
+@lru_cache(maxsize=8192)
+def wrap_text(text, max_width, size=BODY_SIZE, font="Helvetica"):
+    """Quebra o texto em linhas de até ``max_width`` pontos (palavras longas são cortadas)."""
+    lines = []
+    for paragraph in str(text).split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if text_width(candidate, size, font) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            line = ""
+            if text_width(word, size, font) <= max_width:
+                line = word
+                continue
+            width = 0
+            for ch in word:
+                advance = char_advance(ch, font) * size / 1000
+                if line and width + advance > max_width:
+                    lines.append(line)
+                    line, width = "", 0
+                line += ch
+                width += advance
+        lines.append(line)
+    return tuple(lines)
+
+
+def iter_detail_pages(records, width=PAGE_WIDTH, height=PAGE_HEIGHT):
+    """Gera as páginas do apêndice como listas de ``(fonte, tamanho, x, y, texto)`` (y a partir do topo).
+
+    A quebra de página é verificada a cada linha: uma descrição longa continua
+    na página seguinte em vez de passar da margem inferior.
+    """
+    text_max_width = width - 2 * MARGIN_X
+    limit = height - BOTTOM_LIMIT
+    continuation = ("Helvetica-Bold", TITLE_SIZE, MARGIN_X, TITLE_Y, f"{TITLE} (continuação)")
+    page = [("Helvetica-Bold", TITLE_SIZE, MARGIN_X, TITLE_Y, TITLE)]
+    y = BODY_TOP
+    for record in records:
+        # Nome e categoria só começam onde também cabe a primeira linha da descrição
+        if y + 2 * (LINE_HEIGHT + 2) > limit:
+            yield page
+            page, y = [continuation], BODY_TOP
+        custom = " (Customizado)" if record["custom"] else ""
+        page.append(("Helvetica-Bold", BODY_SIZE, MARGIN_X, y, f"Nó: {record['name']}{custom}"))
+        y += LINE_HEIGHT + 2
+        page.append(("Helvetica", BODY_SIZE, MARGIN_X + 10, y, f"Categoria: {record['category'] or 'N/A'}"))
+        y += LINE_HEIGHT + 2
+        for line in wrap_text(f"Descrição: {record['description'] or 'N/A'}", text_max_width):
+            if y > limit:
+                yield page
+                page, y = [continuation], BODY_TOP
+            page.append(("Helvetica", BODY_SIZE, MARGIN_X + 10, y, line))
+            y += LINE_HEIGHT
+        y += BLOCK_SPACING
+    yield page
+
+
+def _pdf_string(text):
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class PdfPageWriter:
+    """PDF mínimo (fontes padrão Helvetica, texto WinAnsi) gravado página a página.
+
+    Só os deslocamentos dos objetos ficam em memória; catálogo, árvore de
+    páginas e tabela xref são gravados em :meth:`close`.
+    """
+
+    FONTS = {"Helvetica": b"F1", "Helvetica-Bold": b"F2"}
+
+    def __init__(self, fp, width=PAGE_WIDTH, height=PAGE_HEIGHT):
+        self.fp = fp
+        self.width = width
+        self.height = height
+        self.offsets = {}
+        self.page_ids = []
+        self.position = 0
+        # 1 catálogo, 2 árvore de páginas, 3 e 4 fontes; páginas a partir de 5
+        self.next_id = 5
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for number, font in ((3, "Helvetica"), (4, "Helvetica-Bold")):
+            self._object(number, f"<< /Type /Font /Subtype /Type1 /BaseFont /{font} "
+                                 f"/Encoding /WinAnsiEncoding >>".encode("ascii"))
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        self._write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def add_page(self, items):
+        """Grava uma página de ``(fonte, tamanho, x, y_do_topo, texto)``."""
+        ops = [b"BT"]
+        for font, size, x, y, text in items:
+            ops.append(b"/%s %g Tf 1 0 0 1 %.2f %.2f Tm %s Tj"
+                       % (self.FONTS[font], size, x, self.height - y, _pdf_string(text)))
+        ops.append(b"ET")
+        content = zlib.compress(b"\n".join(ops))
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._object(content_id, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content)
+                     + content + b"\nendstream")
+        self._object(page_id, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                              b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                     % (self.width, self.height, content_id))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_at = self.position
+        entries = [b"0000000000 65535 f \n"]
+        entries.extend(b"%010d 00000 n \n" % self.offsets[n] for n in range(1, self.next_id))
+        self._write(b"xref\n0 %d\n" % self.next_id + b"".join(entries))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, xref_at))
+
+
+def write_details_pdf(records, fp):
+    """Grava o apêndice em PDF (``fp`` binário); devolve o número de páginas."""
+    writer = PdfPageWriter(fp)
+    for page in iter_detail_pages(records):
+        writer.add_page(page)
+    writer.close()
+    return len(writer.page_ids)
+
+
+def write_details_csv(records, fp):
+    """Grava uma linha por nó (``fp`` de texto aberto com ``newline=''``); devolve o número de nós."""
+    writer = csv.writer(fp)
+    writer.writerow(["Nó", "Categoria", "Descrição", "Customizado"])
+    count = 0
+    for record in records:
+        writer.writerow([record["name"], record["category"], record["description"],
+                         "sim" if record["custom"] else "não"])
+        count += 1
+    return count
+
+
+def _md_cell(text):
+    return str(text).replace("\\", "\\\\").replace("|", "\\|").replace("\r", " ").replace("\n", " ")
+
+
+def write_details_markdown(records, fp):
+    """Grava uma tabela Markdown com um nó por linha; devolve o número de nós."""
+    fp.write(f"# {TITLE}\n\n| Nó | Categoria | Descrição |\n| --- | --- | --- |\n")
+    count = 0
+    for record in records:
+        custom = " (Customizado)" if record["custom"] else ""
+        fp.write(f"| {_md_cell(record['name'])}{custom} | {_md_cell(record['category'] or 'N/A')} "
+                 f"| {_md_cell(record['description'] or 'N/A')} |\n")
+        count += 1
+    return count
+
+
+def export_node_details(path, out_path, fmt="pdf", order="nome", catalog_by_name=None):
+    """Gera o apêndice de um mapa salvo em ``out_path``; devolve páginas (PDF) ou nós (CSV/Markdown)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+    records = sorted_records(iter_detail_records(path, catalog_by_name), order)
+    if fmt == "pdf":
+        with open(out_path, "wb") as fp:
+            return write_details_pdf(records, fp)
+    with open(out_path, "w", encoding="utf-8", newline="") as fp:
+        if fmt == "csv":
+            return write_details_csv(records, fp)
+        return write_details_markdown(records, fp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o apêndice de detalhes dos nós de um mapa salvo.")
+    parser.add_argument("arquivo", type=Path)
+    parser.add_argument("--saida", type=Path, required=True, help="Arquivo de saída.")
+    parser.add_argument("--formato", choices=FORMATS, help="pdf, csv ou md (padrão: extensão da saída).")
+    parser.add_argument("--ordem", choices=ORDERS, default="nome")
+    parser.add_argument("--catalogo", type=Path, help="CSV do catálogo (dados dos nós por referência).")
+    args = parser.parse_args(argv)
+
+    fmt = args.formato or args.saida.suffix.lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error("informe --formato (pdf, csv ou md)")
+    catalog_by_name = {r["Service"]: r for r in read_catalog(args.catalogo)} if args.catalogo else None
+    try:
+        total = export_node_details(args.arquivo, args.saida, fmt, args.ordem, catalog_by_name)
+    except (StateFormatError, OSError) as e:
+        print(f"{args.arquivo}: {e}", file=sys.stderr)
+        return 1
+    unit = "página(s)" if fmt == "pdf" else "nó(s)"
+    print(f"{args.arquivo}: {total} {unit} -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
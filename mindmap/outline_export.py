@@ -0,0 +1,337 @@
+"""Exportação do mapa como estrutura de tópicos: Markdown, OPML, Mermaid e GraphML.
+
+A árvore é montada numa passada pelo arquivo (leitura incremental de
+``state_validator``), com um índice de filhos por pai, e percorrida uma única
+vez em profundidade, sem recursão e sem procurar os filhos de cada nó na lista
+inteira. Em memória ficam só os campos de cada nó em listas paralelas; a saída
+de cada formato é um gerador de pedaços de texto gravados à medida que saem.
+
+Nós sem pai conhecido ficam abaixo do nó central; um ciclo de ``parentId`` (que
+o validador aponta) é cortado passando o seu primeiro nó para o nó central.
+
+Uso::
+
+    python -m mindmap.outline_export exportar mapa.json --catalogo services.csv --saida mapa.opml
+    python -m mindmap.outline_export exportar mapa.json.gz --formato mermaid --saida mapa.mmd
+    python -m mindmap.outline_export medir --tamanhos 25000 50000 100000 200000
+"""
+import argparse
+import io
+import random
+import sys
+import time
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from mindmap.catalog import read_catalog
+from mindmap.node_details import iter_map_records
+from mindmap.state_format import AWS_CENTER_ID
+from mindmap.state_validator import StateFormatError
+
+DEFAULT_TITLE = "AWS MindMap pro"
+WRITE_BUFFER = 256
+PROGRESS_STEP = 1024
+OPEN, CLOSE = "abre", "fecha"
+
+# Caracteres de controle não são permitidos em XML 1.0
+_XML_INVALID = {code: None for code in range(0x20) if code not in (0x09, 0x0A, 0x0D)}
+
+
+class MapTree:
+    """Nós do mapa em listas paralelas e o índice de filhos (posição do pai -> posições dos filhos)."""
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.categories = []
+        self.descriptions = []
+        self.parents = []
+        self.children = {}
+        self.root = None
+
+    @classmethod
+    def from_records(cls, records):
+        """Monta a árvore a partir de registros ``{id, parentId, name, category, description, central}``."""
+        tree = cls()
+        position = {}
+        for record in records:
+            if record["id"] in position:
+                continue
+            position[record["id"]] = len(tree.ids)
+            if record.get("central") and tree.root is None:
+                tree.root = len(tree.ids)
+            tree.ids.append(record["id"])
+            tree.names.append(record["name"])
+            tree.categories.append(record.get("category", ""))
+            tree.descriptions.append(record.get("description", ""))
+            tree.parents.append(record.get("parentId"))
+        if tree.root is None:
+            # Formato compacto: o nó central não vem nos arrays de nós
+            tree.root = len(tree.ids)
+            position[AWS_CENTER_ID] = tree.root
+            tree.ids.append(AWS_CENTER_ID)
+            tree.names.append("AWS")
+            tree.categories.append("")
+            tree.descriptions.append("")
+            tree.parents.append(None)
+        for index, parent_id in enumerate(tree.parents):
+            if index == tree.root:
+                continue
+            parent = position.get(parent_id, tree.root)
+            tree.parents[index] = parent
+            tree.children.setdefault(parent, []).append(index)
+        tree.parents[tree.root] = None
+        tree._break_cycles()
+        return tree
+
+    def _reachable(self, start, seen):
+        stack = [start]
+        seen[start] = 1
+        while stack:
+            for child in self.children.get(stack.pop(), ()):
+                if not seen[child]:
+                    seen[child] = 1
+                    stack.append(child)
+
+    def _cycle_above(self, index):
+        """Posições do ciclo em que termina a subida de pais a partir de ``index`` (fora do alcance do centro)."""
+        path = []
+        on_path = {}
+        while index not in on_path:
+            on_path[index] = len(path)
+            path.append(index)
+            index = self.parents[index]
+        return path[on_path[index]:]
+
+    def _break_cycles(self):
+        # O que não se alcança a partir do centro está num ciclo ou pendurado num: sobe pelos pais até o
+        # ciclo e passa para o centro só o primeiro nó dele (na ordem do arquivo); os descendentes mantêm o pai
+        seen = bytearray(len(self.ids))
+        self._reachable(self.root, seen)
+        for index in range(len(self.ids)):
+            if seen[index]:
+                continue
+            member = min(self._cycle_above(index))
+            self.children[self.parents[member]].remove(member)
+            self.parents[member] = self.root
+            self.children.setdefault(self.root, []).append(member)
+            self._reachable(member, seen)
+
+    @classmethod
+    def from_file(cls, path, catalog_by_name=None):
+        return cls.from_records(iter_map_records(path, catalog_by_name))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def walk(self, progress=None):
+        """Gera ``(evento, profundidade, posição)`` em profundidade a partir do nó central.
+
+        Cada nó gera ``OPEN`` ao entrar e ``CLOSE`` depois de todos os seus filhos.
+        ``progress(nós_visitados)`` é chamado a cada ``PROGRESS_STEP`` nós.
+        """
+        yield OPEN, 0, self.root
+        stack = [(self.root, iter(self.children.get(self.root, ())))]
+        opened = 1
+        while stack:
+            index, pending = stack[-1]
+            child = next(pending, None)
+            if child is None:
+                stack.pop()
+                yield CLOSE, len(stack), index
+                continue
+            opened += 1
+            if progress is not None and opened % PROGRESS_STEP == 0:
+                progress(opened)
+            yield OPEN, len(stack), child
+            stack.append((child, iter(self.children.get(child, ()))))
+
+
+def _xml_text(text):
+    return escape(str(text).translate(_XML_INVALID))
+
+
+def _xml_attr(text):
+    return quoteattr(str(text).translate(_XML_INVALID))
+
+
+def _md_text(text):
+    text = " ".join(str(text).split())
+    for ch in "\\`*_[]<>#|":
+        text = text.replace(ch, "\\" + ch)
+    return text
+
+
+def export_markdown(tree, title=DEFAULT_TITLE, progress=None):
+    """Lista aninhada em Markdown (dois espaços por nível), com a categoria em itálico."""
+    yield f"# {_md_text(title)}\n\n"
+    for event, depth, index in tree.walk(progress):
+        if event != OPEN or index == tree.root:
+            continue
+        category = f" _({_md_text(tree.categories[index])})_" if tree.categories[index] else ""
+        yield f"{'  ' * (depth - 1)}- {_md_text(tree.names[index])}{category}\n"
+
+
+def export_opml(tree, title=DEFAULT_TITLE, progress=None):
+    """OPML 2.0: um ``outline`` por nó, com categoria e descrição (``_note``) como atributos."""
+    yield (f'<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n'
+           f'<head><title>{_xml_text(title)}</title></head>\n<body>\n')
+    for event, depth, index in tree.walk(progress):
+        indent = "  " * (depth + 1)
+        if event == CLOSE:
+            if tree.children.get(index):
+                yield f"{indent}</outline>\n"
+            continue
+        attrs = f"text={_xml_attr(tree.names[index])}"
+        if tree.categories[index]:
+            attrs += f" category={_xml_attr(tree.categories[index])}"
+        if tree.descriptions[index]:
+            attrs += f" _note={_xml_attr(tree.descriptions[index])}"
+        yield f"{indent}<outline {attrs}{'>' if tree.children.get(index) else '/>'}\n"
+    yield "</body>\n</opml>\n"
+
+
+def _mermaid_text(text):
+    text = " ".join(str(text).split())
+    return text.replace("#", "#35;").replace('"', "#quot;")
+
+
+def export_mermaid(tree, title=DEFAULT_TITLE, progress=None):
+    """Diagrama ``mindmap`` do Mermaid; a hierarquia vem da indentação."""
+    yield f"---\ntitle: {_mermaid_text(title)}\n---\nmindmap\n"
+    for event, depth, index in tree.walk(progress):
+        if event != OPEN:
+            continue
+        shape = '(("{}"))' if index == tree.root else '["{}"]'
+        yield f"{'  ' * (depth + 1)}n{index}{shape.format(_mermaid_text(tree.names[index]))}\n"
+
+
+def export_graphml(tree, title=DEFAULT_TITLE, progress=None):
+    """GraphML com nome, categoria e descrição em cada nó e uma aresta pai -> filho."""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+           '  <key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+           '  <key id="category" for="node" attr.name="category" attr.type="string"/>\n'
+           '  <key id="description" for="node" attr.name="description" attr.type="string"/>\n'
+           f'  <graph id={_xml_attr(title)} edgedefault="directed">\n')
+    for event, _, index in tree.walk(progress):
+        if event != OPEN:
+            continue
+        node_id = _xml_attr(tree.ids[index])
+        data = f'<data key="name">{_xml_text(tree.names[index])}</data>'
+        if tree.categories[index]:
+            data += f'<data key="category">{_xml_text(tree.categories[index])}</data>'
+        if tree.descriptions[index]:
+            data += f'<data key="description">{_xml_text(tree.descriptions[index])}</data>'
+        yield f"    <node id={node_id}>{data}</node>\n"
+        parent = tree.parents[index]
+        if parent is not None:
+            yield f"    <edge source={_xml_attr(tree.ids[parent])} target={node_id}/>\n"
+    yield "  </graph>\n</graphml>\n"
+
+
+EXPORTERS = {
+    "md": (export_markdown, ".md"),
+    "opml": (export_opml, ".opml"),
+    "mermaid": (export_mermaid, ".mmd"),
+    "graphml": (export_graphml, ".graphml"),
+}
+
+
+def write_chunks(chunks, fp, buffer_size=WRITE_BUFFER):
+    """Grava os pedaços em lotes de ``buffer_size``; devolve o número de caracteres gravados."""
+    total = 0
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= buffer_size:
+            text = "".join(batch)
+            fp.write(text)
+            total += len(text)
+            batch = []
+    text = "".join(batch)
+    fp.write(text)
+    return total + len(text)
+
+
+def export_outline(path, out_path, fmt, catalog_by_name=None, title=DEFAULT_TITLE):
+    """Exporta um mapa salvo para ``out_path``; devolve o número de nós."""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+    tree = MapTree.from_file(path, catalog_by_name)
+    with open(out_path, "w", encoding="utf-8", newline="\n") as fp:
+        write_chunks(EXPORTERS[fmt][0](tree, title), fp)
+    return len(tree)
+
+
+class _NullWriter(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
+def synthetic_records(count, fanout=8, seed=0):
+    """Registros de um mapa sintético com ``count`` nós de serviço (pais sorteados entre os anteriores)."""
+    rng = random.Random(seed)
+    yield {"id": AWS_CENTER_ID, "parentId": None, "name": "AWS", "category": "", "description": "", "central": True}
+    for i in range(count):
+        parent = AWS_CENTER_ID if i < fanout else f"s{rng.randrange(max(1, i // fanout))}"
+        yield {"id": f"s{i}", "parentId": parent, "name": f"Serviço <{i}> & \"cia\"",
+               "category": f"Categoria {i % 23}", "description": f"Descrição do nó {i} " * 3, "central": False}
+
+
+def benchmark(sizes, formats=tuple(EXPORTERS), repeat=3):
+    """Mede montagem da árvore e exportação para tamanhos crescentes; gera ``(formato, nós, segundos)``."""
+    for size in sizes:
+        start = time.perf_counter()
+        tree = MapTree.from_records(synthetic_records(size))
+        yield "árvore", size, time.perf_counter() - start
+        for fmt in formats:
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                write_chunks(EXPORTERS[fmt][0](tree), _NullWriter())
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            yield fmt, size, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta mapas salvos como tópicos (Markdown, OPML, Mermaid, GraphML).")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    export_cmd = sub.add_parser("exportar", help="Exporta um mapa salvo.")
+    export_cmd.add_argument("arquivo", type=Path)
+    export_cmd.add_argument("--saida", type=Path, required=True, help="Arquivo de saída.")
+    export_cmd.add_argument("--formato", choices=tuple(EXPORTERS), help="Padrão: extensão da saída.")
+    export_cmd.add_argument("--catalogo", type=Path, help="CSV do catálogo (dados dos nós por referência).")
+    export_cmd.add_argument("--titulo", default=DEFAULT_TITLE)
+
+    bench_cmd = sub.add_parser("medir", help="Mede o tempo de exportação de mapas sintéticos.")
+    bench_cmd.add_argument("--tamanhos", nargs="+", type=int, default=[25000, 50000, 100000, 200000])
+    bench_cmd.add_argument("--formatos", nargs="+", choices=tuple(EXPORTERS), default=list(EXPORTERS))
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "medir":
+        # O custo por nó deve ficar estável à medida que o mapa cresce (escala linear)
+        print(f"{'etapa':<8} {'nós':>9} {'segundos':>9} {'µs/nó':>7}")
+        for fmt, size, seconds in benchmark(args.tamanhos, args.formatos):
+            print(f"{fmt:<8} {size:>9} {seconds:>9.3f} {seconds / size * 1e6:>7.2f}")
+        return 0
+
+    fmt = args.formato or next((name for name, (_, suffix) in EXPORTERS.items()
+                                if args.saida.name.endswith(suffix)), None)
+    if fmt is None:
+        parser.error("informe --formato (md, opml, mermaid ou graphml)")
+    catalog_by_name = {r["Service"]: r for r in read_catalog(args.catalogo)} if args.catalogo else None
+    try:
+        count = export_outline(args.arquivo, args.saida, fmt, catalog_by_name, args.titulo)
+    except (StateFormatError, OSError) as e:
+        print(f"{args.arquivo}: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.arquivo}: {count} nó(s) -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""Cores do mapa, compartilhadas pelo navegador e pelos renderizadores do servidor."""
+
+CATEGORY_COLORS = {
+    'Machine Learning': '#8E44AD',
+    'Suporte ao Desenvolvedor': '#3498DB',
+    'Ferramentas de Desenvolvedor': '#2ECC71',
+    'Computação': '#E74C3C',
+    'Rede e Entrega de Conteúdo': '#F39C12',
+    'Migração e Transferência': '#9B59B6',
+    'Gerenciamento e Governança': '#34495E',
+    'Segurança e Identidade': '#E67E22',
+    'Conformidade': '#1ABC9C',
+    'Armazenamento': '#D35400',
+    'Integração de Aplicações': '#16A085',
+    'Banco de Dados': '#27AE60',
+    'Analytics': '#7D3C98',
+    'IoT': '#FF6B35',
+    'Blockchain': '#6C5CE7',
+    'Quantum': '#A29BFE',
+    'Containers': '#00B894',
+    'Serverless': '#FDCB6E',
+    'Mobile': '#E17055',
+    'Custom Notes': '#A6B1E1',
+    'Anotações': '#A6B1E1',
+    'Observações': '#A6B1E1',
+    'Outros': '#7F8C8D',
+}
+CENTER_COLOR = '#232F3E'
+ACCENT_COLOR = '#FF9900'
+EDGE_COLOR = '#546E7A'
+NODE_STROKE_COLOR = '#333'
+
+
+def category_color(category):
+    return CATEGORY_COLORS.get(category) or CATEGORY_COLORS['Outros']
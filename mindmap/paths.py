@@ -0,0 +1,12 @@
+"""Pastas de dados gravados pelo servidor (salvamento automático, componente, mapas)."""
+import os
+from pathlib import Path
+
+DEFAULT_DATA_DIR = ".mindmap_data"
+
+
+def data_dir(*parts):
+    """Pasta de dados (``MINDMAP_DATA_DIR`` ou ``.mindmap_data``), criada sob demanda."""
+    path = Path(os.environ.get("MINDMAP_DATA_DIR", DEFAULT_DATA_DIR)).joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
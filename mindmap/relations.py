@@ -0,0 +1,181 @@
+"""Grafo de relações entre serviços (ex.: "Amazon Athena consulta dados no Amazon S3").
+
+As relações ficam num CSV opcional ao lado do catálogo (``services.csv`` ->
+``services.relations.csv``) com as colunas Origem, Relação e Destino. O grafo é
+guardado em arrays de adjacência compactos (estilo CSR) indexados pela posição
+do serviço no catálogo, a mesma usada pelo índice de busca e pelo JS.
+"""
+import csv
+from array import array
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+
+from mindmap.search_index import normalize_text
+
+RELATIONS_SUFFIX = ".relations.csv"
+
+_COLUMN_ALIASES = {
+    "origem": "source", "source": "source", "servico": "source",
+    "relacao": "relation", "relation": "relation", "tipo": "relation",
+    "destino": "target", "target": "target",
+}
+
+
+def relations_path_for(catalog_path):
+    """Caminho do arquivo de relações associado a um catálogo."""
+    catalog_path = Path(catalog_path)
+    return catalog_path.with_name(catalog_path.stem + RELATIONS_SUFFIX)
+
+
+def is_relations_file(path):
+    return Path(path).name.endswith(RELATIONS_SUFFIX)
+
+
+class RelationGraph:
+    """Adjacência não direcionada com o rótulo e o sentido de cada aresta.
+
+    ``edge_relations`` guarda ``+(i + 1)`` para arestas de saída e ``-(i + 1)``
+    para arestas de entrada, onde ``i`` indexa ``relation_labels``.
+    """
+
+    def __init__(self, service_names, triples):
+        self.service_names = list(service_names)
+        self.position_by_name = {name: i for i, name in enumerate(self.service_names)}
+        self.relation_labels = []
+        label_positions = {}
+
+        adjacency = [[] for _ in self.service_names]
+        seen = set()
+        self.skipped = 0
+        for source, relation, target in triples:
+            source_pos = self.position_by_name.get(source)
+            target_pos = self.position_by_name.get(target)
+            if source_pos is None or target_pos is None or source_pos == target_pos:
+                self.skipped += 1
+                continue
+            if (source_pos, relation, target_pos) in seen:
+                continue
+            seen.add((source_pos, relation, target_pos))
+            if relation not in label_positions:
+                label_positions[relation] = len(self.relation_labels)
+                self.relation_labels.append(relation)
+            code = label_positions[relation] + 1
+            adjacency[source_pos].append((target_pos, code))
+            adjacency[target_pos].append((source_pos, -code))
+
+        self.offsets = array("i", [0])
+        self.neighbor_positions = array("i")
+        self.edge_relations = array("i")
+        for entries in adjacency:
+            for neighbor_pos, code in entries:
+                self.neighbor_positions.append(neighbor_pos)
+                self.edge_relations.append(code)
+            self.offsets.append(len(self.neighbor_positions))
+
+        self.neighbors = lru_cache(maxsize=4096)(self._neighbors)
+        self.k_hop = lru_cache(maxsize=1024)(self._k_hop)
+        self.shortest_path = lru_cache(maxsize=1024)(self._shortest_path)
+
+    @property
+    def edge_count(self):
+        return len(self.neighbor_positions) // 2
+
+    def _neighbor_range(self, position):
+        return range(self.offsets[position], self.offsets[position + 1])
+
+    def _neighbors(self, name):
+        """Vizinhos diretos como tuplas (serviço, relação, "saida"|"entrada")."""
+        position = self.position_by_name.get(name)
+        if position is None:
+            return ()
+        result = []
+        for i in self._neighbor_range(position):
+            code = self.edge_relations[i]
+            direction = "saida" if code > 0 else "entrada"
+            result.append((self.service_names[self.neighbor_positions[i]], self.relation_labels[abs(code) - 1], direction))
+        return tuple(result)
+
+    def _k_hop(self, name, k):
+        """Serviços a até ``k`` saltos, como tuplas (serviço, distância) em ordem de BFS."""
+        start = self.position_by_name.get(name)
+        if start is None:
+            return ()
+        distances = {start: 0}
+        queue = deque([start])
+        while queue:
+            position = queue.popleft()
+            if distances[position] >= k:
+                continue
+            for i in self._neighbor_range(position):
+                neighbor = self.neighbor_positions[i]
+                if neighbor not in distances:
+                    distances[neighbor] = distances[position] + 1
+                    queue.append(neighbor)
+        return tuple((self.service_names[p], d) for p, d in distances.items() if p != start)
+
+    def _shortest_path(self, source, target):
+        """Menor caminho (lista de serviços) ignorando o sentido das arestas, ou None."""
+        start = self.position_by_name.get(source)
+        goal = self.position_by_name.get(target)
+        if start is None or goal is None:
+            return None
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            position = queue.popleft()
+            if position == goal:
+                path = []
+                while position is not None:
+                    path.append(self.service_names[position])
+                    position = previous[position]
+                return tuple(reversed(path))
+            for i in self._neighbor_range(position):
+                neighbor = self.neighbor_positions[i]
+                if neighbor not in previous:
+                    previous[neighbor] = position
+                    queue.append(neighbor)
+        return None
+
+    def to_client_payload(self):
+        """Arrays compactos enviados ao navegador (posições = ordem do catálogo)."""
+        return {
+            "relations": self.relation_labels,
+            "offsets": self.offsets.tolist(),
+            "neighbors": self.neighbor_positions.tolist(),
+            "edgeRelations": self.edge_relations.tolist(),
+        }
+
+
+def read_relation_triples(path):
+    """Lê o CSV de relações e devolve tuplas (origem, relação, destino)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return []
+        columns = {}
+        for i, col in enumerate(header):
+            key = _COLUMN_ALIASES.get(normalize_text(col).strip())
+            if key:
+                columns[key] = i
+        if len(columns) < 3:
+            raise ValueError(f"Arquivo de relações deve conter Origem, Relação e Destino. Encontradas: {header}")
+        triples = []
+        for row in reader:
+            if len(row) < len(header):
+                continue
+            triple = tuple(row[columns[key]].strip() for key in ("source", "relation", "target"))
+            if all(triple):
+                triples.append(triple)
+        return triples
+
+
+def load_relation_graph(catalog_paths, service_names):
+    """Carrega o grafo dos arquivos de relações dos catálogos (um caminho ou uma lista), ou None se não houver nenhum."""
+    if isinstance(catalog_paths, (str, Path)):
+        catalog_paths = [catalog_paths]
+    paths = [relations_path_for(p) for p in catalog_paths if relations_path_for(p).exists()]
+    if not paths:
+        return None
+    return RelationGraph(service_names, [triple for path in paths for triple in read_relation_triples(path)])
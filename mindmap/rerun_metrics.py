@@ -0,0 +1,156 @@
+"""Métricas dos reruns do Streamlit, somadas por processo.
+
+Cada rerun do ``app.py`` mede o tempo das etapas do ``main()`` (catálogo, logo,
+página do mapa, componente...), o tamanho do que vai para o navegador (HTML do
+mapa, argumentos do componente, página do modo visualização) e as chamadas de
+cada cache do app, separando acertos de execuções (:meth:`RerunMetrics.cached`
+conta as duas coisas em volta do ``st.cache_data``/``st.cache_resource``).
+
+O acumulado fica em :data:`METRICS` (o script do Streamlit é reexecutado a cada
+rerun; o módulo não) e sai em JSON ou no formato texto do Prometheus pelo
+servidor auxiliar (``GET /metricas/servidor`` e ``/metricas/servidor/prometheus``)
+e na página ``?metricas=<token>`` do app. As duas saídas exigem o token de
+administração (``MINDMAP_ADMIN_TOKEN``); sem ele ficam desligadas.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+PROMETHEUS_PREFIX = "mindmap"
+
+
+class _Series:
+    """Contagem, soma, máximo e último valor de uma medida."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    def as_dict(self, digits=4):
+        mean = self.total / self.count if self.count else 0.0
+        return {"n": self.count, "soma": round(self.total, digits), "media": round(mean, digits),
+                "max": round(self.max, digits), "ultimo": round(self.last, digits)}
+
+
+class RerunMetrics:
+    """Tempo por etapa, bytes enviados e acertos de cache, desde o início do processo."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.reruns = 0
+        self.stages = {}
+        self.payloads = {}
+        self.caches = {}  # nome -> [chamadas, execuções]
+        self._lock = threading.Lock()
+
+    def _add(self, table, name, value):
+        with self._lock:
+            table.setdefault(name, _Series()).add(value)
+
+    @contextmanager
+    def stage(self, name):
+        """Mede uma etapa; ``st.stop``/``st.rerun`` (exceções) também contam o tempo gasto."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(self.stages, name, time.perf_counter() - start)
+
+    @contextmanager
+    def rerun(self):
+        """Um rerun inteiro do script (etapa ``rerun``)."""
+        with self._lock:
+            self.reruns += 1
+        with self.stage("rerun"):
+            yield
+
+    def payload(self, name, size):
+        """Bytes enviados ao navegador nesta execução."""
+        self._add(self.payloads, name, size)
+
+    def _count_cache(self, name, index):
+        with self._lock:
+            self.caches.setdefault(name, [0, 0])[index] += 1
+
+    def cached(self, decorator, **options):
+        """Como ``decorator(**options)`` (``st.cache_data``/``st.cache_resource``), contando acertos e execuções.
+
+        O invólucro interno mantém nome, assinatura e código da função
+        (``functools.wraps``), então as chaves do cache do Streamlit não mudam.
+        """
+        def wrap(func):
+            name = func.__name__
+
+            @functools.wraps(func)
+            def body(*args, **kwargs):
+                self._count_cache(name, 1)
+                return func(*args, **kwargs)
+
+            cached_func = decorator(**options)(body)
+
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                self._count_cache(name, 0)
+                return cached_func(*args, **kwargs)
+
+            call.clear = cached_func.clear
+            return call
+        return wrap
+
+    def snapshot(self):
+        with self._lock:
+            caches = {}
+            for name, (calls, misses) in sorted(self.caches.items()):
+                hits = max(0, calls - misses)
+                caches[name] = {"chamadas": calls, "acertos": hits, "execucoes": misses,
+                                "taxa_acerto": round(hits / calls, 4) if calls else None}
+            return {
+                "iniciado_em": self.started_at,
+                "segundos_no_ar": round(time.time() - self.started_at, 1),
+                "reruns": self.reruns,
+                "etapas_segundos": {name: series.as_dict() for name, series in self.stages.items()},
+                "bytes_enviados": {name: series.as_dict(0) for name, series in self.payloads.items()},
+                "caches": caches,
+            }
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus (para ``scrape``), sem arredondar."""
+        p = PROMETHEUS_PREFIX
+
+        def label(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+        with self._lock:
+            stages = sorted(self.stages.items())
+            payloads = sorted(self.payloads.items())
+            caches = sorted((name, list(counts)) for name, counts in self.caches.items())
+            reruns = self.reruns
+        lines = [f"# TYPE {p}_reruns_total counter", f"{p}_reruns_total {reruns}",
+                 f"# TYPE {p}_stage_seconds summary"]
+        for name, series in stages:
+            lines.append(f'{p}_stage_seconds_count{{stage="{label(name)}"}} {series.count}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{label(name)}"}} {series.total}')
+        lines.append(f"# TYPE {p}_stage_seconds_max gauge")
+        for name, series in stages:
+            lines.append(f'{p}_stage_seconds_max{{stage="{label(name)}"}} {series.max}')
+        lines.append(f"# TYPE {p}_payload_bytes summary")
+        for name, series in payloads:
+            lines.append(f'{p}_payload_bytes_count{{payload="{label(name)}"}} {series.count}')
+            lines.append(f'{p}_payload_bytes_sum{{payload="{label(name)}"}} {int(series.total)}')
+        lines.append(f"# TYPE {p}_cache_calls_total counter")
+        for name, (calls, misses) in caches:
+            lines.append(f'{p}_cache_calls_total{{cache="{label(name)}",result="hit"}} {max(0, calls - misses)}')
+            lines.append(f'{p}_cache_calls_total{{cache="{label(name)}",result="miss"}} {misses}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = RerunMetrics()
@@ -0,0 +1,144 @@
+"""Índice invertido (tokens e prefixos) para a busca de serviços no mapa mental.
+
+O índice é montado uma única vez em Python a partir do catálogo e enviado
+pronto para o navegador, que só faz buscas binárias e interseções.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+
+INDEX_VERSION = 2
+
+# Peso de cada campo no ranking (nome > categoria > descrição)
+FIELD_WEIGHTS = (("Service", 3), ("Category", 2), ("Description", 1))
+
+# Prefixos curtos casam com muitos tokens; para eles o índice leva as postings já mescladas.
+# Listas cortadas em SHORT_PREFIX_MAX_DOCS ficam marcadas e a busca volta à varredura do vocabulário.
+SHORT_PREFIX_MAX_LEN = 2
+SHORT_PREFIX_MAX_DOCS = 300
+
+STOPWORDS = frozenset("""
+a ao aos as com como da das de do dos e em na nas no nos o os ou para pela pelas pelo pelos por
+que se sem sua suas seu seus um uma the and of for to with
+""".split())
+
+_TOKEN_SPLIT_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(text):
+    """Remove acentos e converte para minúsculas ("Computação" -> "computacao")."""
+    decomposed = unicodedata.normalize("NFD", str(text))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    """Quebra o texto normalizado em tokens alfanuméricos."""
+    return [token for token in _TOKEN_SPLIT_RE.split(normalize_text(text)) if token]
+
+
+def build_search_index(records):
+    """Monta o índice a partir dos registros do catálogo (mesma ordem enviada ao JS).
+
+    O id de cada documento é a sua posição em ``records``. As postings são listas
+    planas ``[doc, peso, doc, peso, ...]`` com o maior peso do token no documento.
+    """
+    token_postings = {}
+    for doc_id, record in enumerate(records):
+        doc_weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(record.get(field, "")):
+                if field == "Description" and (token in STOPWORDS or len(token) < 2):
+                    continue
+                if doc_weights.get(token, 0) < weight:
+                    doc_weights[token] = weight
+        for token, weight in doc_weights.items():
+            token_postings.setdefault(token, []).append((doc_id, weight))
+
+    vocab = sorted(token_postings)
+    postings = [_flatten(token_postings[token]) for token in vocab]
+
+    short_prefixes = {}
+    for token in vocab:
+        for length in range(1, min(SHORT_PREFIX_MAX_LEN, len(token)) + 1):
+            merged = short_prefixes.setdefault(token[:length], {})
+            for doc_id, weight in token_postings[token]:
+                if merged.get(doc_id, 0) < weight:
+                    merged[doc_id] = weight
+
+    prefixes = {}
+    truncated = []
+    for prefix, merged in short_prefixes.items():
+        if len(merged) > SHORT_PREFIX_MAX_DOCS:
+            truncated.append(prefix)
+            continue
+        prefixes[prefix] = _flatten(sorted(merged.items()))
+
+    return {
+        "version": INDEX_VERSION,
+        "shortPrefixMaxLen": SHORT_PREFIX_MAX_LEN,
+        "vocab": vocab,
+        "postings": postings,
+        "prefixes": prefixes,
+        "truncatedPrefixes": sorted(truncated),
+    }
+
+
+def _flatten(pairs):
+    flat = []
+    for doc_id, weight in pairs:
+        flat.append(doc_id)
+        flat.append(weight)
+    return flat
+
+
+def lookup_prefix(index, token):
+    """Retorna {doc: peso} para todos os tokens do vocabulário que começam com ``token``."""
+    matches = {}
+    if len(token) <= index["shortPrefixMaxLen"] and token not in index["truncatedPrefixes"]:
+        flat = index["prefixes"].get(token, [])
+        for i in range(0, len(flat), 2):
+            matches[flat[i]] = flat[i + 1]
+        return matches
+
+    vocab = index["vocab"]
+    position = bisect_left(vocab, token)
+    while position < len(vocab) and vocab[position].startswith(token):
+        exact_bonus = 1 if vocab[position] == token else 0
+        flat = index["postings"][position]
+        for i in range(0, len(flat), 2):
+            weight = flat[i + 1] + exact_bonus
+            if matches.get(flat[i], 0) < weight:
+                matches[flat[i]] = weight
+        position += 1
+    return matches
+
+
+def search(index, records, query, limit=20):
+    """Busca equivalente à do navegador; útil para ferramentas e conferências.
+
+    Todos os tokens da consulta precisam casar (E lógico), cada um como prefixo.
+    Retorna a lista de ids de documento ordenada por relevância.
+    """
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return []
+
+    scores = None
+    for token in query_tokens:
+        matches = lookup_prefix(index, token)
+        if scores is None:
+            scores = matches
+        else:
+            scores = {doc_id: score + matches[doc_id] for doc_id, score in scores.items() if doc_id in matches}
+        if not scores:
+            return []
+
+    normalized_query = " ".join(query_tokens)
+    ranked = []
+    for doc_id, score in scores.items():
+        name = normalize_text(records[doc_id].get("Service", ""))
+        if name.startswith(normalized_query):
+            score += 5
+        ranked.append((-score, name, doc_id))
+    ranked.sort()
+    return [doc_id for _, _, doc_id in ranked[:limit]]
@@ -0,0 +1,314 @@
+"""Servidor HTTP auxiliar (stdlib) que roda ao lado do Streamlit.
+
+O mapa mental roda dentro de um iframe de ``components.v1.html`` e não tem
+canal de volta para o Python; operações frequentes e pequenas (salvamento
+automático e métricas de desempenho, por exemplo) vão para este servidor em vez de provocar reruns do
+Streamlit. Ele sobe uma única vez por processo, numa thread daemon.
+
+Configuração por variáveis de ambiente:
+
+- ``MINDMAP_SIDECAR_PORT``: porta (padrão 8765; ``0`` ou vazio desativa);
+- ``MINDMAP_SIDECAR_HOST``: endereço de escuta (padrão ``127.0.0.1``);
+- ``MINDMAP_SIDECAR_PUBLIC_URL``: URL vista pelo navegador (proxy na mesma
+  origem do app, de preferência ``https``). Sem ela o navegador só usa o
+  servidor quando a página também é aberta em ``localhost``; fora disso os
+  recursos que dependem dele ficam desligados, com um aviso no mapa;
+- ``MINDMAP_SIDECAR_ORIGINS``: origens (``https://mapa.exemplo.com``) aceitas
+  no CORS, separadas por vírgula. Padrão: ``localhost`` em qualquer porta;
+- ``MINDMAP_ADMIN_TOKEN``: token das rotas de administração (parâmetro
+  ``token`` ou ``Authorization: Bearer``). Sem ele essas rotas respondem 404.
+
+Cada rota tem um nível de acesso: ``PUBLIC`` (prontidão), ``SESSION`` (token
+da sessão do Streamlit, entregue ao mapa junto com os argumentos do
+componente e enviado no parâmetro ``token``) ou ``ADMIN``.
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAP_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+LOOPBACK_ORIGIN = re.compile(r"^https?://(localhost|127\.0\.0\.1|\[::1\])(:\d+)?$")
+
+PUBLIC = "publico"
+SESSION = "sessao"
+ADMIN = "admin"
+ADMIN_TOKEN_ENV = "MINDMAP_ADMIN_TOKEN"
+
+
+class SessionTokens:
+    """Tokens de sessão assinados (HMAC): o app entrega um por sessão e o servidor só confere a assinatura."""
+
+    def __init__(self, secret=None):
+        self.secret = secret or secrets.token_bytes(32)
+
+    def _sign(self, session):
+        return hmac.new(self.secret, session.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def issue(self, session):
+        return f"{session}.{self._sign(session)}"
+
+    def check(self, token):
+        """Sessão do token, ou ``None`` se ele não foi emitido por este processo."""
+        session, _, signature = (token or "").partition(".")
+        if not session or not hmac.compare_digest(signature, self._sign(session)):
+            return None
+        return session
+
+
+def origin_allowed(origin, origins):
+    """Origens configuradas, ou ``localhost`` em qualquer porta quando não há configuração."""
+    return origin in origins if origins else bool(LOOPBACK_ORIGIN.match(origin))
+
+
+def allowed_origins():
+    setting = os.environ.get("MINDMAP_SIDECAR_ORIGINS", "")
+    return {item.strip().rstrip("/") for item in setting.split(",") if item.strip()}
+
+
+class Sidecar:
+    """Servidor com rotas simples: ``(método, prefixo) -> handler(resto, corpo, query)``.
+
+    O handler devolve ``(status, payload)``; dicionários e listas viram JSON,
+    ``bytes`` e ``str`` são enviados como estão (com o ``content_type`` da rota).
+    """
+
+    def __init__(self, host, port, public_url=None, origins=None, admin_token=None):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.origins = set(origins or ())
+        self.admin_token = admin_token
+        self.tokens = SessionTokens()
+        self.routes = []
+        self._server = None
+        self._thread = None
+        self._tasks = []
+
+    def route(self, method, prefix, handler, content_type="application/json", access=SESSION):
+        self.routes.append((method, prefix, handler, content_type, access))
+        # Prefixos mais longos primeiro, para "/a/b" vencer "/a"
+        self.routes.sort(key=lambda r: len(r[1]), reverse=True)
+
+    def origin_allowed(self, origin):
+        return origin_allowed(origin, self.origins)
+
+    def authorize(self, access, query, headers):
+        """Status HTTP de erro para a requisição, ou ``None`` se ela pode seguir."""
+        token = (query.get("token") or [""])[0]
+        if access == SESSION:
+            return None if self.tokens.check(token) else 403
+        if access == ADMIN:
+            if not self.admin_token:
+                return 404  # rotas de administração desligadas
+            bearer = (headers.get("Authorization") or "").removeprefix("Bearer ").strip()
+            given = token or bearer
+            return None if given and hmac.compare_digest(given, self.admin_token) else 403
+        return None
+
+    def every(self, seconds, task):
+        """Agenda ``task()`` para rodar periodicamente numa thread daemon."""
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(seconds):
+                try:
+                    task()
+                except Exception as exc:  # tarefa de fundo não pode derrubar o servidor
+                    print(f"[sidecar] tarefa periódica falhou: {exc}")
+
+        threading.Thread(target=loop, name="mindmap-sidecar-task", daemon=True).start()
+        self._tasks.append(stop)
+
+    def _dispatch(self, method, path):
+        for route_method, prefix, handler, content_type, access in self.routes:
+            if route_method == method and (path == prefix or path.startswith(prefix.rstrip("/") + "/")):
+                return handler, path[len(prefix):].strip("/"), content_type, access
+        return None, "", None, None
+
+    def start(self):
+        sidecar = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _cors_headers(self):
+                origin = self.headers.get("Origin")
+                if origin and sidecar.origin_allowed(origin):
+                    self.send_header("Access-Control-Allow-Origin", origin)
+                self.send_header("Vary", "Origin")
+
+            def _send(self, status, payload, content_type="application/json"):
+                if isinstance(payload, (dict, list)):
+                    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                elif isinstance(payload, str):
+                    body = payload.encode("utf-8")
+                else:
+                    body = payload or b""
+                self.send_response(status)
+                self._cors_headers()
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _reject(self, status, message):
+                # O corpo não foi lido: a conexão não pode ser reaproveitada
+                self.close_connection = True
+                self._send(status, {"erro": message})
+
+            def _handle(self, method):
+                parts = urlsplit(self.path)
+                handler, rest, content_type, access = sidecar._dispatch(method, parts.path)
+                origin = self.headers.get("Origin")
+                if origin and not sidecar.origin_allowed(origin):
+                    self._reject(403, "Origem não permitida.")
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self._reject(400, "Content-Length inválido.")
+                    return
+                if length > MAX_BODY_BYTES:
+                    self._reject(413, "Corpo da requisição grande demais.")
+                    return
+                if handler is None:
+                    self._reject(404, "Rota não encontrada.")
+                    return
+                query = parse_qs(parts.query)
+                denied = sidecar.authorize(access, query, self.headers)
+                if denied:
+                    self._reject(denied, "Rota não encontrada." if denied == 404 else "Acesso negado.")
+                    return
+                body = self.rfile.read(length) if length else b""
+                try:
+                    status, payload = handler(rest, body, query)
+                except ValueError as exc:
+                    self._send(400, {"erro": str(exc)})
+                    return
+                except Exception as exc:
+                    self._send(500, {"erro": f"Falha interna: {exc}"})
+                    return
+                self._send(status, payload, content_type if status < 400 else "application/json")
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_OPTIONS(self):
+                self.send_response(204)
+                self._cors_headers()
+                self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+                self.send_header("Access-Control-Allow-Headers", "Content-Type")
+                self.send_header("Access-Control-Max-Age", "86400")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mindmap-sidecar", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        for stop in self._tasks:
+            stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def parse_json_body(body):
+    """Decodifica o corpo JSON de uma requisição (``ValueError`` vira HTTP 400)."""
+    try:
+        return json.loads(body.decode("utf-8")) if body else {}
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError(f"JSON inválido: {exc}")
+
+
+def check_map_id(map_id):
+    if not MAP_ID_PATTERN.match(map_id or ""):
+        raise ValueError("Identificador de mapa inválido.")
+    return map_id
+
+
+def register_autosave_routes(sidecar, store, compact_interval=300):
+    """Rotas ``GET/POST /autosave/<mapa>`` sobre um :class:`~mindmap.autosave.AutosaveStore`."""
+
+    def get_state(rest, body, query):
+        state, seq = store.restore(check_map_id(rest))
+        if state is None:
+            return 404, {"erro": "Mapa sem salvamento automático."}
+        return 200, {"seq": seq, "state": state}
+
+    def post_ops(rest, body, query):
+        payload = parse_json_body(body)
+        ops = payload.get("ops") if isinstance(payload, dict) else None
+        if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+            raise ValueError("Campo 'ops' deve ser uma lista de operações.")
+        client, batch = payload.get("cliente"), payload.get("lote")
+        if client is not None and not (isinstance(client, str) and MAP_ID_PATTERN.match(client)):
+            raise ValueError("Campo 'cliente' inválido.")
+        if batch is not None and (not isinstance(batch, int) or isinstance(batch, bool) or batch < 1):
+            raise ValueError("Campo 'lote' deve ser um inteiro positivo.")
+        seq = store.append(check_map_id(rest), ops, client, batch)
+        return 200, {"seq": seq}
+
+    sidecar.route("GET", "/autosave", get_state, access=SESSION)
+    sidecar.route("POST", "/autosave", post_ops, access=SESSION)
+    if compact_interval:
+        sidecar.every(compact_interval, lambda: store.compact_all(min_idle_seconds=compact_interval))
+
+
+def register_client_metrics_routes(sidecar, metrics, save_interval=60):
+    """Rotas ``POST/GET /metricas/cliente`` sobre um :class:`~mindmap.client_metrics.ClientMetrics`."""
+
+    def post_report(rest, body, query):
+        return 200, {"operacoes": metrics.record(parse_json_body(body))}
+
+    sidecar.route("POST", "/metricas/cliente", post_report, access=SESSION)
+    sidecar.route("GET", "/metricas/cliente", lambda rest, body, query: (200, metrics.snapshot()), access=ADMIN)
+    if save_interval:
+        sidecar.every(save_interval, metrics.save)
+
+
+def start_sidecar():
+    """Sobe o servidor auxiliar com as rotas padrão; devolve ``None`` se desativado ou indisponível."""
+    from mindmap.autosave import AutosaveStore
+    from mindmap.client_metrics import SAVE_INTERVAL, ClientMetrics
+    from mindmap.rerun_metrics import METRICS as RERUN_METRICS
+    from mindmap.warmup import readiness_payload
+
+    port_setting = os.environ.get("MINDMAP_SIDECAR_PORT", str(DEFAULT_PORT)).strip()
+    if port_setting in ("", "0"):
+        return None
+    host = os.environ.get("MINDMAP_SIDECAR_HOST", "127.0.0.1")
+    sidecar = Sidecar(host, int(port_setting), os.environ.get("MINDMAP_SIDECAR_PUBLIC_URL") or None, allowed_origins(),
+                      os.environ.get(ADMIN_TOKEN_ENV) or None)
+    register_autosave_routes(sidecar, AutosaveStore())
+    register_client_metrics_routes(sidecar, ClientMetrics(), SAVE_INTERVAL)
+    sidecar.route("GET", "/prontidao", lambda rest, body, query: readiness_payload(), access=PUBLIC)
+    sidecar.route("GET", "/metricas/servidor", lambda rest, body, query: (200, RERUN_METRICS.snapshot()), access=ADMIN)
+    sidecar.route("GET", "/metricas/servidor/prometheus", lambda rest, body, query: (200, RERUN_METRICS.prometheus()),
+                  content_type="text/plain; version=0.0.4; charset=utf-8", access=ADMIN)
+    try:
+        return sidecar.start()
+    except OSError as exc:
+        print(f"[sidecar] não foi possível abrir {host}:{port_setting}: {exc}")
+        return None
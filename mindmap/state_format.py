@@ -0,0 +1,170 @@
+"""Formato de arquivo do mapa mental: versão compacta por referência e leitura do legado.
+
+Formato legado (versão 1, ``aws-mindmap-estado-*.json``)::
+
+    {"nodes": [{"id", "name", "category", "description", "x", "y", "parentId", ...}], "viewBox": {...}}
+
+Formato compacto (versão 2)::
+
+    {"format": "aws-mindmap", "version": 2,
+     "catalog": {"name": "services.csv", "hash": "..."},
+     "center": [x, y],
+     "refs": [[id, x, y, parentId], ...],        # nós do catálogo (dados vêm do CSV)
+     "custom": [{id, name, category, description, x, y, parentId}, ...],
+     "viewBox": [x, y, width, height]}
+
+Os dois podem vir comprimidos com gzip ou deflate (zlib); a detecção é pelos bytes iniciais.
+"""
+import gzip
+import hashlib
+import json
+import zlib
+from pathlib import Path
+
+FORMAT_NAME = "aws-mindmap"
+FORMAT_VERSION = 2
+AWS_CENTER_ID = "aws_central_logo_node"
+# Posição do nó central quando o arquivo não traz ``center`` (a mesma do navegador)
+DEFAULT_CENTER = (800, 400)
+COMPRESSIONS = (None, "gzip", "deflate")
+STATE_FILE_SUFFIXES = (".json", ".json.gz", ".json.deflate")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def catalog_hash(records):
+    """Hash estável do catálogo (Service, Category, Description), na ordem das linhas."""
+    digest = hashlib.sha256()
+    for record in records:
+        for field in ("Service", "Category", "Description"):
+            digest.update(str(record.get(field, "")).encode("utf-8"))
+            digest.update(b"\x1f")
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:16]
+
+
+def _round(value):
+    value = round(float(value), 1)
+    return int(value) if value.is_integer() else value
+
+
+def state_file_stem(name):
+    """Nome do arquivo sem a extensão de estado (``a.v1.json.gz`` -> ``a.v1``)."""
+    for suffix in sorted(STATE_FILE_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def is_compact(data):
+    return isinstance(data, dict) and data.get("format") == FORMAT_NAME and "refs" in data
+
+
+def encode_state(nodes, view_box=None, catalog_name="", catalog_digest=""):
+    """Converte uma lista de nós (formato legado) para o formato compacto."""
+    center = list(DEFAULT_CENTER)
+    refs = []
+    custom = []
+    for node in nodes:
+        if node.get("id") == AWS_CENTER_ID or node.get("isCentral"):
+            center = [_round(node.get("x", 0)), _round(node.get("y", 0))]
+        elif node.get("isCustom"):
+            custom.append({
+                "id": node["id"],
+                "name": node.get("name", node["id"]),
+                "category": node.get("category", ""),
+                "description": node.get("description", ""),
+                "x": _round(node.get("x", 0)),
+                "y": _round(node.get("y", 0)),
+                "parentId": node.get("parentId"),
+            })
+        else:
+            refs.append([node["id"], _round(node.get("x", 0)), _round(node.get("y", 0)), node.get("parentId")])
+
+    state = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "catalog": {"name": catalog_name, "hash": catalog_digest},
+        "center": center,
+        "refs": refs,
+        "custom": custom,
+    }
+    if view_box:
+        state["viewBox"] = [_round(view_box[k]) for k in ("x", "y", "width", "height")]
+    return state
+
+
+def decode_state(data, catalog_by_name):
+    """Expande qualquer formato para ``{"nodes": [...], "viewBox": {...}}`` (formato legado).
+
+    ``catalog_by_name`` mapeia o nome do serviço para o registro do catálogo. Referências
+    que não existem mais no catálogo viram nós da categoria "Outros" e são listadas em
+    ``missingRefs``.
+    """
+    if not is_compact(data):
+        return data
+
+    nodes = [{
+        "id": AWS_CENTER_ID, "name": "AWS", "category": "Central", "description": "Amazon Web Services",
+        "x": data.get("center", DEFAULT_CENTER)[0], "y": data.get("center", DEFAULT_CENTER)[1],
+        "isCentral": True, "parentId": None,
+    }]
+    missing = []
+    for node_id, x, y, parent_id in data.get("refs", []):
+        record = catalog_by_name.get(node_id)
+        if record is None:
+            missing.append(node_id)
+            record = {"Category": "Outros", "Description": "Serviço não encontrado no catálogo atual"}
+        nodes.append({
+            "id": node_id, "name": node_id,
+            "category": record.get("Category") or "Outros",
+            "description": record.get("Description") or "Serviço AWS",
+            "x": x, "y": y, "parentId": parent_id, "isCentral": False, "isCustom": False,
+        })
+    for node in data.get("custom", []):
+        nodes.append(dict(node, isCentral=False, isCustom=True))
+
+    expanded = {"nodes": nodes, "missingRefs": missing}
+    if data.get("viewBox"):
+        x, y, width, height = data["viewBox"]
+        expanded["viewBox"] = {"x": x, "y": y, "width": width, "height": height}
+    return expanded
+
+
+def decompress_bytes(raw):
+    """Descomprime gzip ou deflate (zlib) se os bytes iniciais indicarem; senão devolve como está."""
+    if raw[:2] == _GZIP_MAGIC:
+        return gzip.decompress(raw)
+    if len(raw) >= 2 and raw[0] == 0x78 and (raw[0] * 256 + raw[1]) % 31 == 0:
+        return zlib.decompress(raw)
+    return raw
+
+
+def compress_bytes(raw, compression):
+    if compression == "gzip":
+        return gzip.compress(raw, mtime=0)
+    if compression == "deflate":
+        return zlib.compress(raw, 9)
+    return raw
+
+
+def read_state_file(path, catalog_by_name=None):
+    """Lê um arquivo de estado (qualquer versão, comprimido ou não).
+
+    Com ``catalog_by_name`` o resultado é sempre expandido para o formato legado.
+    """
+    data = json.loads(decompress_bytes(Path(path).read_bytes()).decode("utf-8"))
+    if catalog_by_name is not None:
+        return decode_state(data, catalog_by_name)
+    return data
+
+
+def dumps_state(state):
+    """Serializa sem indentação nem espaços (o formato compacto é feito para máquinas)."""
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_state_file(path, state, compression=None):
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compressão não suportada: {compression}")
+    Path(path).write_bytes(compress_bytes(dumps_state(state).encode("utf-8"), compression))
@@ -0,0 +1,559 @@
+"""Leitura incremental, validação e reparo de arquivos de estado do mapa mental.
+
+Os arquivos são lidos em blocos: só os itens dos arrays de nós (``nodes``,
+``refs`` e ``custom``) são decodificados, um de cada vez, então a memória usada
+depende do número de ids (para checar duplicados, pais e ciclos) e não do
+tamanho do arquivo.
+
+Uso::
+
+    python -m mindmap.state_validator validar mapas/*.json
+    python -m mindmap.state_validator reparar mapas/*.json --saida mapas_v2 --catalogo services.csv --gzip
+"""
+import argparse
+import codecs
+import gzip
+import json
+import math
+import os
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+from mindmap.catalog import read_catalog
+from mindmap.state_format import AWS_CENTER_ID, DEFAULT_CENTER, FORMAT_NAME, FORMAT_VERSION, catalog_hash, state_file_stem
+
+STREAMED_KEYS = ("nodes", "refs", "custom")
+CHUNK_SIZE = 64 * 1024
+
+ERROR = "erro"
+WARNING = "aviso"
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+class StateFormatError(ValueError):
+    """Arquivo que não é um JSON de estado legível."""
+
+
+class _DeflateTextReader:
+    """Leitor de texto sobre um arquivo comprimido com zlib, descomprimindo sob demanda."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.decompressor = zlib.decompressobj()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read(self, size):
+        while True:
+            chunk = self.raw.read(size)
+            if not chunk:
+                return self.decoder.decode(self.decompressor.flush(), final=True)
+            text = self.decoder.decode(self.decompressor.decompress(chunk))
+            if text:
+                return text
+
+    def close(self):
+        self.raw.close()
+
+
+def open_state_text(path):
+    """Abre o arquivo como texto, detectando gzip/deflate pelos bytes iniciais."""
+    with open(path, "rb") as f:
+        head = f.read(2)
+    if head == b"\x1f\x8b":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if len(head) == 2 and head[0] == 0x78 and (head[0] * 256 + head[1]) % 31 == 0:
+        return _DeflateTextReader(open(path, "rb"))
+    return open(path, "r", encoding="utf-8")
+
+
+class _Scanner:
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise StateFormatError(f"Esperado {char!r}, encontrado {found or 'fim do arquivo'!r}.")
+        self.pos += 1
+
+    def value(self):
+        if not self.peek():
+            raise StateFormatError("Fim inesperado do arquivo.")
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof or not self._fill():
+                    raise StateFormatError(f"JSON inválido: {e.msg}") from e
+                continue
+            # Um número no fim do buffer pode estar cortado ("12" de "123")
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_state_events(fp, stream_keys=STREAMED_KEYS):
+    """Percorre o objeto de nível superior gerando ``(chave, valor, é_item_de_array)``.
+
+    Para as chaves em ``stream_keys`` cada elemento do array é gerado separadamente
+    (um array vazio sai inteiro, como ``[]``); as demais chaves (viewBox, catalog,
+    center...) são pequenas e saem inteiras.
+    """
+    scanner = _Scanner(fp)
+    scanner.expect("{")
+    if scanner.peek() == "}":
+        return
+    while True:
+        key = scanner.value()
+        if not isinstance(key, str):
+            raise StateFormatError("Chave de objeto inválida.")
+        scanner.expect(":")
+        if key in stream_keys and scanner.peek() == "[":
+            scanner.pos += 1
+            if scanner.peek() == "]":
+                scanner.pos += 1
+                yield key, [], False
+            else:
+                while True:
+                    yield key, scanner.value(), True
+                    separator = scanner.peek()
+                    scanner.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise StateFormatError(f"Esperado ',' ou ']' em '{key}'.")
+        else:
+            yield key, scanner.value(), False
+        separator = scanner.peek()
+        scanner.pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise StateFormatError("Esperado ',' ou '}' no objeto principal.")
+
+
+def iter_state_nodes(path):
+    """Gera ``(chave, nó normalizado)`` de qualquer formato, e metadados como ``("meta", (chave, valor))``.
+
+    O nó normalizado tem id, name, x, y, parentId, isCustom, isCentral e o item original em ``raw``.
+    """
+    fp = open_state_text(path)
+    try:
+        for key, value, is_item in iter_state_events(fp):
+            if not is_item:
+                yield "meta", (key, value)
+            elif key == "refs":
+                if isinstance(value, list) and len(value) == 4:
+                    node_id, x, y, parent_id = value
+                    yield key, {"id": node_id, "name": node_id, "x": x, "y": y, "parentId": parent_id,
+                                "isCustom": False, "isCentral": False, "raw": value}
+                else:
+                    yield key, {"raw": value}
+            elif isinstance(value, dict):
+                node = dict(value)
+                node["raw"] = value
+                if key == "custom":
+                    node["isCustom"] = True
+                yield key, node
+            else:
+                yield key, {"raw": value}
+    finally:
+        fp.close()
+
+
+class ValidationReport:
+    """Resultado da validação de um arquivo."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.issues = []
+        self.node_count = 0
+        self.format_version = 1
+        self.meta = {}
+        self.parents = {}
+        self.center = None
+        self.dangling = set()
+        self.cycle_breaks = set()
+        self.renamed_refs = []
+        self.removed_refs = []
+
+    def add(self, severity, code, message, node_id=None):
+        self.issues.append({"severidade": severity, "codigo": code, "no": node_id, "mensagem": message})
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue["severidade"] == ERROR]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def summary(self):
+        status = "OK" if self.ok else "ERROS"
+        return (f"{self.path}: {status} - {self.node_count} nós, formato v{self.format_version}, "
+                f"{len(self.errors)} erro(s), {len(self.issues) - len(self.errors)} aviso(s)")
+
+
+def _as_number(value):
+    """Converte a coordenada para float; devolve (valor, é_texto) ou (None, False) se inválida."""
+    if isinstance(value, bool):
+        return None, False
+    if isinstance(value, (int, float)):
+        return (float(value), False) if math.isfinite(value) else (None, False)
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return None, False
+        return (number, True) if math.isfinite(number) else (None, False)
+    return None, False
+
+
+def validate_state_file(path):
+    """Valida um arquivo de estado em uma única passada incremental."""
+    report = ValidationReport(path)
+    seen_ids = set()
+    sections = set()
+    try:
+        for key, item in iter_state_nodes(path):
+            if key == "meta":
+                meta_key, value = item
+                sections.add(meta_key)
+                report.meta[meta_key] = value
+                if meta_key == "version":
+                    report.format_version = value
+                elif meta_key == "center" and isinstance(value, list) and len(value) == 2:
+                    report.center = value
+                    report.parents[AWS_CENTER_ID] = None
+                continue
+            sections.add(key)
+            _validate_node(report, key, item, seen_ids)
+    except (StateFormatError, OSError, UnicodeDecodeError, EOFError, zlib.error) as e:
+        report.add(ERROR, "json", f"Arquivo ilegível: {e}")
+        return report
+
+    if report.meta.get("format") not in (None, FORMAT_NAME):
+        report.add(WARNING, "formato", f"Formato desconhecido: {report.meta.get('format')!r}")
+    if "nodes" not in sections and "refs" not in sections:
+        report.add(ERROR, "sem_nos", "Arquivo sem lista de nós ('nodes' ou 'refs').")
+    if AWS_CENTER_ID not in report.parents:
+        report.add(WARNING, "sem_no_central", "Nó central AWS ausente; será recriado ao carregar.")
+
+    for node_id, parent_id in report.parents.items():
+        if parent_id is not None and parent_id not in report.parents:
+            report.dangling.add(node_id)
+            report.add(ERROR, "pai_inexistente", f"Pai '{parent_id}' não existe no mapa.", node_id)
+
+    _find_cycles(report)
+    return report
+
+
+def _validate_node(report, key, node, seen_ids):
+    report.node_count += 1
+    node_id = node.get("id")
+    if not isinstance(node_id, str) or not node_id:
+        report.add(ERROR, "campo_ausente", f"Item #{report.node_count} de '{key}' sem 'id' válido.")
+        return
+    if key != "refs":
+        missing = [field for field in ("name", "x", "y") if field not in node]
+        if missing:
+            report.add(ERROR, "campo_ausente", f"Campos ausentes: {', '.join(missing)}.", node_id)
+    for axis in ("x", "y"):
+        if axis not in node:
+            continue
+        number, was_text = _as_number(node[axis])
+        if number is None:
+            report.add(ERROR, "coordenada_invalida", f"Coordenada {axis}={node[axis]!r} não numérica.", node_id)
+        elif was_text:
+            report.add(WARNING, "coordenada_texto", f"Coordenada {axis} gravada como texto.", node_id)
+
+    if node_id in seen_ids:
+        report.add(ERROR, "id_duplicado", "Id repetido; só a primeira ocorrência é mantida.", node_id)
+        return
+    seen_ids.add(node_id)
+
+    parent_id = node.get("parentId")
+    if node_id == AWS_CENTER_ID or node.get("isCentral"):
+        parent_id = None
+        if report.center is None:
+            report.center = [node.get("x"), node.get("y")]
+    elif parent_id == node_id:
+        report.add(ERROR, "ciclo", "Nó é pai de si mesmo.", node_id)
+        report.cycle_breaks.add(node_id)
+        parent_id = None
+    elif parent_id is not None and not isinstance(parent_id, str):
+        report.add(ERROR, "pai_invalido", f"parentId {parent_id!r} não é texto.", node_id)
+        report.dangling.add(node_id)
+        parent_id = None
+    report.parents[node_id] = parent_id
+
+
+def _find_cycles(report):
+    # Cada nó tem no máximo um pai: basta seguir a cadeia marcando os nós visitados
+    state = {}
+    for start in report.parents:
+        if start in state:
+            continue
+        path = []
+        current = start
+        while current is not None and current in report.parents and current not in state:
+            state[current] = "visiting"
+            path.append(current)
+            current = report.parents[current]
+        if current is not None and state.get(current) == "visiting":
+            cycle = path[path.index(current):]
+            report.cycle_breaks.add(cycle[0])
+            report.add(ERROR, "ciclo", f"Ciclo de pais: {' -> '.join(cycle + [cycle[0]])}.", cycle[0])
+        for node_id in path:
+            state[node_id] = "done"
+
+
+def repair_state_file(path, out_path, catalog_records=None, compression=None, report=None, catalog_name="",
+                      renamed=None, previous_by_name=None, catalog_index=None):
+    """Regrava o arquivo no formato compacto, corrigindo o que a validação encontrou.
+
+    - ids duplicados: mantém a primeira ocorrência;
+    - coordenadas em texto viram números; inválidas vão para a posição do nó central;
+    - pais inexistentes e ciclos: o nó passa a ser filho do nó central;
+    - nós do catálogo que não existem em ``catalog_records`` são gravados como customizados
+      (com categoria e descrição de ``previous_by_name``, o catálogo antigo, quando houver);
+    - ``renamed`` (nome antigo -> novo) troca o id das referências e dos pais que apontam para elas;
+      se o nome novo já estiver no mapa, só o primeiro nó é mantido e o relatório ganha um aviso.
+
+    ``catalog_index`` é o resultado de :func:`index_catalog` para ``catalog_records``; ao
+    reparar um lote de arquivos, indexe o catálogo uma vez e passe-o em todas as chamadas.
+
+    Faz duas passadas (validação + escrita); nós customizados passam por um arquivo
+    temporário para que o resultado seja escrito sem manter o mapa em memória. A saída
+    é gravada em ``<out_path>.tmp`` e só substitui ``out_path`` no fim, então
+    ``out_path`` pode ser o próprio ``path``.
+    """
+    report = report or validate_state_file(path)
+    if any(issue["codigo"] == "json" for issue in report.issues):
+        raise StateFormatError(f"{path}: arquivo ilegível, não é possível reparar.")
+
+    if catalog_index is None:
+        catalog_index = index_catalog(catalog_records)
+    catalog_by_name, digest = catalog_index
+    center_x, center_y = (_as_number(v)[0] for v in (report.center or DEFAULT_CENTER))
+    center_x = DEFAULT_CENTER[0] if center_x is None else center_x
+    center_y = DEFAULT_CENTER[1] if center_y is None else center_y
+    renamed = renamed or {}
+    previous_by_name = previous_by_name or {}
+
+    if catalog_records is not None:
+        catalog_meta = {"name": catalog_name, "hash": digest}
+    else:
+        catalog_meta = report.meta.get("catalog") or {"name": "", "hash": ""}
+
+    def coordinate(value, default):
+        number = _as_number(value)[0]
+        return _round(default if number is None else number)
+
+    out_path = Path(out_path)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    out_stream = _open_output(tmp_path, compression)
+    try:
+        header = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "catalog": catalog_meta,
+                  "center": [_round(center_x), _round(center_y)]}
+        out_stream.write(json.dumps(header, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"refs":[')
+
+        written = set()
+        renamed_from = {}  # id novo -> id antigo gravado com ele
+        first_ref = True
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+", encoding="utf-8") as custom_buffer:
+            first_custom = True
+            for key, node in iter_state_nodes(path):
+                if key == "meta":
+                    continue
+                source_id = node.get("id")
+                if not isinstance(source_id, str) or not source_id:
+                    continue
+                if source_id in written:
+                    if source_id in renamed_from:
+                        _report_rename_clash(report, renamed_from[source_id], source_id)
+                    continue
+                if source_id == AWS_CENTER_ID or node.get("isCentral"):
+                    written.add(source_id)
+                    continue
+                node_id = source_id if node.get("isCustom") else renamed.get(source_id, source_id)
+                if node_id in written:
+                    if node_id != source_id:
+                        _report_rename_clash(report, source_id, node_id)
+                    continue
+                written.update((source_id, node_id))
+                if node_id != source_id:
+                    report.renamed_refs.append((source_id, node_id))
+                    renamed_from[node_id] = source_id
+                parent_id = node.get("parentId")
+                if source_id in report.dangling or source_id in report.cycle_breaks or parent_id is None:
+                    parent_id = AWS_CENTER_ID
+                parent_id = renamed.get(parent_id, parent_id)
+                x = coordinate(node.get("x"), center_x)
+                y = coordinate(node.get("y"), center_y)
+
+                in_catalog = catalog_by_name is None or node_id in catalog_by_name
+                if node.get("isCustom") or not in_catalog:
+                    previous = {} if node.get("isCustom") else previous_by_name.get(source_id, {})
+                    if not node.get("isCustom"):
+                        report.removed_refs.append(source_id)
+                    custom = {"id": node_id, "name": node.get("name") or node_id,
+                              "category": node.get("category") or previous.get("Category") or "Outros",
+                              "description": node.get("description") or previous.get("Description") or "",
+                              "x": x, "y": y, "parentId": parent_id}
+                    custom_buffer.write(("" if first_custom else ",") + json.dumps(custom, ensure_ascii=False, separators=(",", ":")))
+                    first_custom = False
+                else:
+                    out_stream.write(("" if first_ref else ",") + json.dumps([node_id, x, y, parent_id], ensure_ascii=False, separators=(",", ":")))
+                    first_ref = False
+
+            out_stream.write('],"custom":[')
+            custom_buffer.seek(0)
+            while True:
+                chunk = custom_buffer.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out_stream.write(chunk)
+        out_stream.write("]")
+        view_box = report.meta.get("viewBox")
+        if isinstance(view_box, dict) and all(k in view_box for k in ("x", "y", "width", "height")):
+            view_box = [view_box[k] for k in ("x", "y", "width", "height")]
+        if isinstance(view_box, list) and len(view_box) == 4 and all(_as_number(v)[0] is not None for v in view_box):
+            out_stream.write(',"viewBox":' + json.dumps([_round(_as_number(v)[0]) for v in view_box], separators=(",", ":")))
+        out_stream.write("}")
+    except BaseException:
+        out_stream.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    out_stream.close()
+    os.replace(tmp_path, out_path)
+    return report
+
+
+def index_catalog(catalog_records):
+    """``(registros por nome, hash)`` do catálogo, ou ``(None, None)`` sem catálogo."""
+    if catalog_records is None:
+        return None, None
+    return {r["Service"]: r for r in catalog_records}, catalog_hash(catalog_records)
+
+
+def _report_rename_clash(report, old_id, new_id):
+    report.add(WARNING, "renomeado_existente",
+               f"'{old_id}' foi renomeado para '{new_id}', que já está no mapa; só o primeiro nó foi mantido.", new_id)
+
+
+def _round(value):
+    value = round(float(value), 1)
+    return int(value) if value.is_integer() else value
+
+
+def _open_output(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    if compression == "deflate":
+        return _DeflateTextWriter(open(path, "wb"))
+    return open(path, "w", encoding="utf-8")
+
+
+class _DeflateTextWriter:
+    def __init__(self, raw):
+        self.raw = raw
+        self.compressor = zlib.compressobj(9)
+
+    def write(self, text):
+        self.raw.write(self.compressor.compress(text.encode("utf-8")))
+
+    def close(self):
+        self.raw.write(self.compressor.flush())
+        self.raw.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida e repara arquivos de estado do AWS MindMap pro.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    validate_cmd = sub.add_parser("validar", help="Valida arquivos e lista os problemas encontrados.")
+    validate_cmd.add_argument("arquivos", nargs="+", type=Path)
+    validate_cmd.add_argument("--json", action="store_true", help="Saída em JSON (uma linha por arquivo).")
+
+    repair_cmd = sub.add_parser("reparar", help="Corrige e migra arquivos para o formato compacto.")
+    repair_cmd.add_argument("arquivos", nargs="+", type=Path)
+    repair_cmd.add_argument("--saida", type=Path, required=True, help="Pasta de saída.")
+    repair_cmd.add_argument("--catalogo", type=Path, help="CSV do catálogo atual (hash e referências).")
+    compression = repair_cmd.add_mutually_exclusive_group()
+    compression.add_argument("--gzip", action="store_const", const="gzip", dest="compressao")
+    compression.add_argument("--deflate", action="store_const", const="deflate", dest="compressao")
+
+    args = parser.parse_args(argv)
+    failures = 0
+
+    if args.comando == "validar":
+        for path in args.arquivos:
+            report = validate_state_file(path)
+            failures += not report.ok
+            if args.json:
+                print(json.dumps({"arquivo": report.path, "ok": report.ok, "nos": report.node_count,
+                                  "problemas": report.issues}, ensure_ascii=False))
+            else:
+                print(report.summary())
+                for issue in report.issues:
+                    node = f" [{issue['no']}]" if issue["no"] else ""
+                    print(f"  {issue['severidade']}: {issue['codigo']}{node} - {issue['mensagem']}")
+        return 1 if failures else 0
+
+    catalog_records = read_catalog(args.catalogo) if args.catalogo else None
+    catalog_index = index_catalog(catalog_records)
+    args.saida.mkdir(parents=True, exist_ok=True)
+    suffix = {"gzip": ".json.gz", "deflate": ".json.deflate"}.get(args.compressao, ".json")
+    sources = {}
+    for path in args.arquivos:
+        out_path = args.saida / (state_file_stem(path.name) + suffix)
+        key = out_path.resolve()
+        if key in sources:
+            failures += 1
+            print(f"{path}: saída {out_path} já usada por {sources[key]}; arquivo ignorado.", file=sys.stderr)
+            continue
+        sources[key] = path
+        try:
+            report = repair_state_file(path, out_path, catalog_records, args.compressao,
+                                       catalog_name=args.catalogo.name if args.catalogo else "",
+                                       catalog_index=catalog_index)
+        except StateFormatError as e:
+            failures += 1
+            print(f"{path}: {e}", file=sys.stderr)
+            continue
+        print(f"{report.summary()} -> {out_path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""Catálogos e mapas salvos sintéticos para testes de carga e de escala.
+
+O catálogo segue o esquema do ``services.csv`` ("Nome do Serviço", "Categoria",
+"Descrição"), com as categorias da paleta e descrições longas em português. O
+mapa segue o formato de arquivo do app (compacto por referência, ou o legado
+``aws-mindmap-estado`` com ``--legado``): árvore com profundidade e
+ramificação máximas configuráveis, parte dos nós customizados e posições em
+leque ao redor do nó central.
+
+Tudo sai da semente: a mesma linha de comando gera os mesmos bytes, então um
+arquivo de benchmark ou de relato de bug pode ser recriado em vez de anexado.
+
+Uso::
+
+    python -m mindmap.synthetic catalogo catalogo_10k.csv --linhas 10000
+    python -m mindmap.synthetic mapa mapa_5k.json.gz --catalogo catalogo_10k.csv --nos 5000 --profundidade 5
+    python -m mindmap.synthetic mapa aws-mindmap-estado-teste.json --nos 200 --customizados 0.2 --legado
+"""
+import argparse
+import csv
+import math
+import random
+import sys
+from pathlib import Path
+
+from mindmap.catalog import read_catalog
+from mindmap.palette import CATEGORY_COLORS
+from mindmap.state_format import AWS_CENTER_ID, DEFAULT_CENTER, catalog_hash, encode_state, write_state_file
+
+DEFAULT_ROWS = 1000
+DEFAULT_NODES = 500
+DEFAULT_DEPTH = 4
+DEFAULT_FANOUT = 8
+DEFAULT_CUSTOM_RATIO = 0.05
+DEFAULT_SENTENCES = (2, 5)
+FIRST_RADIUS = 180
+LEVEL_RADIUS = 120
+VIEW_MARGIN = 100
+
+NOTE_CATEGORIES = ("Custom Notes", "Anotações", "Observações")
+SERVICE_CATEGORIES = tuple(c for c in CATEGORY_COLORS if c not in NOTE_CATEGORIES and c != "Outros")
+
+_PREFIXES = ("Amazon", "Amazon", "AWS")
+_NAME_WORDS = ("Athena", "Aurora", "Beacon", "Bridge", "Canvas", "Cascade", "Comet", "Compass", "Crest",
+               "Delta", "Echo", "Ember", "Falcon", "Fjord", "Forge", "Glacier", "Harbor", "Helix", "Horizon",
+               "Keystone", "Lattice", "Lumen", "Mesa", "Nimbus", "Nova", "Orbit", "Pulse", "Quarry", "Relay",
+               "Ridge", "Sentinel", "Signal", "Summit", "Tandem", "Tide", "Vault", "Vertex", "Vista", "Zenith")
+_NAME_SUFFIXES = ("", "", "", " Studio", " Connect", " Insights", " Manager", " Streams", " Lake", " Gateway")
+_SUBJECTS = ("Serviço gerenciado", "Plataforma totalmente gerenciada", "Ferramenta", "Solução sem servidor",
+             "Recurso de alta disponibilidade", "Mecanismo distribuído")
+_ACTIONS = ("para armazenar", "para processar", "para analisar", "para proteger", "para orquestrar",
+            "para migrar", "para monitorar", "para integrar", "para replicar", "para catalogar")
+_OBJECTS = ("dados em tempo real", "aplicações críticas", "cargas de trabalho híbridas", "eventos de segurança",
+            "registros de auditoria", "modelos de aprendizado de máquina", "filas de mensagens",
+            "arquivos e objetos", "identidades e permissões", "métricas de desempenho", "conteúdo estático",
+            "dispositivos conectados", "transações financeiras", "pipelines de integração contínua")
+_BENEFITS = ("Reduz custos operacionais com cobrança por uso.", "Escala automaticamente conforme a demanda.",
+             "Oferece criptografia em repouso e em trânsito.", "Integra-se nativamente a outros serviços da região.",
+             "Elimina a administração de servidores e atualizações.", "Garante replicação entre zonas de disponibilidade.",
+             "Permite configuração por console, CLI ou infraestrutura como código.",
+             "Inclui painéis de observação e alertas configuráveis.",
+             "Atende requisitos de conformidade e governança corporativa.",
+             "Suporta migração gradual sem interrupção das aplicações.")
+_NOTE_TITLES = ("Nota", "Observação", "Pendência", "Decisão", "Risco", "Ação")
+_NOTE_TEXTS = ("Validar com o time de arquitetura antes da próxima revisão.",
+               "Estimativa de custo mensal ainda não aprovada.", "Depende da migração do ambiente legado.",
+               "Revisar limites de serviço e cotas da conta.", "Responsável: equipe de plataforma.",
+               "Conferir requisitos de latência com o negócio.")
+
+
+def _description(rng, sentences):
+    parts = [f"{rng.choice(_SUBJECTS)} {rng.choice(_ACTIONS)} {rng.choice(_OBJECTS)}."]
+    parts.extend(rng.choice(_BENEFITS) for _ in range(rng.randint(*sentences) - 1))
+    return " ".join(parts)
+
+
+def catalog_records(rows, seed=0, sentences=DEFAULT_SENTENCES):
+    """Gera ``rows`` registros {Service, Category, Description} com nomes únicos."""
+    rng = random.Random(seed)
+    seen = set()
+    for _ in range(rows):
+        name = f"{rng.choice(_PREFIXES)} {rng.choice(_NAME_WORDS)}{rng.choice(_NAME_SUFFIXES)}"
+        if name in seen:
+            name = f"{name} {len(seen) + 1}"
+        seen.add(name)
+        yield {"Service": name, "Category": rng.choice(SERVICE_CATEGORIES), "Description": _description(rng, sentences)}
+
+
+def write_catalog(path, rows, seed=0, sentences=DEFAULT_SENTENCES):
+    """Grava um catálogo sintético no esquema do ``services.csv``; devolve o número de linhas."""
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Nome do Serviço", "Categoria", "Descrição"])
+        for record in catalog_records(rows, seed, sentences):
+            writer.writerow([record["Service"], record["Category"], record["Description"]])
+            count += 1
+    return count
+
+
+def tree_capacity(depth, fanout):
+    """Número máximo de nós (sem o central) de uma árvore com essa profundidade e ramificação."""
+    return sum(fanout ** level for level in range(1, depth + 1))
+
+
+def _level_sizes(nodes, depth, fanout, rng):
+    """Quantos nós vão em cada nível: sorteado, mas sempre deixando espaço para o restante."""
+    sizes = []
+    previous, remaining = 1, nodes
+    for level in range(1, depth + 1):
+        slots = previous * fanout
+        deeper = tree_capacity(depth - level, fanout)
+        # Menor quantidade neste nível que ainda comporta o restante nos níveis de baixo
+        needed = math.ceil(remaining / (1 + deeper))
+        size = min(remaining, slots, max(needed, round(slots * rng.uniform(0.5, 1.0))))
+        if size == 0:
+            break
+        sizes.append(size)
+        previous, remaining = size, remaining - size
+    return sizes
+
+
+def map_nodes(records, nodes=DEFAULT_NODES, depth=DEFAULT_DEPTH, fanout=DEFAULT_FANOUT,
+              custom_ratio=DEFAULT_CUSTOM_RATIO, seed=0):
+    """Nós de um mapa sintético (formato legado, com o nó central primeiro).
+
+    Os nós de serviço são sorteados de ``records`` sem repetição (o id é o nome).
+    """
+    if depth < 1 or fanout < 1:
+        raise ValueError("Profundidade e ramificação devem ser pelo menos 1")
+    if nodes > tree_capacity(depth, fanout):
+        raise ValueError(f"{nodes} nós não cabem numa árvore de profundidade {depth} e ramificação {fanout} "
+                         f"(máximo {tree_capacity(depth, fanout)})")
+    records = list(records)
+    custom_count = round(nodes * custom_ratio)
+    if nodes - custom_count > len(records):
+        raise ValueError(f"O catálogo tem só {len(records)} serviços para {nodes - custom_count} nós de serviço")
+    rng = random.Random(seed)
+    services = rng.sample(records, nodes - custom_count)
+    kinds = [True] * custom_count + [False] * len(services)
+    rng.shuffle(kinds)
+
+    cx, cy = DEFAULT_CENTER
+    result = [{"id": AWS_CENTER_ID, "name": "AWS", "category": "Central", "description": "Amazon Web Services",
+               "x": cx, "y": cy, "parentId": None, "isCentral": True}]
+    # (id, ângulo inicial, largura do leque) de cada pai do nível anterior
+    parents = [(AWS_CENTER_ID, 0.0, 2 * math.pi)]
+    services, kinds = iter(services), iter(kinds)
+    custom_index = 0
+    for level, size in enumerate(_level_sizes(nodes, depth, fanout, rng), start=1):
+        chosen = sorted(rng.sample(range(len(parents) * fanout), size))
+        children_of = {}
+        for slot in chosen:
+            children_of.setdefault(slot // fanout, []).append(slot)
+        radius = FIRST_RADIUS + LEVEL_RADIUS * (level - 1)
+        next_parents = []
+        for index, slots in children_of.items():
+            parent_id, start, width = parents[index]
+            step = width / len(slots)
+            for position in range(len(slots)):
+                angle = start + step * (position + 0.5)
+                x, y = round(cx + math.cos(angle) * radius, 1), round(cy + math.sin(angle) * radius, 1)
+                if next(kinds):
+                    custom_index += 1
+                    name = f"{rng.choice(_NOTE_TITLES)} {custom_index}"
+                    result.append({"id": name, "name": name, "category": rng.choice(NOTE_CATEGORIES),
+                                   "description": rng.choice(_NOTE_TEXTS), "x": x, "y": y, "parentId": parent_id,
+                                   "isCentral": False, "isCustom": True})
+                else:
+                    record = next(services)
+                    result.append({"id": record["Service"], "name": record["Service"],
+                                   "category": record["Category"], "description": record["Description"],
+                                   "x": x, "y": y, "parentId": parent_id, "isCentral": False, "isCustom": False})
+                next_parents.append((result[-1]["id"], start + step * position, step))
+        parents = next_parents
+    return result
+
+
+def view_box_for(nodes):
+    xs = [node["x"] for node in nodes]
+    ys = [node["y"] for node in nodes]
+    return {"x": min(xs) - VIEW_MARGIN, "y": min(ys) - VIEW_MARGIN,
+            "width": max(xs) - min(xs) + 2 * VIEW_MARGIN, "height": max(ys) - min(ys) + 2 * VIEW_MARGIN}
+
+
+def generate_state(records, nodes=DEFAULT_NODES, depth=DEFAULT_DEPTH, fanout=DEFAULT_FANOUT,
+                   custom_ratio=DEFAULT_CUSTOM_RATIO, seed=0, catalog_name="services.csv", legacy=False):
+    """Estado de um mapa sintético, no formato compacto (ou legado com ``legacy``)."""
+    records = list(records)
+    generated = map_nodes(records, nodes, depth, fanout, custom_ratio, seed)
+    view_box = view_box_for(generated)
+    if legacy:
+        return {"nodes": generated, "viewBox": view_box}
+    return encode_state(generated, view_box, catalog_name, catalog_hash(records))
+
+
+def _compression_for(path):
+    name = Path(path).name
+    if name.endswith(".gz"):
+        return "gzip"
+    if name.endswith(".deflate"):
+        return "deflate"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera catálogos e mapas salvos sintéticos e reproduzíveis.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    catalog_cmd = sub.add_parser("catalogo", help="Gera um CSV no esquema do services.csv.")
+    catalog_cmd.add_argument("saida", type=Path)
+    catalog_cmd.add_argument("--linhas", type=int, default=DEFAULT_ROWS)
+    catalog_cmd.add_argument("--frases", type=int, nargs=2, default=list(DEFAULT_SENTENCES), metavar=("MIN", "MAX"),
+                             help="Frases por descrição.")
+    catalog_cmd.add_argument("--semente", type=int, default=0)
+
+    map_cmd = sub.add_parser("mapa", help="Gera um mapa salvo (.json, .json.gz ou .json.deflate).")
+    map_cmd.add_argument("saida", type=Path)
+    map_cmd.add_argument("--catalogo", type=Path, default=Path("services.csv"))
+    map_cmd.add_argument("--nos", type=int, default=DEFAULT_NODES, help="Nós além do central.")
+    map_cmd.add_argument("--profundidade", type=int, default=DEFAULT_DEPTH)
+    map_cmd.add_argument("--ramificacao", type=int, default=DEFAULT_FANOUT, help="Máximo de filhos por nó.")
+    map_cmd.add_argument("--customizados", type=float, default=DEFAULT_CUSTOM_RATIO,
+                         help="Fração de nós customizados (0 a 1).")
+    map_cmd.add_argument("--semente", type=int, default=0)
+    map_cmd.add_argument("--legado", action="store_true", help="Formato legado, com os dados em cada nó.")
+    args = parser.parse_args(argv)
+
+    if args.comando == "catalogo":
+        count = write_catalog(args.saida, args.linhas, args.semente, tuple(args.frases))
+        print(f"{args.saida}: {count} serviço(s)")
+        return 0
+
+    if not 0 <= args.customizados <= 1:
+        parser.error("--customizados deve estar entre 0 e 1")
+    try:
+        state = generate_state(read_catalog(args.catalogo), args.nos, args.profundidade, args.ramificacao,
+                               args.customizados, args.semente, args.catalogo.name, args.legado)
+    except (ValueError, OSError) as e:
+        print(f"{args.saida}: {e}", file=sys.stderr)
+        return 1
+    write_state_file(args.saida, state, _compression_for(args.saida))
+    print(f"{args.saida}: {args.nos} nó(s), profundidade até {args.profundidade}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
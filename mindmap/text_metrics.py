@@ -0,0 +1,166 @@
+"""Tabela de avanços de glifos para medir rótulos sem tocar no DOM.
+
+Os rótulos dos nós usam Arial/Helvetica (métricas idênticas às da Helvetica
+padrão do PDF), então a largura calculada aqui coincide com a renderizada
+pelo navegador. A mesma tabela é enviada ao JS para medir nós customizados
+e é reutilizada pelos exportadores do lado do servidor.
+"""
+import math
+import unicodedata
+from functools import lru_cache
+
+UNITS_PER_EM = 1000
+DEFAULT_ADVANCE = 556
+WIDE_ADVANCE = 1000
+
+LABEL_FONT_FAMILY = "Arial, Helvetica, 'Liberation Sans', sans-serif"
+LABEL_FONT = "Helvetica-Bold"
+LABEL_FONT_SIZE = 13
+LABEL_FONT_WEIGHT = 600
+
+# Geometria dos nós de serviço (mesmos valores usados em renderNode)
+NODE_MIN_WIDTH = 100
+NODE_MAX_WIDTH = 350
+NODE_PADDING = 20
+ELLIPSIS = "..."
+
+# Faixas de caracteres largos (CJK, Hangul, formas de largura total); o JS usa as mesmas
+WIDE_RANGES = (
+    (0x1100, 0x115F), (0x2E80, 0xA4CF), (0xAC00, 0xD7A3),
+    (0xF900, 0xFAFF), (0xFE30, 0xFE4F), (0xFF00, 0xFF60), (0xFFE0, 0xFFE6),
+)
+
+# Avanço (1/1000 em) -> caracteres com esse avanço
+_HELVETICA_BOLD_GROUPS = {
+    238: "'",
+    278: ' ,./I\\ijl\xa0·ÌÍÎÏìíîï‘’',
+    280: '|¦',
+    333: '!()-:;[]`ft¡¨\xad¯²³´¸¹',
+    350: '•',
+    365: 'º',
+    370: 'ª',
+    389: '*r{}',
+    400: '°',
+    474: '"',
+    500: 'z“”',
+    556: '#$0123456789J_aceksvxy¢£¤¥§«¶»àáâãäåçèéêëýÿ–€',
+    584: '+<=>^~¬±×÷',
+    611: '?FLTZbdghnopquµ¿ßðñòóôõöøùúûüþ',
+    667: 'EPSVXYÈÉÊËÝÞ',
+    722: '&ABCDHKNRUÀÁÂÃÄÅÇÐÑÙÚÛÜ',
+    737: '©®',
+    778: 'GOQwÒÓÔÕÖØ',
+    833: 'M',
+    834: '¼½¾',
+    889: '%mæ',
+    944: 'W',
+    975: '@',
+    1000: 'Æ—…',
+}
+
+_HELVETICA_GROUPS = {
+    191: "'",
+    222: 'ijl‘’',
+    260: '|¦',
+    278: ' !,./:;I[\\]ft\xa0·ÌÍÎÏìíîï',
+    333: '()-`r¡¨\xad¯²³´¸¹“”',
+    334: '{}',
+    350: '•',
+    355: '"',
+    365: 'º',
+    370: 'ª',
+    389: '*',
+    400: '°',
+    469: '^',
+    500: 'Jcksvxyzçýÿ',
+    537: '¶',
+    556: '#$0123456789?L_abdeghnopqu¢£¤¥§«µ»àáâãäåèéêëðñòóôõöùúûüþ–€',
+    584: '+<=>~¬±×÷',
+    611: 'FTZ¿ßø',
+    667: '&ABEKPSVXYÀÁÂÃÄÅÈÉÊËÝÞ',
+    722: 'CDHNRUwÇÐÑÙÚÛÜ',
+    737: '©®',
+    778: 'GOQÒÓÔÕÖØ',
+    833: 'Mm',
+    834: '¼½¾',
+    889: '%æ',
+    944: 'W',
+    1000: 'Æ—…',
+    1015: '@',
+}
+
+
+def _expand(groups):
+    return {ch: advance for advance, chars in groups.items() for ch in chars}
+
+
+FONT_ADVANCES = {
+    "Helvetica-Bold": _expand(_HELVETICA_BOLD_GROUPS),
+    "Helvetica": _expand(_HELVETICA_GROUPS),
+}
+
+
+@lru_cache(maxsize=4096)
+def char_advance(ch, font=LABEL_FONT):
+    """Avanço do caractere em unidades de 1/1000 em (usa a letra base para acentos fora da tabela)."""
+    advances = FONT_ADVANCES[font]
+    if ch in advances:
+        return advances[ch]
+    base = unicodedata.normalize("NFD", ch)[:1]
+    if base in advances:
+        return advances[base]
+    code = ord(ch)
+    if any(start <= code <= end for start, end in WIDE_RANGES):
+        return WIDE_ADVANCE
+    return DEFAULT_ADVANCE
+
+
+@lru_cache(maxsize=16384)
+def text_width(text, size=LABEL_FONT_SIZE, font=LABEL_FONT):
+    """Largura do texto em pixels (ou pontos) para o tamanho de fonte informado."""
+    width = 0
+    for ch in text:
+        width += char_advance(ch, font) * size / UNITS_PER_EM
+    return width
+
+
+def truncate_to_width(text, max_width, size=LABEL_FONT_SIZE, font=LABEL_FONT):
+    """Corta o texto com reticências para caber em ``max_width``."""
+    if text_width(text, size, font) <= max_width:
+        return text
+    available = max_width - text_width(ELLIPSIS, size, font)
+    width = 0
+    cut = 0
+    for i, ch in enumerate(text):
+        width += char_advance(ch, font) * size / UNITS_PER_EM
+        if width > available:
+            break
+        cut = i + 1
+    return text[:cut].rstrip() + ELLIPSIS
+
+
+@lru_cache(maxsize=16384)
+def layout_node_label(name):
+    """Retorna (largura do retângulo, texto exibido) de um nó de serviço."""
+    ideal_width = math.ceil(text_width(name) + NODE_PADDING)
+    rect_width = min(max(NODE_MIN_WIDTH, ideal_width), NODE_MAX_WIDTH)
+    return rect_width, truncate_to_width(name, rect_width - NODE_PADDING)
+
+
+def metrics_table_for_js(font=LABEL_FONT):
+    """Tabela compacta enviada ao navegador para medir nós customizados."""
+    groups = _HELVETICA_BOLD_GROUPS if font == "Helvetica-Bold" else _HELVETICA_GROUPS
+    return {
+        "font": font,
+        "family": LABEL_FONT_FAMILY,
+        "size": LABEL_FONT_SIZE,
+        "weight": LABEL_FONT_WEIGHT,
+        "unitsPerEm": UNITS_PER_EM,
+        "defaultAdvance": DEFAULT_ADVANCE,
+        "wideAdvance": WIDE_ADVANCE,
+        "minWidth": NODE_MIN_WIDTH,
+        "maxWidth": NODE_MAX_WIDTH,
+        "padding": NODE_PADDING,
+        "wideRanges": [list(r) for r in WIDE_RANGES],
+        "groups": {str(advance): chars for advance, chars in groups.items()},
+    }
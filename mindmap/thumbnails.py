@@ -0,0 +1,161 @@
+"""Miniaturas SVG de mapas salvos, com cache LRU em disco.
+
+A miniatura é desenhada no servidor só com posições e cores de categoria (sem
+navegador nem texto). O cache é indexado pelo hash do conteúdo do arquivo,
+junto com o hash do catálogo (de onde vêm as categorias das referências) e a
+versão do renderizador: um mapa que não mudou nunca é redesenhado. Ao passar
+do limite de tamanho, as miniaturas usadas há mais tempo são apagadas.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from mindmap.palette import CENTER_COLOR, EDGE_COLOR, NODE_STROKE_COLOR, category_color
+from mindmap.paths import data_dir
+from mindmap.state_format import AWS_CENTER_ID, read_state_file
+from mindmap.text_metrics import layout_node_label
+
+RENDERER_VERSION = 1
+THUMB_WIDTH = 240
+THUMB_HEIGHT = 150
+NODE_HEIGHT = 40
+CENTER_RADIUS = 40
+PADDING = 30
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+def _number(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _fmt(value):
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def render_thumbnail_svg(nodes, width=THUMB_WIDTH, height=THUMB_HEIGHT):
+    """Desenha os nós (formato legado) num SVG pequeno, enquadrando o mapa inteiro."""
+    boxes = []
+    positions = {}
+    for node in nodes:
+        x, y = _number(node.get("x")), _number(node.get("y"))
+        positions[node.get("id")] = (x, y)
+        if node.get("isCentral") or node.get("id") == AWS_CENTER_ID:
+            boxes.append((node, x, y, CENTER_RADIUS * 2, CENTER_RADIUS * 2))
+        else:
+            boxes.append((node, x, y, layout_node_label(str(node.get("name", node.get("id", ""))))[0], NODE_HEIGHT))
+    if not boxes:
+        boxes.append(({"isCentral": True}, 0.0, 0.0, CENTER_RADIUS * 2, CENTER_RADIUS * 2))
+
+    min_x = min(x - w / 2 for _, x, _, w, _ in boxes) - PADDING
+    max_x = max(x + w / 2 for _, x, _, w, _ in boxes) + PADDING
+    min_y = min(y - h / 2 for _, _, y, _, h in boxes) - PADDING
+    max_y = max(y + h / 2 for _, _, y, _, h in boxes) + PADDING
+    # Traços com largura fixa na tela, qualquer que seja a escala do mapa
+    stroke = max(max_x - min_x, max_y - min_y) / width
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="{_fmt(min_x)} {_fmt(min_y)} {_fmt(max_x - min_x)} {_fmt(max_y - min_y)}">',
+        f'<rect x="{_fmt(min_x)}" y="{_fmt(min_y)}" width="{_fmt(max_x - min_x)}" height="{_fmt(max_y - min_y)}" fill="#f8f9fa"/>',
+        f'<g stroke="{EDGE_COLOR}" stroke-width="{_fmt(stroke * 1.2)}">',
+    ]
+    for node, x, y, _, _ in boxes:
+        parent = positions.get(node.get("parentId"))
+        if parent is not None and node.get("parentId") != node.get("id"):
+            parts.append(f'<line x1="{_fmt(parent[0])}" y1="{_fmt(parent[1])}" x2="{_fmt(x)}" y2="{_fmt(y)}"/>')
+    parts.append(f'</g><g stroke="{NODE_STROKE_COLOR}" stroke-width="{_fmt(stroke * 0.6)}">')
+    for node, x, y, w, h in boxes:
+        if node.get("isCentral") or node.get("id") == AWS_CENTER_ID:
+            parts.append(f'<circle cx="{_fmt(x)}" cy="{_fmt(y)}" r="{CENTER_RADIUS}" fill="{CENTER_COLOR}"/>')
+        else:
+            parts.append(f'<rect x="{_fmt(x - w / 2)}" y="{_fmt(y - h / 2)}" width="{_fmt(w)}" height="{h}" rx="6" '
+                         f'fill="{category_color(node.get("category"))}"/>')
+    parts.append("</g></svg>")
+    return "".join(parts)
+
+
+class ThumbnailCache:
+    """Cache LRU de miniaturas em disco (``<chave>.svg``), limitado em bytes."""
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root) if root else data_dir("thumbnails")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._digests = {}  # caminho -> (tamanho, mtime_ns, sha256): arquivo inalterado não é relido
+        # Do menos para o mais recente; a ordem sobrevive a reinícios pelo mtime dos arquivos
+        self._entries = OrderedDict()
+        for path in sorted(self.root.glob("*.svg"), key=lambda p: p.stat().st_mtime_ns):
+            self._entries[path.stem] = path.stat().st_size
+        self._total = sum(self._entries.values())
+        self._evict()
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def file_digest(self, path):
+        path = Path(path)
+        stat = path.stat()
+        cached = self._digests.get(str(path))
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._digests[str(path)] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def key_for(self, path, catalog_digest=""):
+        return f"{self.file_digest(path)[:32]}-{catalog_digest or 'sem-catalogo'}-v{RENDERER_VERSION}"
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            path = self.root / f"{key}.svg"
+            try:
+                os.utime(path)
+                return path.read_text(encoding="utf-8")
+            except OSError:
+                self._total -= self._entries.pop(key)
+                return None
+
+    def put(self, key, svg):
+        data = svg.encode("utf-8")
+        path = self.root / f"{key}.svg"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                (self.root / f"{key}.svg").unlink()
+            except FileNotFoundError:
+                pass
+
+    def thumbnail_for(self, path, catalog_by_name, catalog_digest=""):
+        """Miniatura SVG de um mapa salvo, gerada só quando o conteúdo (ou o catálogo) mudou."""
+        key = self.key_for(path, catalog_digest)
+        svg = self.get(key)
+        if svg is not None:
+            self.hits += 1
+            return svg
+        self.misses += 1
+        state = read_state_file(path, catalog_by_name)
+        svg = render_thumbnail_svg(state.get("nodes", []) if isinstance(state, dict) else [])
+        self.put(key, svg)
+        return svg
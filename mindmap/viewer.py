@@ -0,0 +1,173 @@
+"""Modo visualização: um mapa salvo pré-renderizado como página estática.
+
+Quem só olha o mapa (aula, link compartilhado) não precisa do editor: nada de
+catálogo inteiro, bibliotecas de PDF ou ligação de eventos. O servidor desenha
+o mapa em SVG com as mesmas cores, tamanhos de rótulo e setas do editor; a
+página leva só os dados dos tooltips (nome, categoria, descrição, na ordem dos
+nós) e um script pequeno de pan/zoom.
+"""
+import html
+import json
+
+from mindmap.palette import ACCENT_COLOR, CENTER_COLOR, EDGE_COLOR, NODE_STROKE_COLOR, category_color
+from mindmap.state_format import AWS_CENTER_ID
+from mindmap.text_metrics import LABEL_FONT_FAMILY, LABEL_FONT_SIZE, LABEL_FONT_WEIGHT, layout_node_label
+
+NODE_HEIGHT = 40
+CENTER_RADIUS = 40
+PADDING = 80
+DEFAULT_CENTER_SVG = (f'<text x="0" y="8" text-anchor="middle" fill="{CENTER_COLOR}" '
+                      'font-size="24" font-weight="bold">AWS</text>')
+
+_STYLE = f"""
+html, body {{ margin: 0; height: 100%; background: #f8f9fa; font-family: {LABEL_FONT_FAMILY}; overflow: hidden; }}
+svg {{ width: 100%; height: 100%; display: block; touch-action: none; cursor: grab; }}
+svg.panning {{ cursor: grabbing; }}
+.n {{ cursor: pointer; }}
+#t {{ position: absolute; display: none; background: rgba(35, 47, 62, 0.95); color: white; padding: 10px 15px;
+      border-radius: 6px; font-size: 13px; pointer-events: none; max-width: 320px; line-height: 1.5;
+      border: 1px solid {ACCENT_COLOR}; box-shadow: 0 3px 8px rgba(0,0,0,0.2); }}
+#t b {{ display: block; color: {ACCENT_COLOR}; margin-bottom: 8px; }}
+#h {{ position: absolute; right: 10px; bottom: 8px; font-size: 12px; color: #6c757d; }}
+"""
+
+# Pan com arrastar, zoom com a roda (ou +/-), duplo clique volta ao enquadramento inicial
+_SCRIPT = """
+(() => {
+const svg = document.getElementById('m'), tip = document.getElementById('t');
+const data = JSON.parse(document.getElementById('d').textContent);
+const home = svg.getAttribute('viewBox').split(' ').map(Number);
+let vb = home.slice(), drag = null;
+const apply = () => svg.setAttribute('viewBox', vb.join(' '));
+const toMap = (cx, cy) => {
+  const r = svg.getBoundingClientRect(), s = Math.max(vb[2] / r.width, vb[3] / r.height);
+  return [vb[0] + vb[2] / 2 + (cx - r.left - r.width / 2) * s, vb[1] + vb[3] / 2 + (cy - r.top - r.height / 2) * s];
+};
+const zoom = (f, cx, cy) => {
+  const w = vb[2] * f;
+  if (w < home[2] / 20 || w > home[2] * 20) return;
+  const [px, py] = toMap(cx, cy);
+  vb = [px - (px - vb[0]) * f, py - (py - vb[1]) * f, w, vb[3] * f];
+  apply();
+};
+svg.addEventListener('wheel', e => { e.preventDefault(); zoom(e.deltaY > 0 ? 1.1 : 1 / 1.1, e.clientX, e.clientY); }, { passive: false });
+svg.addEventListener('pointerdown', e => { drag = [e.clientX, e.clientY]; svg.setPointerCapture(e.pointerId); svg.classList.add('panning'); });
+svg.addEventListener('pointermove', e => {
+  if (!drag) return;
+  const [x0, y0] = toMap(drag[0], drag[1]), [x1, y1] = toMap(e.clientX, e.clientY);
+  vb[0] -= x1 - x0; vb[1] -= y1 - y0; drag = [e.clientX, e.clientY];
+  apply();
+});
+const stop = () => { drag = null; svg.classList.remove('panning'); };
+svg.addEventListener('pointerup', stop);
+svg.addEventListener('pointercancel', stop);
+svg.addEventListener('dblclick', () => { vb = home.slice(); apply(); });
+addEventListener('keydown', e => {
+  const r = svg.getBoundingClientRect();
+  if (e.key === '+' || e.key === '=') zoom(1 / 1.2, r.left + r.width / 2, r.top + r.height / 2);
+  if (e.key === '-') zoom(1.2, r.left + r.width / 2, r.top + r.height / 2);
+});
+svg.addEventListener('mouseover', e => {
+  const g = e.target.closest('.n');
+  if (!g) return;
+  const [name, category, description] = data[+g.dataset.i];
+  tip.textContent = '';
+  const b = document.createElement('b');
+  b.textContent = name;
+  tip.append(b, `Categoria: ${category}`, document.createElement('br'), `Descrição: ${description || 'N/A'}`);
+  tip.style.display = 'block';
+});
+svg.addEventListener('mouseout', e => { if (e.target.closest('.n')) tip.style.display = 'none'; });
+svg.addEventListener('mousemove', e => { tip.style.left = (e.pageX + 15) + 'px'; tip.style.top = (e.pageY - 10) + 'px'; });
+})();
+"""
+
+
+def _number(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _fmt(value):
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def _is_center(node):
+    return bool(node.get("isCentral")) or node.get("id") == AWS_CENTER_ID
+
+
+def render_viewer_svg(nodes, center_svg=DEFAULT_CENTER_SVG):
+    """Desenha os nós (formato legado) em SVG; devolve ``(svg, dados_dos_tooltips)``."""
+    placed = {}
+    for node in nodes:
+        x, y = _number(node.get("x")), _number(node.get("y"))
+        if _is_center(node):
+            placed[node.get("id")] = (node, x, y, CENTER_RADIUS * 2, None, CENTER_RADIUS)
+        else:
+            name = str(node.get("name", node.get("id", "")))
+            width, text = layout_node_label(name)
+            # Mesmo recuo das setas do editor (renderEdge)
+            placed[node.get("id")] = (node, x, y, width, text, width / 2.2)
+    if not placed:
+        placed[AWS_CENTER_ID] = ({"id": AWS_CENTER_ID, "isCentral": True}, 0.0, 0.0, CENTER_RADIUS * 2, None, CENTER_RADIUS)
+
+    boxes = list(placed.values())
+    min_x = min(x - w / 2 for _, x, _, w, _, _ in boxes) - PADDING
+    max_x = max(x + w / 2 for _, x, _, w, _, _ in boxes) + PADDING
+    min_y = min(y for _, _, y, _, _, _ in boxes) - NODE_HEIGHT / 2 - PADDING
+    max_y = max(y for _, _, y, _, _, _ in boxes) + NODE_HEIGHT / 2 + PADDING
+
+    parts = [
+        f'<svg id="m" xmlns="http://www.w3.org/2000/svg" '
+        f'viewBox="{_fmt(min_x)} {_fmt(min_y)} {_fmt(max_x - min_x)} {_fmt(max_y - min_y)}">',
+        '<defs><filter id="s" x="-50%" y="-50%" width="200%" height="200%">'
+        '<feDropShadow dx="2" dy="2" stdDeviation="3" flood-color="#000" flood-opacity="0.2"/></filter>'
+        f'<marker id="a" markerWidth="10" markerHeight="7" refX="9" refY="3.5" orient="auto" fill="{EDGE_COLOR}">'
+        '<polygon points="0 0, 10 3.5, 0 7"/></marker></defs>',
+        f'<g stroke="{EDGE_COLOR}" stroke-width="2" marker-end="url(#a)">',
+    ]
+    for node, x, y, _, _, radius in boxes:
+        parent = placed.get(node.get("parentId"))
+        if parent is None or parent[0] is node:
+            continue
+        _, px, py, _, _, parent_radius = parent
+        dx, dy = x - px, y - py
+        dist = (dx * dx + dy * dy) ** 0.5
+        if dist < parent_radius + radius or dist < 10:
+            continue
+        parts.append(f'<line x1="{_fmt(px + dx * parent_radius / dist)}" y1="{_fmt(py + dy * parent_radius / dist)}" '
+                     f'x2="{_fmt(x - dx * radius / dist)}" y2="{_fmt(y - dy * radius / dist)}"/>')
+    parts.append(f'</g><g font-family="{html.escape(LABEL_FONT_FAMILY)}" font-size="{LABEL_FONT_SIZE}px" '
+                 f'font-weight="{LABEL_FONT_WEIGHT}" text-anchor="middle" fill="white">')
+
+    tooltips = []
+    for node, x, y, width, text, _ in boxes:
+        transform = f'translate({_fmt(x)},{_fmt(y)})'
+        tooltips.append([str(node.get("name", node.get("id", "AWS"))), str(node.get("category", "")),
+                         str(node.get("description", ""))])
+        index = len(tooltips) - 1
+        if text is None:
+            parts.append(f'<g class="n" data-i="{index}" transform="{transform}">{center_svg}</g>')
+            continue
+        parts.append(
+            f'<g class="n" data-i="{index}" transform="{transform}">'
+            f'<rect x="{_fmt(-width / 2)}" y="{-NODE_HEIGHT // 2}" width="{_fmt(width)}" height="{NODE_HEIGHT}" '
+            f'rx="6" fill="{category_color(node.get("category"))}" stroke="{NODE_STROKE_COLOR}" '
+            f'stroke-width="1.5" filter="url(#s)"/><text y="5">{html.escape(text)}</text></g>')
+    parts.append("</g></svg>")
+    return "".join(parts), tooltips
+
+
+def render_viewer_html(nodes, title="AWS MindMap pro", center_svg=DEFAULT_CENTER_SVG):
+    """Página completa (sem dependências externas) do modo visualização."""
+    svg, tooltips = render_viewer_svg(nodes, center_svg)
+    data = json.dumps(tooltips, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="UTF-8">'
+        '<meta name="viewport" content="width=device-width, initial-scale=1.0">'
+        f'<title>{html.escape(title)}</title><style>{_STYLE}</style></head><body>'
+        f'{svg}<div id="t"></div><div id="h">Arraste para mover · roda ou +/- para zoom · duplo clique centraliza</div>'
+        f'<script type="application/json" id="d">{data}</script><script>{_SCRIPT}</script></body></html>'
+    )
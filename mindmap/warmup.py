@@ -0,0 +1,124 @@
+"""Aquecimento do processo: deixa pronto o que a primeira visita pagaria.
+
+Catálogo, índice de busca, relações, logo, servidores auxiliares e a página do
+mapa (com a medição dos rótulos) ficam nos caches do Streamlit, que valem para
+o processo inteiro. O aquecimento executa o ``app.py`` uma vez, sem sessão, com
+``MINDMAP_WARMUP`` definido: o script chama :func:`warm_up` com os seus passos
+em vez de desenhar a página. Como o script roda como ``__main__`` (igual ao
+Streamlit), as chaves de cache são as mesmas das visitas reais.
+
+O relatório (:data:`REPORT`) guarda o tempo de cada passo e serve de sinal de
+prontidão: ``GET /prontidao`` responde 503 até o fim do aquecimento e 200 depois.
+Se o próprio script falhar, a resposta continua 503, com ``pronto: false`` e o
+erro; falhas de um passo isolado ficam só no relatório.
+"""
+import logging
+import threading
+import time
+import types
+from contextlib import contextmanager
+from pathlib import Path
+
+# Avisos de "missing ScriptRunContext" são esperados enquanto o script roda sem sessão
+_BARE_MODE_LOGGERS = ("streamlit.runtime.scriptrunner_utils.script_run_context",
+                      "streamlit.runtime.caching.cache_data_api",
+                      "streamlit.runtime.state.session_state_proxy")
+
+
+class WarmupReport:
+    """Passos do aquecimento (nome, segundos, erro), o evento de fim e o erro que o interrompeu."""
+
+    def __init__(self):
+        self.steps = []
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name):
+        """Mede um passo; uma falha é registrada e não interrompe os demais."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        self.record(name, time.perf_counter() - start, error)
+
+    def record(self, name, seconds, error=None):
+        with self._lock:
+            self.steps.append({"nome": name, "segundos": round(seconds, 4), "erro": error})
+
+    def fail(self, seconds, exc):
+        """Registra a falha que interrompeu o aquecimento e o encerra (sem ficar pronto)."""
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.record("script", seconds, self.error)
+        if self.finished_at is None:
+            self.finished_at = time.time()
+        if self.started_at is None:
+            self.started_at = self.finished_at - seconds
+        self.ready.set()
+
+    @property
+    def ok(self):
+        return self.ready.is_set() and self.error is None
+
+    def as_dict(self):
+        with self._lock:
+            steps = list(self.steps)
+        total = None
+        if self.started_at is not None:
+            total = round((self.finished_at or time.time()) - self.started_at, 4)
+        return {"pronto": self.ok, "erro": self.error, "iniciado_em": self.started_at,
+                "concluido_em": self.finished_at, "segundos": total, "passos": steps}
+
+
+REPORT = WarmupReport()
+
+
+def warm_up(steps, report=REPORT):
+    """Roda ``steps(report)`` uma única vez por processo; chamadas concorrentes esperam a primeira."""
+    if report.ready.is_set():
+        return report
+    with report._run_lock:
+        if not report.ready.is_set():
+            report.started_at = time.time()
+            try:
+                steps(report)
+            finally:
+                report.finished_at = time.time()
+                report.ready.set()
+                print(f"[warmup] pronto em {report.finished_at - report.started_at:.2f}s: "
+                      + ", ".join(f"{s['nome']} {s['segundos']:.3f}s" for s in report.steps))
+    return report
+
+
+def warm_up_script(script_path="app.py"):
+    """Executa o script do app em modo de aquecimento (sem sessão do Streamlit)."""
+    path = Path(script_path).resolve()
+    module = types.ModuleType("__main__")
+    module.__file__ = str(path)
+    module.MINDMAP_WARMUP = True
+    code = compile(path.read_text(encoding="utf-8"), str(path), "exec")
+    loggers = [logging.getLogger(name) for name in _BARE_MODE_LOGGERS]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.ERROR)
+    start = time.perf_counter()
+    try:
+        exec(code, module.__dict__)
+    except Exception as exc:
+        # O app pode até atender, mas sem os caches prontos: a prontidão fica em 503
+        REPORT.fail(time.perf_counter() - start, exc)
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+    return REPORT
+
+
+def readiness_payload(report=REPORT):
+    """``(status, payload)`` da rota de prontidão: 200 depois de aquecer, 503 enquanto aquece ou se falhou."""
+    return (200 if report.ok else 503), report.as_dict()
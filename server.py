@@ -0,0 +1,35 @@
+"""Entrada ASGI do app com aquecimento na subida do processo.
+
+    streamlit run server.py        # ou: uvicorn server:app --port 8501
+
+O ``app.py`` continua sendo o script do Streamlit; aqui só se acrescenta o
+aquecimento (``mindmap/warmup.py``), que roda numa thread logo que o servidor
+sobe, e a rota ``GET /prontidao`` (503 enquanto aquece ou se o aquecimento
+falhou, 200 com o tempo de cada passo depois), para o balanceador só mandar
+tráfego a um processo já quente.
+"""
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import streamlit as st
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from mindmap.warmup import readiness_payload, warm_up_script
+
+SCRIPT_PATH = Path(__file__).with_name("app.py")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    threading.Thread(target=warm_up_script, args=(SCRIPT_PATH,), name="mindmap-warmup", daemon=True).start()
+    yield
+
+
+async def readiness(request):
+    status, payload = readiness_payload()
+    return JSONResponse(payload, status_code=status, headers={"Cache-Control": "no-store"})
+
+
+app = st.App(SCRIPT_PATH, lifespan=lifespan, routes=[Route("/prontidao", readiness)])
@@ -0,0 +1,61 @@
+"""Log de deltas do salvamento automático (``mindmap.autosave``)."""
+import json
+
+import pytest
+
+from mindmap.autosave import AutosaveStore, apply_ops, empty_state
+from mindmap.state_format import AWS_CENTER_ID
+
+MAP_ID = "mapa-de-teste"
+GOOD_OPS = [
+    {"op": "catalog", "catalog": {"name": "services.csv", "hash": "abc"}},
+    {"op": "add", "ref": ["Amazon S3", 900, 380.5, AWS_CENTER_ID]},
+    {"op": "add", "node": {"id": "custom_1", "name": "Minha API", "x": 950, "y": 450, "parentId": "Amazon S3"}},
+    {"op": "move", "id": "Amazon S3", "x": 910, "y": 390},
+    {"op": "reparent", "id": "custom_1", "parentId": AWS_CENTER_ID},
+    {"op": "view", "viewBox": [0, 0, 1600, 800]},
+]
+
+
+@pytest.mark.parametrize("bad_op", [
+    {"op": "add", "ref": ["x", 1]},
+    {"op": "add", "ref": [7, 1, 2, None]},
+    {"op": "add", "ref": ["x", "1", 2, None]},
+    {"op": "add", "node": {"id": "c", "x": 1}},
+    {"op": "move", "id": 5, "x": 1, "y": 2},
+    {"op": "move", "id": "Amazon S3", "x": float("inf"), "y": 2},
+    {"op": "reparent", "id": "Amazon S3", "parentId": 3},
+    {"op": "reset", "state": {"refs": [["x"]]}},
+    {"op": "view", "viewBox": [0, 0, 1]},
+    {"op": "explodir"},
+])
+def test_malformed_op_is_rejected_before_storing(tmp_path, bad_op):
+    store = AutosaveStore(tmp_path / "autosave.sqlite3")
+    store.append(MAP_ID, GOOD_OPS)
+    with pytest.raises(ValueError):
+        store.append(MAP_ID, [{"op": "remove", "id": "custom_1"}, bad_op])
+    assert store.last_seq(MAP_ID) == 1
+    state, _ = store.restore(MAP_ID)
+    assert state["refs"] == [["Amazon S3", 910, 390, AWS_CENTER_ID]]
+    assert store.append(MAP_ID, [{"op": "remove", "id": "custom_1"}]) == 2
+    assert store.compact(MAP_ID)
+
+
+def test_apply_ops_skips_malformed_stored_ops(tmp_path):
+    store = AutosaveStore(tmp_path / "autosave.sqlite3")
+    store.append(MAP_ID, GOOD_OPS)
+    # Delta gravado por uma versão antiga, sem a verificação
+    store._conn.execute("INSERT INTO deltas (map_id, seq, ops, created_at) VALUES (?, 2, ?, 0)",
+                        (MAP_ID, json.dumps([{"op": "add", "ref": ["x", 1]}, {"op": "remove", "id": "custom_1"}])))
+    store._conn.commit()
+    state, seq = store.restore(MAP_ID)
+    assert seq == 2
+    assert state["custom"] == []
+    assert store.compact(MAP_ID)
+
+
+def test_apply_ops_round_trip():
+    state = apply_ops(empty_state(), GOOD_OPS)
+    assert state["catalog"] == {"name": "services.csv", "hash": "abc"}
+    assert state["custom"][0]["parentId"] == AWS_CENTER_ID
+    assert state["viewBox"] == [0, 0, 1600, 800]
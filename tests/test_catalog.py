@@ -0,0 +1,15 @@
+"""Leitura dos CSVs de catálogo e de relações."""
+from mindmap.catalog import read_catalog
+from mindmap.relations import read_relation_triples
+
+
+def test_read_catalog_with_excel_bom(tmp_path):
+    path = tmp_path / "services.csv"
+    path.write_bytes("Service,Category,Description\nAmazon S3,Storage,Objetos\n".encode("utf-8-sig"))
+    assert read_catalog(path) == [{"Service": "Amazon S3", "Category": "Storage", "Description": "Objetos"}]
+
+
+def test_read_relations_with_excel_bom(tmp_path):
+    path = tmp_path / "services.relations.csv"
+    path.write_bytes("Origem,Relação,Destino\nAmazon Athena,consulta dados no,Amazon S3\n".encode("utf-8-sig"))
+    assert read_relation_triples(path) == [("Amazon Athena", "consulta dados no", "Amazon S3")]
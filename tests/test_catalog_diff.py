@@ -0,0 +1,55 @@
+"""Migração de mapas salvos entre versões do catálogo (``mindmap.catalog_diff``)."""
+import csv
+
+from mindmap import catalog_diff
+from mindmap.state_format import AWS_CENTER_ID, read_state_file, write_state_file
+
+OLD = [("Amazon S3", "Storage", "Objetos"), ("AWS Lambda", "Compute", "Funções"),
+       ("Amazon Elasticsearch", "Analytics", "Busca")]
+NEW = [("Amazon S3", "Storage", "Objetos"), ("AWS Lambda", "Compute", "Funções"),
+       ("Amazon OpenSearch", "Analytics", "Busca")]
+
+
+def write_catalog(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Service", "Category", "Description"])
+        writer.writerows(rows)
+    return path
+
+
+def node(node_id, parent_id=AWS_CENTER_ID, x=900, y=400):
+    return {"id": node_id, "name": node_id, "x": x, "y": y, "parentId": parent_id}
+
+
+def test_migrate_into_the_maps_folder(tmp_path, capsys):
+    maps = tmp_path / "maps"
+    maps.mkdir()
+    path = maps / "mapa.json"
+    write_state_file(path, {"nodes": [
+        {"id": AWS_CENTER_ID, "name": "AWS", "x": 800, "y": 400, "isCentral": True, "parentId": None},
+        node("Amazon S3"), node("Amazon Elasticsearch", "Amazon S3"), node("AWS Lambda", "Amazon Elasticsearch"),
+    ]})
+    old = write_catalog(tmp_path / "antigo.csv", OLD)
+    new = write_catalog(tmp_path / "novo.csv", NEW)
+
+    assert catalog_diff.main(["migrar", str(old), str(new), str(maps), "--saida", str(maps)]) == 0
+    nodes = {n["id"]: n for n in read_state_file(path, {r[0]: {"Service": r[0]} for r in NEW})["nodes"]}
+    assert set(nodes) == {AWS_CENTER_ID, "Amazon S3", "Amazon OpenSearch", "AWS Lambda"}
+    assert nodes["AWS Lambda"]["parentId"] == "Amazon OpenSearch"
+    assert "1 referência(s) renomeada(s)" in capsys.readouterr().out
+
+
+def test_rename_onto_existing_node_is_reported(tmp_path, capsys):
+    path = tmp_path / "mapa.json"
+    write_state_file(path, {"nodes": [
+        {"id": AWS_CENTER_ID, "name": "AWS", "x": 800, "y": 400, "isCentral": True, "parentId": None},
+        node("Amazon Elasticsearch"), node("Amazon OpenSearch"),
+    ]})
+    old = write_catalog(tmp_path / "antigo.csv", OLD)
+    new = write_catalog(tmp_path / "novo.csv", NEW)
+
+    assert catalog_diff.main(["migrar", str(old), str(new), str(path), "--substituir"]) == 0
+    out = capsys.readouterr().out
+    assert "'Amazon Elasticsearch' foi renomeado para 'Amazon OpenSearch'" in out
+    assert [ref[0] for ref in read_state_file(path)["refs"]] == ["Amazon OpenSearch"]
@@ -0,0 +1,18 @@
+"""Paginação do apêndice em PDF (``mindmap.node_details``)."""
+from mindmap.node_details import BOTTOM_LIMIT, PAGE_HEIGHT, iter_detail_pages
+
+
+def record(name, description):
+    return {"name": name, "category": "Compute", "description": description, "custom": False}
+
+
+def test_long_description_continues_on_next_page():
+    long_text = "\n".join(f"Linha {i} da descrição" for i in range(120))
+    records = [record("Primeiro", "Curta"), record("Longo", long_text), record("Último", "Curta")]
+    pages = list(iter_detail_pages(records))
+    assert len(pages) >= 3
+    texts = [item[4] for page in pages for item in page[1:]]
+    assert sum(text.startswith("Linha ") for text in texts) == 119
+    assert texts[-1] == "Descrição: Curta"
+    for page in pages:
+        assert all(item[3] <= PAGE_HEIGHT - BOTTOM_LIMIT for item in page[1:])
@@ -0,0 +1,19 @@
+"""Árvore do mapa usada nas exportações em tópicos (``mindmap.outline_export``)."""
+from mindmap.outline_export import MapTree
+from mindmap.state_format import AWS_CENTER_ID
+
+
+def parents_by_id(tree):
+    return {tree.ids[i]: (tree.ids[p] if p is not None else None) for i, p in enumerate(tree.parents)}
+
+
+def test_break_cycles_detaches_only_a_cycle_member():
+    records = [{"id": AWS_CENTER_ID, "name": "AWS", "central": True, "parentId": None},
+               {"id": "filho", "name": "filho", "parentId": "B"},  # pendurado no ciclo, antes dele no arquivo
+               {"id": "B", "name": "B", "parentId": "C"},
+               {"id": "C", "name": "C", "parentId": "B"},
+               {"id": "laco", "name": "laco", "parentId": "laco"}]
+    tree = MapTree.from_records(records)
+    assert parents_by_id(tree) == {AWS_CENTER_ID: None, "filho": "B", "B": AWS_CENTER_ID, "C": "B",
+                                   "laco": AWS_CENTER_ID}
+    assert sorted(tree.ids[i] for i in tree.children[tree.root]) == ["B", "laco"]
@@ -0,0 +1,98 @@
+"""Validação -> reparo -> leitura dos arquivos de estado (``mindmap.state_validator``)."""
+import json
+
+import pytest
+
+from mindmap import state_validator
+from mindmap.state_format import AWS_CENTER_ID, read_state_file, write_state_file
+
+CATALOG = [
+    {"Service": "Amazon S3", "Category": "Storage", "Description": "Objetos"},
+    {"Service": "AWS Lambda", "Category": "Compute", "Description": "Funções"},
+    {"Service": "Amazon EC2", "Category": "Compute", "Description": "Máquinas virtuais"},
+]
+CATALOG_BY_NAME = {r["Service"]: r for r in CATALOG}
+
+
+def legacy_state():
+    """Mapa legado com um problema de cada tipo que o reparo corrige."""
+    return {"nodes": [
+        {"id": AWS_CENTER_ID, "name": "AWS", "x": 800, "y": 400, "isCentral": True, "parentId": None},
+        {"id": "Amazon S3", "name": "Amazon S3", "x": "900.5", "y": 380, "parentId": AWS_CENTER_ID},
+        {"id": "Amazon S3", "name": "Amazon S3", "x": 1, "y": 1, "parentId": AWS_CENTER_ID},
+        {"id": "AWS Lambda", "name": "AWS Lambda", "x": 700, "y": "abc", "parentId": "nao-existe"},
+        {"id": "Amazon EC2", "name": "Amazon EC2", "x": 650, "y": 500, "parentId": "Amazon EC2"},
+        {"id": "Serviço Antigo", "name": "Serviço Antigo", "x": 820, "y": 300, "parentId": "Amazon S3"},
+        {"id": "custom_1", "name": "Minha API", "category": "Interno", "x": 950, "y": 450,
+         "parentId": "AWS Lambda", "isCustom": True},
+    ], "viewBox": {"x": 0, "y": 0, "width": 1600, "height": 800}}
+
+
+def nodes_by_id(path):
+    return {node["id"]: node for node in read_state_file(path, CATALOG_BY_NAME)["nodes"]}
+
+
+def check_repaired(path):
+    assert state_validator.validate_state_file(path).ok
+    nodes = nodes_by_id(path)
+    assert set(nodes) == {AWS_CENTER_ID, "Amazon S3", "AWS Lambda", "Amazon EC2", "Serviço Antigo", "custom_1"}
+    assert (nodes["Amazon S3"]["x"], nodes["Amazon S3"]["y"]) == (900.5, 380)
+    assert (nodes["AWS Lambda"]["x"], nodes["AWS Lambda"]["y"]) == (700, 400)
+    assert nodes["AWS Lambda"]["parentId"] == AWS_CENTER_ID
+    assert nodes["Amazon EC2"]["parentId"] == AWS_CENTER_ID
+    assert nodes["Serviço Antigo"]["parentId"] == "Amazon S3"
+    assert nodes["custom_1"]["name"] == "Minha API"
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "deflate"])
+def test_validate_repair_decode(tmp_path, compression):
+    source = tmp_path / "mapa.json"
+    write_state_file(source, legacy_state(), compression)
+    report = state_validator.validate_state_file(source)
+    assert not report.ok
+    codes = {issue["codigo"] for issue in report.issues}
+    assert {"id_duplicado", "ciclo", "pai_inexistente", "coordenada_invalida"} <= codes
+
+    out = tmp_path / "saida" / "mapa.json"
+    out.parent.mkdir()
+    report = state_validator.repair_state_file(source, out, CATALOG, compression, report=report)
+    assert report.removed_refs == ["Serviço Antigo"]
+    check_repaired(out)
+    assert not (tmp_path / "saida" / "mapa.json.tmp").exists()
+
+
+def test_repair_in_place(tmp_path):
+    path = tmp_path / "mapa.json.gz"
+    write_state_file(path, legacy_state(), "gzip")
+    state_validator.repair_state_file(path, path, CATALOG, "gzip")
+    check_repaired(path)
+    assert [p.name for p in tmp_path.iterdir()] == ["mapa.json.gz"]
+
+
+def test_cli_repair_in_place_keeps_dotted_names(tmp_path):
+    first = tmp_path / "a.v1.json"
+    second = tmp_path / "a.v2.json"
+    write_state_file(first, legacy_state())
+    write_state_file(second, legacy_state())
+    catalog = tmp_path / "services.csv"
+    catalog.write_text("Service,Category,Description\n"
+                       + "".join(f"{r['Service']},{r['Category']},{r['Description']}\n" for r in CATALOG),
+                       encoding="utf-8")
+
+    assert state_validator.main(["reparar", str(first), str(second), "--saida", str(tmp_path),
+                                 "--catalogo", str(catalog)]) == 0
+    check_repaired(first)
+    check_repaired(second)
+    assert json.loads(first.read_text(encoding="utf-8"))["catalog"]["name"] == "services.csv"
+
+
+def test_cli_rejects_colliding_outputs(tmp_path, capsys):
+    plain = tmp_path / "a.json"
+    packed = tmp_path / "a.json.gz"
+    write_state_file(plain, legacy_state())
+    write_state_file(packed, legacy_state(), "gzip")
+    out = tmp_path / "saida"
+
+    assert state_validator.main(["reparar", str(plain), str(packed), "--saida", str(out)]) == 1
+    assert "já usada" in capsys.readouterr().err
+    assert [p.name for p in out.iterdir()] == ["a.json"]